@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Local agency server module.
+This module serves recorded listing pages and generated sitemaps / result pages for each agency from a local
+HTTP server, and provides a session pointing the scrapers to it, so that the whole pipeline runs offline.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import httpx
+from scrapling import Selector
+from core.fetch_profiles import resolve_fetch_profile
+from core.hedging import HedgePolicy
+from core.latency import AdaptiveTimeouts
+from core.politeness import HostRateLimiter
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# Listing urls written in the generated sitemaps, they must pass the url filters of the scrapers
+LISTING_URL_TEMPLATES = {
+    "ALEXBOLTON": "https://www.alexbolton.fr/annonces/bureaux-paris-{i}",
+    "ARTHURLOYD": "https://www.arthur-loyd.com/bureau-location/ile-de-france/paris/{i}",
+    "BNP": "https://www.bnppre.fr/a-louer/bureau/paris-75/{sitemap}-{i}.html",
+    "CBRE": "https://immobilier.cbre.fr/offre/a-louer/bureaux/75008{i:04d}",
+    "CUSHMAN": "https://immobilier.cushmanwakefield.fr/location/bureaux/paris-75008-{i}AB",
+    "JLL": "https://immobilier.jll.fr/location/bureaux-paris-75008-{i}",
+}
+
+# Result cards written in a KNIGHTFRANK result page
+CARDS_PER_PAGE = 10
+
+
+def sitemap(agency: str, sitemap_name: str, listings: int) -> bytes:
+    """Returns a sitemap of the listing urls of an agency"""
+    template = LISTING_URL_TEMPLATES[agency]
+    locs = "".join(
+        f"<url><loc>{template.format(i=i, sitemap=sitemap_name)}</loc></url>"
+        for i in range(listings)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+    ).encode("utf-8")
+
+
+def result_page(query: str, listings: int) -> bytes:
+    """Returns a KNIGHTFRANK result page with its cards and the link to the next page"""
+    params = parse_qs(query)
+    page = int(params.pop("page", ["1"])[0])
+    nature = params.get("nature", ["1"])[0]
+    first = (page - 1) * CARDS_PER_PAGE
+    cards = "".join(
+        f'<div class="cardOffreListe"><a class="infosCard" href="/offre/location-bureaux-paris-{nature}-{i}">Bureaux</a>'
+        f'<p class="surfaceCard">{100 + i} m²</p><p class="villeCard">Paris 750{i % 20 + 1:02d}</p>'
+        f'<p class="prixCard">{400 + i} € HT HC/m²/an</p></div>'
+        for i in range(first, min(first + CARDS_PER_PAGE, listings))
+    )
+    pagination = ""
+    if first + CARDS_PER_PAGE < listings:
+        pagination = f'<a aria-label="Next" href="/resultat?{query.split("&page=")[0]}&page={page + 1}">Suivant</a>'
+    return (
+        '<html><body><main><section>'
+        f'<div id="listCards"><div>{cards}</div></div>'
+        f'<div class="container pagination py-5"><div>{pagination}</div></div>'
+        '</section></main></body></html>'
+    ).encode("utf-8")
+
+
+def listing_page(agency: str) -> bytes:
+    """Returns the recorded listing page of an agency"""
+    with open(os.path.join(FIXTURES_PATH, agency, "listing.html"), "rb") as f:
+        return f.read()
+
+
+class AgencyServer:
+    """Local HTTP server answering '/<AGENCY>/<path of the real site>' with recorded content"""
+
+    def __init__(self, listings: int = 100, latency: float = 0.0):
+        """Initializes the server.
+
+        Args:
+            listings (int): Number of listings in each sitemap or result pages
+            latency (float): Seconds waited before answering a listing page, to simulate a remote site
+        """
+        self.listings = listings
+        self.latency = latency
+        self._listing_pages: dict[str, bytes] = {}
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str, query: str) -> tuple[int, str, bytes]:
+        """Returns the status, content type and body answered for a path"""
+        agency, _, site_path = path.lstrip("/").partition("/")
+        if agency == "KNIGHTFRANK" and site_path.startswith("resultat"):
+            return 200, "text/html; charset=utf-8", result_page(query, self.listings)
+        if site_path.endswith(".xml") and agency in LISTING_URL_TEMPLATES:
+            sitemap_name = os.path.splitext(os.path.basename(site_path))[0]
+            return 200, "application/xml", sitemap(agency, sitemap_name, self.listings)
+        if site_path.startswith("_next/data/"):
+            # Next.js data route of a listing, answered with the recorded page data of the agency
+            path = os.path.join(FIXTURES_PATH, agency, "next_data.json")
+            if not os.path.exists(path):
+                return 404, "application/json", b'{"notFound":true}'
+            with open(path, "rb") as f:
+                return 200, "application/json", f.read()
+        if agency not in self._listing_pages:
+            if not os.path.exists(os.path.join(FIXTURES_PATH, agency, "listing.html")):
+                return 404, "text/html; charset=utf-8", b"<html><body>Not found</body></html>"
+            self._listing_pages[agency] = listing_page(agency)
+        if self.latency:
+            time.sleep(self.latency)
+        return 200, "text/html; charset=utf-8", self._listing_pages[agency]
+
+    def start(self) -> str:
+        """Starts serving on a free local port in a background thread
+
+        Returns:
+            str: Base url of the server
+        """
+        agency_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, content_type, body = agency_server.respond(parts.path, parts.query)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="agency-server", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stops the server"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class LocalAgencySession:
+    """Session with the fetch() interface of the scrapling browser sessions, redirecting every url of an
+    agency to the local agency server"""
+
+    def __init__(self, base_url: str, agency: str, max_connections: int = 32):
+        """Initializes the session.
+
+        Args:
+            base_url (str): Base url of the local agency server
+            agency (str): Name of the agency whose pages are requested
+            max_connections (int): Size of the connection pool
+        """
+        self.base_url = base_url
+        self.agency = agency
+        self.max_connections = max_connections
+        self.client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> "LocalAgencySession":
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            timeout=30,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.aclose()
+        self.client = None
+
+    def local_url(self, url: str) -> str:
+        """Returns the url of the local server answering for a url of the agency site"""
+        parts = urlsplit(url)
+        local_url = f"{self.base_url}/{self.agency}{parts.path or '/'}"
+        return f"{local_url}?{parts.query}" if parts.query else local_url
+
+    async def fetch(self, url: str) -> Selector:
+        """Fetches a page of the agency from the local server"""
+        response = await self.client.get(self.local_url(url))
+        response.raise_for_status()
+        return Selector(response.content, url=url)
+
+
+class LocalAgencySetup:
+    """Picklable hook pointing the sessions of a scraper to the local agency server, without budget, rate limit,
+    hedging nor short timeouts : the pipeline is measured, not the politeness towards the agencies nor hedge races"""
+
+    def __init__(self, base_url: str, max_connections: int = 32):
+        self.base_url = base_url
+        self.max_connections = max_connections
+
+    def __call__(self, scraper) -> None:
+        session_factory = lambda: LocalAgencySession(self.base_url, scraper.scraper_name, self.max_connections)
+        scraper.session_factories = {"http": session_factory}
+        scraper.discovery_session_factories = (session_factory,)
+        scraper.budget_limits = {}
+        scraper.rate_limiter = HostRateLimiter()
+        scraper.robots_txt = False
+        # The adaptive timeouts never go below the ceiling of the fetch profile, whatever the local latencies
+        scraper.timeouts = AdaptiveTimeouts(scraper.latency, resolve_fetch_profile(
+            {"http": {"timeout": 30000, "timeout_floor": 30000, "timeout_ceiling": 30000}}
+        ))
+        scraper.hedging_conf = {**scraper.hedging_conf, "enabled": False}
+        scraper.hedging = HedgePolicy(**scraper.hedging_conf)
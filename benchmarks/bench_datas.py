@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Datas layer scale benchmark.
+This module generates synthetic properties at several scales and measures the time and peak memory of the
+aggregation (ListingManager.add_listing, get_all_properties), serialization (get_flat_dict) and export
+(ListingExporter.export_to_json), then flags the regressions against a stored baseline.
+
+Usage : python -m benchmarks.bench_datas [--scales 100000 1000000] [--save-baseline]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+from datas.listing_exporter import ListingExporter
+from datas.listing_manager import ListingManager
+from datas.property import Property
+from datas.property_listing import PropertyListing
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "datas.json")
+SCALES = (100_000, 1_000_000)
+# Relative increase of the time or of the peak memory over the baseline reported as a regression
+TOLERANCE = 0.25
+
+AGENCIES = ("BNP", "JLL", "CBRE", "ALEXBOLTON", "CUSHMAN", "KNIGHTFRANK", "ARTHURLOYD", "SAVILLS")
+AREAS = ("120 m²", "1 234 m²", "De 250 à 1 200 m²", "850 m² divisibles à partir de 320 m²", "45 000 m²")
+DIVISIONS = ("Non divisible", "Divisible à partir de 250 m²", "180 m²", None)
+PRICES = ("450 €/m²/an HT HC", "12 500 € HT HC / mois", "Prix : 2 300 000 € HT", "Nous consulter", None)
+
+
+def make_properties(count: int, seed: int = 42) -> list[Property]:
+    """Generates synthetic properties spread over the agencies, with realistic raw fields"""
+    generator = random.Random(seed)
+    return [
+        Property(
+            agency=AGENCIES[i % len(AGENCIES)],
+            url=f"https://example.com/{AGENCIES[i % len(AGENCIES)].lower()}/annonce/{i}",
+            reference=f"REF{i:07d}",
+            asset_type="Bureaux",
+            contract="Location" if i % 3 else "Vente",
+            disponibility="Immédiate",
+            area=generator.choice(AREAS),
+            division=generator.choice(DIVISIONS),
+            adress=f"{i % 200 + 1} rue de la Paix 7500{i % 9 + 1} Paris",
+            postal_code=f"7500{i % 9 + 1}",
+            contact="Agence Test",
+            resume="Plateau de bureaux lumineux entièrement rénové",
+            amenities="Climatisation, fibre optique",
+            url_image=f"https://example.com/images/{i}.jpg",
+            latitude=48.7 + generator.random() * 0.3,
+            longitude=2.2 + generator.random() * 0.3,
+            price=generator.choice(PRICES),
+        )
+        for i in range(count)
+    ]
+
+
+def make_listings(properties: list[Property]) -> list[PropertyListing]:
+    """Splits the properties into one listing per agency"""
+    listings = {agency: PropertyListing(agency) for agency in AGENCIES}
+    for prop in properties:
+        listings[prop.agency].properties.append(prop)
+    return list(listings.values())
+
+
+def make_manager(properties: list[Property]) -> ListingManager:
+    """Returns a listing manager holding the properties"""
+    manager = ListingManager()
+    for listing in make_listings(properties):
+        manager.add_listing(listing)
+    return manager
+
+
+def export_to_json(manager: ListingManager) -> None:
+    with tempfile.TemporaryDirectory() as path:
+        ListingExporter(manager).export_to_json(path)
+
+
+def measure(operation: Callable[[], object], rounds: int) -> dict:
+    """Returns the best and mean time over the rounds and the peak memory allocated by one more round"""
+    timings = []
+    for _ in range(rounds):
+        gc.collect()
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"min": min(timings), "mean": sum(timings) / len(timings), "peak_memory": peak}
+
+
+def run_benchmark(scales: tuple[int, ...] = SCALES, rounds: int = 3) -> dict[str, dict]:
+    """Measures each operation of the datas layer at each scale
+
+    Returns:
+        dict[str, dict]: Measures keyed by '<operation>[<scale>]'
+    """
+    results = {}
+    for scale in scales:
+        properties = make_properties(scale)
+        listings = make_listings(properties)
+
+        def aggregate() -> None:
+            manager = ListingManager()
+            for listing in listings:
+                manager.add_listing(listing)
+
+        manager = make_manager(properties)
+        operations = {
+            "add_listing": aggregate,
+            "get_all_properties": manager.get_all_properties,
+            "get_flat_dict": manager.get_flat_dict,
+            "export_to_json": lambda: export_to_json(manager),
+        }
+        for name, operation in operations.items():
+            results[f"{name}[{scale}]"] = measure(operation, rounds)
+    return results
+
+
+def compare_to_baseline(results: dict[str, dict], baseline: dict[str, dict], tolerance: float = TOLERANCE) -> list[str]:
+    """Returns a message for each time or peak memory exceeding its baseline by more than the tolerance"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for key, label in (("min", "time"), ("peak_memory", "peak memory")):
+            if reference[key] and result[key] > reference[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {label} : {result[key]:.6g} vs baseline {reference[key]:.6g} "
+                    f"(+{(result[key] / reference[key] - 1) * 100:.0f} %)"
+                )
+    return regressions
+
+
+def missing_from_baseline(results: dict[str, dict], baseline: dict[str, dict]) -> list[str]:
+    """Returns the benchmarks without baseline, which cannot be checked for regressions"""
+    return [name for name in results if name not in baseline]
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict[str, dict]:
+    """Returns the stored baseline, empty if none has been saved yet"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict[str, dict], path: str = BASELINE_PATH) -> None:
+    """Stores the results as the new baseline, merged with the scales not measured by this run"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def format_report(results: dict[str, dict], baseline: dict[str, dict]) -> str:
+    """Formats the results as a text table with the change over the baseline"""
+    lines = [f"{'benchmark':<34} {'min (s)':>10} {'mean (s)':>10} {'peak (MB)':>10} {'vs baseline':>12}"]
+    for name, result in results.items():
+        reference = baseline.get(name)
+        change = f"{(result['min'] / reference['min'] - 1) * 100:+.0f} %" if reference and reference["min"] else "-"
+        lines.append(
+            f"{name:<34} {result['min']:>10.4f} {result['mean']:>10.4f} "
+            f"{result['peak_memory'] / (1024 * 1024):>10.1f} {change:>12}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scale benchmark of the datas layer")
+    parser.add_argument("--scales", nargs="+", type=int, default=list(SCALES), help="numbers of properties")
+    parser.add_argument("--rounds", type=int, default=3, help="timed rounds per benchmark")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="relative increase reported as a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="path of the baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline in {args.baseline}, regressions cannot be checked : run with --save-baseline first",
+              file=sys.stderr)
+        sys.exit(2)
+    results = run_benchmark(tuple(args.scales), args.rounds)
+    baseline = load_baseline(args.baseline)
+    print(format_report(results, baseline))
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline saved in {args.baseline}")
+    else:
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        missing = missing_from_baseline(results, baseline)
+        if missing:
+            print(f"No baseline for {', '.join(missing)} in {args.baseline} : run with --save-baseline to add them",
+                  file=sys.stderr)
+        if regressions or missing:
+            sys.exit(1)
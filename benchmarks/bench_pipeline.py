@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end pipeline benchmark.
+This module runs the real BaseScraper.run() of each agency against the local agency server, without browser,
+and reports the URLs per second, the p50/p95 of each stage and the peak resident memory.
+
+Usage : python -m benchmarks.bench_pipeline [--agencies ALEXBOLTON CBRE] [--listings 200] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup, LISTING_URL_TEMPLATES
+from core.registry import load_scraper
+from datas.page_archive import PageArchive
+from utils.metrics import RunMetrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Agencies whose pages are served by the local agency server. SAVILLS is an API scraper with its own run()
+AGENCIES = tuple(sorted(LISTING_URL_TEMPLATES)) + ("KNIGHTFRANK",)
+
+
+def peak_rss_mb() -> float | None:
+    """Returns the peak resident memory of the process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def bench_agency(agency: str, base_url: str, concurrency: int = 32, archive: PageArchive | None = None) -> dict:
+    """Runs the scraper of an agency against the local agency server, archiving the pages if an archive is given
+
+    Returns:
+        dict: Urls, properties, failures, duration, URLs/s and the percentiles of each stage
+    """
+    scraper = load_scraper(agency)
+    LocalAgencySetup(base_url, concurrency)(scraper)
+    scraper.metrics = RunMetrics()
+    scraper.archive = archive
+
+    start = time.perf_counter()
+    await scraper.run()
+    duration = time.perf_counter() - start
+
+    failures = len(getattr(scraper.listing, "failed_urls", []))
+    properties = scraper.listing.count_properties()
+    urls = properties + failures
+    return {
+        "agency": agency,
+        "urls": urls,
+        "properties": properties,
+        "failures": failures,
+        "seconds": duration,
+        "urls_per_second": urls / duration if duration else None,
+        "stages": [
+            {key: serie[key] for key in ("stage", "tier", "outcome", "count", "p50", "p95")}
+            for serie in scraper.metrics.summary()
+        ],
+    }
+
+
+async def run_benchmark(agencies: tuple[str, ...] = AGENCIES, listings: int = 100, latency: float = 0.0, archive: PageArchive | None = None) -> dict:
+    """Starts the local agency server and benchmarks each agency
+
+    Args:
+        agencies (tuple[str, ...]): Agencies to benchmark
+        listings (int): Number of listings served per sitemap or result pages
+        latency (float): Seconds waited by the server before answering a listing page
+        archive (PageArchive | None): Archive where to store the fetched pages
+
+    Returns:
+        dict: Results of each agency and the peak resident memory
+    """
+    server = AgencyServer(listings=listings, latency=latency)
+    base_url = server.start()
+    try:
+        results = [await bench_agency(agency, base_url, archive=archive) for agency in agencies]
+    finally:
+        server.stop()
+    return {"listings": listings, "latency": latency, "agencies": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def format_report(report: dict) -> str:
+    """Formats the benchmark results as a text table"""
+    lines = [f"{'agency':<12} {'urls':>6} {'fails':>6} {'seconds':>8} {'urls/s':>8}  stage p50/p95 (ms)"]
+    for result in report["agencies"]:
+        stages = ", ".join(
+            f"{serie['stage']}{'/' + serie['tier'] if serie['tier'] else ''}"
+            f"{'' if serie['outcome'] == 'ok' else '(' + serie['outcome'] + ')'} "
+            f"{serie['p50'] * 1000:.1f}/{serie['p95'] * 1000:.1f}"
+            for serie in result["stages"]
+        )
+        lines.append(
+            f"{result['agency']:<12} {result['urls']:>6} {result['failures']:>6} "
+            f"{result['seconds']:>8.2f} {result['urls_per_second'] or 0:>8.1f}  {stages}"
+        )
+    if report["peak_rss_mb"] is not None:
+        lines.append(f"Peak RSS : {report['peak_rss_mb']:.1f} MB")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the scrapers")
+    parser.add_argument("--agencies", nargs="+", default=list(AGENCIES), choices=AGENCIES)
+    parser.add_argument("--listings", type=int, default=100, help="listings per sitemap or result pages")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds waited by the server per listing page")
+    parser.add_argument("--archive", help="folder of a page archive where to store the fetched pages")
+    parser.add_argument("--output", help="path of a JSON file where to write the results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    archive = PageArchive(args.archive) if args.archive else None
+    report = asyncio.run(run_benchmark(tuple(args.agencies), args.listings, args.latency, archive))
+    if archive is not None:
+        archive.close()
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -2,7 +2,41 @@
 """
 Scrapers configuration
 """
-from typing import Dict, TypedDict
+from typing import Any, Dict, NotRequired, TypedDict
+
+class ScraperBudget(TypedDict, total=False):
+    max_seconds:float # wall time of a run, discovery included
+    max_requests:int # fetch attempts, whatever the session tier
+    max_page_loads:int # fetch attempts through a browser session
+
+class TierProfile(TypedDict, total=False):
+    timeout:int # milliseconds, until enough latencies of the host are known to adapt it
+    timeout_floor:int # milliseconds, lowest adaptive timeout
+    timeout_ceiling:int # milliseconds, highest adaptive timeout and timeout of the session itself
+    disable_resources:bool # browser tiers : block fonts, images, media, stylesheets...
+    network_idle:bool # browser tiers : wait for no network activity
+    wait_selector:str # browser tiers : wait for this CSS selector
+    wait_selector_state:str # "attached", "visible", "hidden" or "detached"
+    wait:int # browser tiers : milliseconds waited after the page load
+    options:dict[str, Any] # any other option of the scrapling session, e.g. blocked domains or solve_cloudflare
+
+class FetchProfile(TypedDict, total=False):
+    tiers:list[str] # allowed session tiers among "http", "dynamic" and "stealthy", cheapest first
+    start_tier:str # first tier tried for each url
+    http:TierProfile
+    dynamic:TierProfile
+    stealthy:TierProfile
+
+class HedgingConf(TypedDict, total=False):
+    enabled:bool
+    percentile:float # latency percentile of the host after which a request is hedged
+    max_fraction:float # maximum share of hedged requests in a run
+    min_samples:int # latencies of the host needed before hedging
+    next_tier:bool # hedge on the next session tier instead of the same one
+
+class RateLimit(TypedDict, total=False):
+    requests_per_second:float # requests to each host of the start_link(s), all scrapers together
+    burst:int # requests sent at once
 
 class ScraperConf(TypedDict):
     scraper_name:str
@@ -10,6 +44,11 @@ class ScraperConf(TypedDict):
     scraper_type:str
     url_strategy:str
     start_link:str|dict[str, str]
+    budget:NotRequired[ScraperBudget] # merged over the DEFAULT_BUDGET of core/scheduler.py
+    fetch_profile:NotRequired[FetchProfile] # merged over the DEFAULT_FETCH_PROFILE of config/squirrel_settings.py
+    hedging:NotRequired[HedgingConf] # merged over the DEFAULT_HEDGING of config/squirrel_settings.py
+    rate_limit:NotRequired[RateLimit] # the slowest of this limit and the robots.txt one applies
+    harvest:NotRequired[bool] # listings built from the result cards, detail pages fetched for new or changed cards only
 
 
 SCRAPER_CONFIG: Dict[str, ScraperConf] = {
@@ -62,6 +101,7 @@ SCRAPER_CONFIG: Dict[str, ScraperConf] = {
             "Location": "https://www.knightfrank.fr/resultat?nature=1&localisation=75%7C77%7C78%7C91%7C92%7C93%7C94%7C95%7C&typeOffre=1",
             "Vente": "https://www.knightfrank.fr/resultat?nature=2&localisation=75%7C77%7C78%7C91%7C92%7C93%7C94%7C95%7C&typeOffre=1",
         },
+        "harvest": True,
     },
     "ARTHURLOYD": {
         "scraper_name": "ARTHURLOYD",
@@ -148,6 +148,73 @@ SELECTORS: Dict[str, SelectorFields] = {
     },
 }
 
+# Fields shown on the result cards of the scrapers harvesting their result pages
+CARD_SELECTORS: Dict[str, SelectorFields] = {
+    "KNIGHTFRANK": {
+        "area": "p.surfaceCard",
+        "adress": "p.villeCard",
+        "global_price": "p.prixCard",
+    },
+}
+
+class EmbeddedJson(TypedDict, total=False):
+    css:str # element holding the JSON in one of its attributes, or as text without attribute...
+    attribute:str
+    script:str # ...or text contained by the script declaring it
+    pattern:str # regex capturing the JSON in the script
+    fields:Dict[str, list[str]] # Property field -> dotted paths in the JSON ("markers.0.latitude"), first found wins
+
+
+# JSON embedded in the pages, decoded once and read before the CSS selectors, which only fill the missing fields.
+# For CUSHMAN, ARTHURLOYD and BNP only the keys seen in their pages are mapped : the coordinates, plus the postal
+# code of BNP. Their other fields still come from the CSS selectors
+EMBEDDED_JSON: Dict[str, EmbeddedJson] = {
+    "CUSHMAN": {
+        "css": "div.c-map.js-map",
+        "attribute": "data-property",
+        "fields": {
+            "latitude": ["address.displayedGeolocation.lat"],
+            "longitude": ["address.displayedGeolocation.lon"],
+        },
+    },
+    "ARTHURLOYD": {
+        "css": "div[data-live-props-value]",
+        "attribute": "data-live-props-value",
+        "fields": {
+            "latitude": ["markers.0.latitude"],
+            "longitude": ["markers.0.longitude"],
+        },
+    },
+    "BNP": {
+        # Answer of the geocoding API, the postal code of its address components is read by the scraper
+        "script": "var geocode",
+        "pattern": r"var geocode\s*=\s*(\{.*?\});",
+        "fields": {
+            "latitude": ["results.0.geometry.location.lat"],
+            "longitude": ["results.0.geometry.location.lng"],
+        },
+    },
+    "JLL": {
+        # Next.js page data, the "props" of __NEXT_DATA__ are unwrapped by the scraper to match the /_next/data/ routes.
+        # These paths were written against synthetic fixtures (benchmarks/fixtures/JLL), not a recorded page of the
+        # site : they are unverified until checked on a live __NEXT_DATA__, so they only fill what the CSS selectors miss
+        "css": "script#__NEXT_DATA__",
+        "fields": {
+            "reference": ["pageProps.property.reference", "pageProps.property.id"],
+            "asset_type": ["pageProps.property.propertyType"],
+            "contract": ["pageProps.property.transactionType"],
+            "disponibility": ["pageProps.property.availability"],
+            "postal_code": ["pageProps.property.address.postalCode"],
+            "contact": ["pageProps.property.broker.name"],
+            "resume": ["pageProps.property.description"],
+            "url_image": ["pageProps.property.images.0.url"],
+            "latitude": ["pageProps.property.coordinates.latitude"],
+            "longitude": ["pageProps.property.coordinates.longitude"],
+            "price": ["pageProps.property.price.label"],
+        },
+    },
+}
+
 """ Add a css selectors dict for a new scraper
 "SCRAPER" : {
     "reference": None,
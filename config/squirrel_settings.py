@@ -3,17 +3,108 @@
 Script global variables settings
 """
 
+from datetime import timedelta
+
 # Proxy URL
 PROXY = ""
 
-# Timeouts
+# Timeouts of the first requests to a host, then adapted to its latencies within the floor and ceiling of the tier
 SIMPLE_TIMEOUT = 1000  # milliseconds
 ADVANCED_TIMEOUT = 2000  # milliseconds
 
+# Fetch profile of the scrapers, overridden per scraper by the "fetch_profile" of SCRAPER_CONFIG
+DEFAULT_FETCH_PROFILE = {
+    "tiers": ["http", "dynamic", "stealthy"],
+    "start_tier": "http",
+    "http": {"timeout": SIMPLE_TIMEOUT, "timeout_floor": 500, "timeout_ceiling": 10000},
+    "dynamic": {"timeout": SIMPLE_TIMEOUT, "timeout_floor": 1000, "timeout_ceiling": 30000, "disable_resources": True, "options": {"locale": "fr-FR"}},
+    "stealthy": {
+        "timeout": ADVANCED_TIMEOUT,
+        "timeout_floor": 2000,
+        "timeout_ceiling": 60000,
+        "disable_resources": True,
+        "options": {"geoip": True, "solve_cloudflare": True, "disable_ads": True, "block_webrtc": True, "block_images": True, "os_randomize": True},
+    },
+}
+
+# Adaptive timeouts : once TIMEOUT_MIN_SAMPLES latencies of a (host, tier) are known, its timeout is
+# TIMEOUT_MULTIPLIER times their TIMEOUT_PERCENTILE, within the floor and ceiling of the tier. A timed out request
+# counts as a latency equal to its timeout, so that the timeouts of a slow host grow
+TIMEOUT_PERCENTILE = 99
+TIMEOUT_MULTIPLIER = 2.0
+TIMEOUT_MIN_SAMPLES = 10
+
+# Watchdog : seconds after which the scraping of a url (all its tiers, tries and backoffs) is cancelled
+URL_DEADLINE = 180
+
+# Politeness : requests per second and burst allowed to each host, shared by all the scrapers of the process.
+# A lower "rate_limit" of a scraper in SCRAPER_CONFIG or the Crawl-delay / Request-rate of a robots.txt applies
+DEFAULT_RATE_LIMIT = {"requests_per_second": 4.0, "burst": 4}
+ROBOTS_TXT_ENABLED = True
+
+# Hedged requests, overridden per scraper by the "hedging" of SCRAPER_CONFIG : a fetch still running after the
+# "percentile" latency of its host is fired again, for at most "max_fraction" of the requests of a run
+DEFAULT_HEDGING = {"enabled": True, "percentile": 95, "max_fraction": 0.05, "min_samples": 20, "next_tier": False}
+
+# Log file written as JSON lines instead of text, and rate limits of the repetitive messages of each logger
+# (LogRateLimiter options : "rate" messages per second of a same message once "burst" messages are written,
+# one in "sample" messages kept beyond the limit)
+LOG_JSON = False
+LOG_RATE_LIMITS = {
+    "core.base_scraper": {"rate": 5.0, "burst": 50, "sample": 100},
+    "scrapers": {"rate": 5.0, "burst": 50, "sample": 100},
+}
+
+# Folder and formats ("json", "prometheus") of the run metrics export
+METRICS_PATH = "metrics"
+METRICS_FORMATS = ("json", "prometheus")
+
+# Profiling mode (python main.py --profile) : folder of the folded stacks, seconds between two samples and
+# seconds of event loop blocking after which a callback is logged
+PROFILES_PATH = "profiles"
+PROFILING_INTERVAL = 0.005
+LOOP_LAG_THRESHOLD = 0.1
+
+# Archive of the raw pages fetched by the scrapers (compressed with zstd, deduplicated by hash)
+ARCHIVE_ENABLED = True
+ARCHIVE_PATH = "archive"
+
+# SQLite work queue shared by the worker processes of a sharded crawl (python main.py --shards N)
+SHARD_QUEUE_PATH = "work_queue.sqlite"
+
+# Age from which an archived url is scraped again before the urls fetched recently
+FRONTIER_STALE_AFTER = timedelta(days=7)
+
+# Field coverage monitor : historical None rates of the fields of each scraper, pages of the window compared
+# with them, increase of the None rate from which a selector is broken, and fields whose breakage aborts a scraper
+FIELD_COVERAGE_PATH = "field_coverage.json"
+FIELD_COVERAGE_SAMPLE = 20
+FIELD_COVERAGE_MAX_DROP = 0.5
+FIELD_COVERAGE_KEY_FIELDS = ("reference", "area", "adress", "price")
+
+# Harvest mode : summary of the result card and last details of each listing of the scrapers harvesting their result
+# pages, to fetch the detail pages of the new or changed cards only, and rate of cards without surface, location or
+# price from which the card selectors are reported as broken
+CARD_SUMMARIES_PATH = "card_summaries.json"
+CARD_FIELDS_MAX_EMPTY = 0.5
+
 # Updating user_agents list or not
 USER_AGENT_UPDATE = False
 
+# Number of user-agents pages fetched at the same time during an update
+USER_AGENT_REFRESH_CONCURRENCY = 16
+
+# Weight multiplier applied to a user-agent each time it gets blocked by a site
+USER_AGENT_BLOCK_PENALTY = 0.5
+
 # Cache path for user-agents
 FICHIER_CACHE_USER_AGENT = "user_agent.json"
 
+# Cache path for pre-parsed user-agents (browser, version, os), rebuilt when the user-agents cache changes
+FICHIER_CACHE_USER_AGENT_PARSED = "user_agent.parsed.json"
+
 DEPARTMENTS_IDF = ["75", "77", "78", "91", "92", "93", "94", "95"]
+
+# Fallback GPS position (Paris centre) used by the scrapers when a property cannot be located
+DEFAULT_LATITUDE = 48.866669
+DEFAULT_LONGITUDE = 2.33333
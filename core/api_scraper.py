@@ -7,6 +7,7 @@ from core.base_scraper import BaseScraper
 from datas.property import Property
 from scrapling import Selector
 import logging
+from core.politeness import url_origin
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,12 @@ class APIScraper(BaseScraper):
     async def run(self) -> None:
         """Launch the scraper, discover url and scrape all the urls"""
         pass
+
+    def politeness_origins(self) -> list[str]:
+        """Returns the scheme and host of the site and of the API, with the ones of the absolute start_link(s)"""
+        links = self.start_link.values() if isinstance(self.start_link, dict) else [self.start_link]
+        urls = [self.base_url, self.api_url, *links]
+        return list(dict.fromkeys(url_origin(url) for url in urls if url and url_origin(url)))
     
     async def get_data(self, page: Selector, url: str) -> Property|None:
         """Collect data from an HTML page"""
@@ -7,14 +7,35 @@ This module provides a base class for scrapers, defining the common interface an
 from abc import ABC, abstractmethod
 import asyncio
 import inspect
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING, Any, Callable
+from urllib.parse import urlsplit
 from scrapling import Selector
-from scrapling.fetchers import FetcherSession, AsyncStealthySession, AsyncDynamicSession
-from config.squirrel_settings import PROXY, SIMPLE_TIMEOUT, ADVANCED_TIMEOUT
+from config.squirrel_settings import FRONTIER_STALE_AFTER, DEFAULT_HEDGING, TIMEOUT_PERCENTILE, TIMEOUT_MULTIPLIER, TIMEOUT_MIN_SAMPLES, URL_DEADLINE, ROBOTS_TXT_ENABLED
 from config.scrapers_config import ScraperConf
 from datas.property_listing import PropertyListing
 from datas.property import Property
+from datas.page_archive import PageArchive
+from datas.card_summaries import CardSummaryStore
+from core.field_coverage import FieldCoverageMonitor
+from core.scheduler import DEFAULT_BUDGET, CrawlBudget, order_frontier
+from core.latency import HostLatency, AdaptiveTimeouts
+from core.hedging import HedgePolicy
+from core.politeness import RATE_LIMITER, HostRateLimiter, url_origin
+from core.fetch_profiles import resolve_fetch_profile, session_factories, discovery_session_factories, http_discovery_factory
+from core.response_classifier import (
+    BLOCKING_STATUS, ESCALATE_TO_NEXT_TIER, ESCALATE_TO_STEALTHY, OK, PERMANENT_FAILURES, RejectedResponse,
+    classify_response,
+)
 from config.scrapers_selectors import SelectorFields
+from network.user_agents import ListUserAgent
+from utils.metrics import RUN_METRICS, RunMetrics
+from utils.profiling import set_current_activity
 import logging
+import time
+
+if TYPE_CHECKING:  # the fetcher backends are imported by the session factories, on the first use of a tier
+    from scrapling.fetchers import FetcherSession, AsyncStealthySession, AsyncDynamicSession
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +48,9 @@ class BaseScraper(ABC):
         Args:
             config (ScraperConf): Represents a configuration for a scraper with its details
         """
-        self.url_nb:None|int = 5 # used to limit the number of URLs to be scraped
+        self.budget_limits = {**DEFAULT_BUDGET, **(config.get("budget") or {})} # wall time, requests and browser page loads of a run
+        self.budget:CrawlBudget = CrawlBudget(**self.budget_limits)
+        self.unscheduled_urls:list[str] = [] # urls left when the budget runs out
         self.scraper_name = config.get("scraper_name")
         self.enabled = config.get("enabled")
         self.crawler_strategy = config.get("scraper_type")
@@ -35,31 +58,78 @@ class BaseScraper(ABC):
         self.url_strategy = config.get("url_strategy")
         self.selectors:SelectorFields = selectors
         self.listing:PropertyListing = PropertyListing(self.scraper_name)
+        self.user_agents:ListUserAgent|None = None # set by main.py to rotate user-agents on the http session
+        self.metrics:RunMetrics = RUN_METRICS
+        self.archive:PageArchive|None = None # set by main.py to archive the fetched pages
+        self.field_coverage:FieldCoverageMonitor|None = None # set by main.py to abort when selectors break
+        self.card_summaries:CardSummaryStore|None = None # set by main.py for the scrapers harvesting their result cards
+        self.harvest:bool = config.get("harvest", False)
+        self.fetch_profile = resolve_fetch_profile(config.get("fetch_profile"))
+        # Session factories by tier, from the start tier to the most expensive. Can be replaced, e.g. by the benchmarks
+        self.session_factories:dict[str, Callable[[], Any]] = session_factories(self.fetch_profile)
+        # Session factories used to discover the urls, tried in order
+        self.discovery_session_factories:tuple[Callable[[], Any], ...] = discovery_session_factories(self.fetch_profile)
+        # Latencies of the hosts, timeouts adapted to them, and hedging of the requests slower than their tail latency
+        self.latency:HostLatency = HostLatency()
+        self.timeouts:AdaptiveTimeouts = AdaptiveTimeouts(
+            self.latency, self.fetch_profile, TIMEOUT_PERCENTILE, TIMEOUT_MULTIPLIER, TIMEOUT_MIN_SAMPLES,
+        )
+        self.hedging_conf = {**DEFAULT_HEDGING, **(config.get("hedging") or {})}
+        self.hedging:HedgePolicy = HedgePolicy(**self.hedging_conf)
+        # Per host rate limiter shared by every scraper of the process, fed by the rate_limit and the robots.txt
+        self.rate_limiter:HostRateLimiter = RATE_LIMITER
+        self.rate_limit = config.get("rate_limit")
+        self.robots_txt:bool = ROBOTS_TXT_ENABLED
+        # Watchdog : seconds after which the scraping of a url is cancelled, step of each url being scraped, its
+        # watchdog and step at which each cancelled url was stopped
+        self.url_deadline:float = URL_DEADLINE
+        self.url_steps:dict[str, str] = {}
+        self.url_watchdogs:dict[str, asyncio.Timeout] = {}
+        self.deadline_failures:dict[str, str] = {}
     
     async def run(self) -> None:
         """Launch the scraper, discover url and scrape all the urls"""
         concurrency = 8
+        self.budget = CrawlBudget(**self.budget_limits)
+        self.hedging = HedgePolicy(**self.hedging_conf)
+        self.unscheduled_urls = []
+        self.deadline_failures = {}
+        await self.prepare_politeness()
         # Discovery phase
-        logger.info(f"[{self.scraper_name}] is starting to scrape data")
-        urls = await self.url_discovery_strategy()
+        logger.info("[%s] is starting to scrape data", self.scraper_name)
+        with self.metrics.measure(self.scraper_name, "discovery"):
+            urls = await self.url_discovery_strategy()
         if not urls:
-            logger.warning("Cannot find any urls to be scraped")
+            if urls is not None and self.listing.count_properties():
+                logger.info("[%s] no detail page to be scraped", self.scraper_name)
+            else:
+                logger.warning("Cannot find any urls to be scraped")
+            await self.finish_run()
             return None
-        logger.info(f"[{self.scraper_name}] has discovered {len(urls)} urls to be scraped")
+        logger.info("[%s] has discovered %d urls to be scraped", self.scraper_name, len(urls))
 
-        if self.url_nb is not None:    
-            target_urls = urls[:self.url_nb]
-        else:
-            target_urls = urls
+        # New urls first, then the stale ones, then the rest
+        last_fetched = None
+        if self.archive is not None:
+            last_fetched = await asyncio.to_thread(self.archive.last_fetch_times, self.scraper_name)
+        target_urls = order_frontier(urls, last_fetched, FRONTIER_STALE_AFTER)
         logger.info("[%s] %d URL to be scraped", self.scraper_name, len(target_urls))
 
-        async with FetcherSession(timeout=SIMPLE_TIMEOUT, proxy=PROXY) as fetcher_session, AsyncDynamicSession(timeout=SIMPLE_TIMEOUT, proxy=PROXY, locale="fr-FR") as dynamic_session, AsyncStealthySession(timeout=ADVANCED_TIMEOUT, proxy=PROXY, geoip=True, solve_cloudflare=True, disable_ads=True, disable_resources=True, block_webrtc=True, block_images=True, os_randomize=True) as stealthy_session:
-            sessions = (fetcher_session, dynamic_session, stealthy_session)
+        async with AsyncExitStack() as stack:
+            sessions = {
+                tier: await stack.enter_async_context(factory())
+                for tier, factory in self.session_factories.items()
+            }
             sem = asyncio.Semaphore(concurrency) 
 
             async def worker(url: str) -> None:
                 async with sem:
-                    await self._scrape_one(url, sessions)
+                    if self.field_coverage is not None and self.field_coverage.broken:
+                        return
+                    if self.budget.exhausted:
+                        self.unscheduled_urls.append(url)
+                        return
+                    await self._scrape_within_deadline(url, sessions)
 
             tasks = [asyncio.create_task(worker(url)) for url in target_urls]
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -68,38 +138,141 @@ class BaseScraper(ABC):
                 if isinstance(result, Exception):
                     logger.error("Broken task for %s : %r", url, result)
 
+        if self.field_coverage is not None and self.field_coverage.broken:
+            logger.error("[%s] scraping aborted, the selectors of key fields are broken", self.scraper_name)
+        if self.deadline_failures:
+            logger.warning("[%s] %d urls cancelled by the watchdog after %.0f s", self.scraper_name,
+                           len(self.deadline_failures), self.url_deadline)
+        if self.unscheduled_urls:
+            logger.warning("[%s] budget exhausted (%s) after %.0f s, %d requests and %d page loads : %d urls left for the next run",
+                           self.scraper_name, self.budget.reason, self.budget.elapsed(), self.budget.requests,
+                           self.budget.page_loads, len(self.unscheduled_urls))
+        rejected = {kind: count for kind, count in self.metrics.response_counts(self.scraper_name).items() if kind != OK}
+        if rejected:
+            logger.warning("[%s] rejected responses : %s", self.scraper_name,
+                           ", ".join(f"{kind} {count}" for kind, count in rejected.items()))
         logger.info("[%s] scraping  is finished. %d properties collected ; %d fails.",
                     self.scraper_name,
                     self.listing.count_properties(),
                     len(getattr(self.listing, "failed_urls", [])))
+        await self.finish_run()
     
-    async def _scrape_one(self, url: str, sessions: tuple[FetcherSession, AsyncDynamicSession, AsyncStealthySession]) -> None:
+    def politeness_origins(self) -> list[str]:
+        """Returns the scheme and host of the sites whose requests are limited by the rate_limit of the scraper and
+        their robots.txt"""
+        links = self.start_link.values() if isinstance(self.start_link, dict) else [self.start_link]
+        return list(dict.fromkeys(url_origin(link) for link in links if link and url_origin(link)))
+
+    async def prepare_politeness(self) -> None:
+        """Limits the requests to the hosts of the scraper to its rate_limit and the Crawl-delay of their robots.txt,
+        read through the http session of the scraper"""
+        for origin in self.politeness_origins():
+            if self.rate_limit:
+                self.rate_limiter.configure(
+                    origin, self.rate_limit.get("requests_per_second", self.rate_limiter.default[0]),
+                    self.rate_limit.get("burst", 1),
+                )
+            if self.robots_txt:
+                await self.rate_limiter.load_robots(origin, http_discovery_factory(self.fetch_profile))
+
+    async def _scrape_within_deadline(self, url: str, sessions: dict[str, Any]) -> None:
+        """Scrapes a url, cancelled by the watchdog once it exceeds the deadline, and records the step it was at.
+        The waits for the turn of the host in the rate limiter do not count in the deadline"""
+        start = time.perf_counter()
+        self.url_steps[url] = "start"
+        try:
+            async with asyncio.timeout(self.url_deadline) as watchdog:
+                self.url_watchdogs[url] = watchdog
+                await self._scrape_one(url, sessions)
+        except TimeoutError:
+            step = self.url_steps.get(url, "start")
+            self.deadline_failures[url] = step
+            self.listing.failed_urls.append(url)
+            self.metrics.observe(self.scraper_name, "deadline", time.perf_counter() - start, outcome="cancelled")
+            logger.error("Watchdog cancelled %s after %.0f s, during %s", url, self.url_deadline, step)
+        finally:
+            self.url_steps.pop(url, None)
+            self.url_watchdogs.pop(url, None)
+
+    async def _wait_turn(self, url: str, host: str) -> None:
+        """Waits for the turn of a request to the host of a url, the watchdog of the url being postponed by the wait"""
+        delay = self.rate_limiter.reserve(host)
+        if delay <= 0:
+            return
+        watchdog = self.url_watchdogs.get(url)
+        if watchdog is not None and watchdog.when() is not None:
+            watchdog.reschedule(watchdog.when() + delay)
+        await asyncio.sleep(delay)
+
+    async def _scrape_one(self, url: str, sessions: dict[str, "FetcherSession | AsyncDynamicSession | AsyncStealthySession"]) -> None:
         """
         Tente de scraper une URL avec retries par session, puis fallback sur la session suivante.
         Marque l’URL en échec si toutes les tentatives échouent.
         """
         retries = 2
         backoff_base = 0.8
-        
-        for session in sessions:
+        tiers = list(sessions)
+        escalate_to = None # tier the next attempt jumps to, after a challenge or an empty shell
+
+        for tier, session in sessions.items():
+            if escalate_to is not None and tiers.index(tier) < tiers.index(escalate_to):
+                continue
             for attempt in range(1, retries + 1):
+                if not self.budget.acquire(tier):
+                    self.unscheduled_urls.append(url)
+                    logger.info("Budget exhausted (%s), %s left for the next run", self.budget.reason, url)
+                    return
                 try:
-                    html = await self._request(session, url)
-                    property_ = await self.get_data(html, url)
+                    start = time.perf_counter()
+                    self.url_steps[url] = f"fetch on {tier} (try {attempt}/{retries})"
+                    try:
+                        set_current_activity(self.scraper_name, url)
+                        html, tier_used = await self._hedged_request(url, tier, sessions)
+                    except Exception:
+                        self.metrics.observe(self.scraper_name, "fetch", time.perf_counter() - start, tier, "error")
+                        raise
+                    self.metrics.observe(
+                        self.scraper_name, "fetch", time.perf_counter() - start, tier_used, "ok",
+                        len(getattr(html, "body", b"") or b""),
+                    )
+                    self.url_steps[url] = f"extraction on {tier_used}"
+                    with self.metrics.measure(self.scraper_name, "extraction", tier_used):
+                        property_ = await self.get_data(html, url)
                     if property_ is None:
                         raise ValueError("Returned property is None")
+                    self.url_steps[url] = "archive"
+                    await self._archive_page(url, html)
 
                     self.listing.add_property(property_)
+                    if self.field_coverage is not None:
+                        self.field_coverage.observe(property_)
                     logger.info("OK %s by %s (try %d/%d)",
-                                url, type(session).__name__, attempt, 2)
+                                url, type(sessions[tier_used]).__name__, attempt, retries)
                     return
 
                 except Exception as exc:  # noqa: BLE001
+                    kind = exc.kind if isinstance(exc, RejectedResponse) else None
+                    if kind in PERMANENT_FAILURES:
+                        # Retrying or escalating would get the same answer
+                        logger.warning("Failed %s by %s : %s — not retried", url, type(session).__name__, exc)
+                        self.listing.failed_urls.append(url)
+                        return
+                    if kind in ESCALATE_TO_STEALTHY | ESCALATE_TO_NEXT_TIER:
+                        next_tiers = tiers[tiers.index(tier) + 1:]
+                        if kind in ESCALATE_TO_STEALTHY and "stealthy" in next_tiers:
+                            escalate_to = "stealthy"
+                        else:
+                            escalate_to = next_tiers[0] if next_tiers else None
+                        logger.warning("Failed %s by %s : %s — escalated to %s", url, type(session).__name__, exc,
+                                       escalate_to or "no other tier")
+                        self.url_steps[url] = f"escalation after {kind} on {tier}"
+                        break
                     backoff = (backoff_base ** attempt) * attempt
                     logger.warning(
                         "Failed %s by %s (try %d/%d) : %s — retry in %.2fs",
                         url, type(session).__name__, attempt, retries, exc, backoff
                     )
+                    self.url_steps[url] = f"backoff after try {attempt}/{retries} on {tier} : {exc}"
                     await asyncio.sleep(backoff)
 
             logger.info("Fallback on %s for %s", type(session).__name__, url)
@@ -109,7 +282,101 @@ class BaseScraper(ABC):
         self.listing.failed_urls.append(url)
         logger.error("Surrender %s after all tries and backoff", url)
         
-    async def _request(self, session: FetcherSession | AsyncDynamicSession | AsyncStealthySession, url: str) -> Selector:
+    async def _archive_page(self, url: str, page: Selector) -> None:
+        """Stores the raw page in the archive, if any, without blocking the event loop"""
+        if self.archive is None:
+            return
+        body = getattr(page, "body", None)
+        if not body:
+            return
+        try:
+            await asyncio.to_thread(self.archive.store, self.scraper_name, url, body)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Cannot archive %s : %s", url, exc)
+
+    async def _timed_request(self, session: Any, url: str, tier: str) -> Selector:
+        """Fetches a page within the rate limit and the adaptive timeout of its host, records the latency and
+        classifies the response. When the url fetched for the page fails and fetch_failed() changes it, the page is
+        fetched again at once from its new url
+
+        Raises:
+            TimeoutError: If the page is not fetched within the timeout
+            RejectedResponse: If the response is a challenge, a block, a 404, an empty shell... and not the page
+        """
+        target = self.fetch_url(url)
+        try:
+            return await self._timed_fetch(session, url, target, tier)
+        except Exception as exc:
+            if target == url or not self.fetch_failed(url, exc):
+                raise
+        logger.info("%s failed, %s fetched instead", target, self.fetch_url(url))
+        return await self._timed_fetch(session, url, self.fetch_url(url), tier)
+
+    async def _timed_fetch(self, session: Any, url: str, target: str, tier: str) -> Selector:
+        """Fetches the url target of a page within the rate limit and the adaptive timeout of its host, records the
+        latency and classifies the response"""
+        host = urlsplit(url).netloc
+        # Waiting for the turn of the host counts neither in the timeouts nor in the latency
+        await self._wait_turn(url, host)
+        timeout = self.timeouts.timeout(host, tier)
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                page = await self._request(session, target)
+        except TimeoutError:
+            self.timeouts.timed_out(host, tier, timeout)
+            raise TimeoutError(f"No answer from {host} on {tier} within {timeout:.2f}s") from None
+        self.latency.observe(host, tier, time.perf_counter() - start)
+        kind, reason = classify_response(page)
+        self.metrics.count_response(self.scraper_name, tier, kind)
+        if kind != OK:
+            raise RejectedResponse(kind, f"{kind} on {tier} : {reason}")
+        return page
+
+    async def _hedged_request(self, url: str, tier: str, sessions: dict[str, Any]) -> tuple[Selector, str]:
+        """Fetches a page on a tier. If the fetch is still running after the tail latency of the host, a second
+        attempt is fired on the hedge tier : the first successful one is kept and the other one is cancelled.
+
+        Returns:
+            tuple[Selector, str]: Fetched page and tier of the attempt which fetched it
+        """
+        primary = asyncio.create_task(self._timed_request(sessions[tier], url, tier))
+        pending = {primary: tier}
+        try:
+            delay = self.hedging.delay(self.latency, urlsplit(url).netloc, tier)
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+            hedge_tier = self.hedging.hedge_tier(tier, list(sessions))
+            if primary.done() or delay is None or not self.hedging.acquire():
+                return await primary, tier
+            if not self.budget.acquire(hedge_tier):
+                self.hedging.hedges -= 1
+                return await primary, tier
+
+            logger.info("Hedging %s on %s after %.2fs", url, hedge_tier, delay)
+            hedge_start = time.perf_counter()
+            hedge = asyncio.create_task(self._timed_request(sessions[hedge_tier], url, hedge_tier))
+            pending[hedge] = hedge_tier
+            error: BaseException | None = None
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task_tier = pending.pop(task)
+                    if task.exception() is None:
+                        outcome = "won" if task is hedge else "lost"
+                        self.metrics.observe(self.scraper_name, "hedge", time.perf_counter() - hedge_start, hedge_tier, outcome)
+                        return task.result(), task_tier
+                    error = task.exception()
+            self.metrics.observe(self.scraper_name, "hedge", time.perf_counter() - hedge_start, hedge_tier, "error")
+            raise error
+        finally:
+            # The slower attempt, or both when the caller is cancelled
+            unfinished = [task for task in pending if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _request(self, session: "FetcherSession | AsyncDynamicSession | AsyncStealthySession", url: str) -> Selector:
         """Fetch a URL and return a Selector object.
 
         Args:
@@ -127,9 +394,22 @@ class BaseScraper(ABC):
                 f"La session {type(session).__name__} n’expose ni fetch() ni get()"
             )
 
-        result = get(url)  # adding kwargs here : get(url, impersonate='firefox135')
+        host = urlsplit(url).netloc
+        kwargs = {}
+        if self.user_agents is not None:
+            # Same user-agent for every request to a host, with a matching TLS fingerprint
+            kwargs["headers"] = {"User-Agent": self.user_agents.get_user_agent_for_host(host)}
+            impersonate = self.user_agents.impersonate_for_host(host)
+            if impersonate:
+                kwargs["impersonate"] = impersonate
+
+        result = get(url, **kwargs)
         if inspect.isawaitable(result):
-            return await result
+            result = await result
+
+        # The response is classified, and rejected if blocked, by _timed_request
+        if getattr(result, "status", None) in BLOCKING_STATUS and self.user_agents is not None:
+            self.user_agents.report_block(host)
         return result
         
     
@@ -152,6 +432,23 @@ class BaseScraper(ABC):
         """
         pass
 
+    def fetch_url(self, url: str) -> str:
+        """Returns the url fetched for a page, to be overwritten when the site serves its data from another url"""
+        return url
+
+    def fetch_failed(self, url: str, exc: Exception) -> bool:
+        """Hook called when the fetch of fetch_url(url), another url than the page, failed
+
+        Returns:
+            bool: True if the hook changed fetch_url(url), the page being then fetched again at once
+        """
+        return False
+
+    async def finish_run(self) -> None:
+        """Hook called once the urls of a run are scraped, by run() or by the coordinator of a sharded crawl with the
+        merged listing of the workers"""
+        return None
+
     @classmethod
     def global_url_filter(cls, url:str|Selector) -> bool:
         """Add a url filter at the class level"""
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Embedded JSON module.
+This module decodes the JSON embedded in a page (in an attribute of an element or declared in a script) once, with
+orjson when it is installed, and reads the Property fields it holds from their dotted paths.
+"""
+
+import html
+import json
+import logging
+import re
+from typing import Any
+from scrapling import Selector
+from config.scrapers_selectors import EmbeddedJson
+
+try:
+    import orjson
+except ImportError:  # standard library fallback, several times slower on large payloads
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Fields kept as numbers, the other ones are given as text like the CSS selectors
+NUMERIC_FIELDS = ("latitude", "longitude")
+
+
+def loads(text: str | bytes) -> Any:
+    """Decodes a JSON document with the fastest parser available"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def decode_embedded_json(page: Selector, source: EmbeddedJson) -> Any | None:
+    """Returns the JSON embedded in a page, or the page itself when it is a JSON document (like the /_next/data/
+    routes of Next.js), None if it is missing or invalid"""
+    text = None
+    body = getattr(page, "body", None)
+    if body and body.lstrip()[:1] in (b"{", "{"):
+        text = body
+    elif "attribute" in source:
+        node = page.css_first(source["css"])
+        text = node.attrib.get(source["attribute"]) if node else None
+        # The attribute may still hold HTML entities when it was escaped twice
+        if text and "&" in text:
+            text = html.unescape(text)
+    elif "script" in source:
+        script = page.css_first(f"script:contains('{source['script']}')")
+        match = re.search(source["pattern"], script.text, re.DOTALL) if script else None
+        text = match.group(1) if match else None
+    elif "css" in source:
+        node = page.css_first(source["css"])
+        text = node.text if node else None
+    if not text:
+        return None
+    try:
+        # orjson only takes plain strings or bytes, not the str subclass of the scrapling texts
+        return loads(text if isinstance(text, bytes) else str(text))
+    except ValueError as exc:
+        logger.warning("Invalid embedded JSON in %s : %s", page.url, exc)
+        return None
+
+
+def json_path(payload: Any, path: str) -> Any | None:
+    """Returns the value at a dotted path of a JSON document ("markers.0.latitude"), None if it is missing"""
+    value = payload
+    for key in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(key)
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return None
+        if value is None:
+            return None
+    return value
+
+
+def json_fields(payload: Any, fields: dict[str, list[str]]) -> dict[str, Any]:
+    """Returns the Property fields found in a JSON document, from the first of their paths holding a value"""
+    values = {}
+    for field, paths in fields.items():
+        for path in paths:
+            value = json_path(payload, path)
+            if value is None or value == "" or isinstance(value, (dict, list)):
+                continue
+            try:
+                values[field] = float(value) if field in NUMERIC_FIELDS else str(value)
+            except (TypeError, ValueError):
+                continue
+            break
+    return values
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Fetch profiles module.
+This module turns the declarative fetch profile of a scraper (allowed session tiers, starting tier, resource
+blocking, timeouts and wait conditions) into the session factories used to fetch its pages.
+"""
+
+import importlib
+from typing import Any, Callable
+from config.scrapers_config import FetchProfile, TierProfile
+from config.squirrel_settings import DEFAULT_FETCH_PROFILE, PROXY
+
+# Session tiers, from the cheapest to the most expensive
+TIERS = ("http", "dynamic", "stealthy")
+# Options of a tier profile given as is to the browser sessions
+BROWSER_OPTIONS = ("disable_resources", "network_idle", "wait_selector", "wait_selector_state", "wait")
+# Scrapling session class of each tier, imported on the first opening of the tier
+SESSION_CLASSES = {"http": "FetcherSession", "dynamic": "AsyncDynamicSession", "stealthy": "AsyncStealthySession"}
+
+
+def resolve_fetch_profile(profile: FetchProfile | None = None) -> FetchProfile:
+    """Merges the fetch profile of a scraper over the default profile
+
+    Raises:
+        ValueError: If a tier is unknown or the start tier is not allowed
+    """
+    profile = profile or {}
+    resolved: FetchProfile = {
+        "tiers": list(profile.get("tiers", DEFAULT_FETCH_PROFILE["tiers"])),
+        "start_tier": profile.get("start_tier", DEFAULT_FETCH_PROFILE["start_tier"]),
+    }
+    unknown_tiers = set(resolved["tiers"]) - set(TIERS)
+    if unknown_tiers:
+        raise ValueError(f"Unknown session tiers in the fetch profile : {sorted(unknown_tiers)}")
+    if resolved["start_tier"] not in resolved["tiers"]:
+        if "start_tier" in profile:
+            raise ValueError(f"The start tier {resolved['start_tier']} is not an allowed tier")
+        resolved["start_tier"] = resolved["tiers"][0]
+    for tier in TIERS:
+        default: TierProfile = DEFAULT_FETCH_PROFILE.get(tier, {})
+        override: TierProfile = profile.get(tier, {})
+        resolved[tier] = {
+            **default,
+            **override,
+            "options": {**default.get("options", {}), **override.get("options", {})},
+        }
+    return resolved
+
+
+def session_tiers(profile: FetchProfile) -> list[str]:
+    """Returns the tiers tried for each url : the allowed tiers from the start tier, cheapest first"""
+    tiers = [tier for tier in TIERS if tier in profile["tiers"]]
+    return tiers[tiers.index(profile["start_tier"]):]
+
+
+def load_session_class(tier: str) -> type:
+    """Imports the scrapling session class of a tier, the fetcher backends (curl_cffi, playwright, patchright)
+    are only loaded by the tiers actually opened"""
+    return getattr(importlib.import_module("scrapling.fetchers"), SESSION_CLASSES[tier])
+
+
+def session_factory(tier: str, profile: FetchProfile) -> Callable[[], Any]:
+    """Returns a factory opening the session of a tier configured by the profile"""
+    tier_profile: TierProfile = profile[tier]
+    options = dict(tier_profile.get("options", {}))
+    # The adaptive timeout of each request is enforced by the scraper, the session only stops at the ceiling
+    timeout = tier_profile.get("timeout_ceiling", tier_profile.get("timeout"))
+    if tier == "http":
+        if timeout is not None:
+            options["timeout"] = timeout / 1000  # seconds for the http session
+    else:
+        for option in BROWSER_OPTIONS:
+            if option in tier_profile:
+                options[option] = tier_profile[option]
+        if timeout is not None:
+            options["timeout"] = timeout
+
+    def factory():
+        return load_session_class(tier)(proxy=PROXY, **options)
+
+    factory.__name__ = SESSION_CLASSES[tier]
+    return factory
+
+
+class HttpDiscoverySession:
+    """FetcherSession opened for the discovery, with the fetch() of the browser sessions"""
+
+    def __init__(self, **options):
+        self.session = load_session_class("http")(**options)
+        self.client = None
+
+    async def __aenter__(self) -> "HttpDiscoverySession":
+        self.client = await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await self.session.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def fetch(self, url: str) -> Any:
+        """GETs a sitemap or a result page
+
+        Raises:
+            ValueError: If the server answers with an error status
+        """
+        response = await self.client.get(url)
+        status = getattr(response, "status", None)
+        if status is not None and status >= 400:
+            raise ValueError(f"HTTP {status} on {url}")
+        return response
+
+
+def http_discovery_factory(profile: FetchProfile) -> Callable[[], Any]:
+    """Returns a factory opening the http session of the profile for the discovery"""
+    timeout = profile["http"].get("timeout_ceiling", profile["http"].get("timeout"))
+    options = dict(profile["http"].get("options", {}))
+    if timeout is not None:
+        options["timeout"] = timeout / 1000
+
+    def factory():
+        return HttpDiscoverySession(proxy=PROXY, **options)
+
+    factory.__name__ = SESSION_CLASSES["http"]
+    return factory
+
+
+def session_factories(profile: FetchProfile) -> dict[str, Callable[[], Any]]:
+    """Returns the session factories of the tiers tried for each url, in order"""
+    return {tier: session_factory(tier, profile) for tier in session_tiers(profile)}
+
+
+def discovery_session_factories(profile: FetchProfile) -> tuple[Callable[[], Any], ...]:
+    """Returns the factories of the sessions discovering the urls : the browser sessions allowed by the profile, or
+    its http session when it allows no browser"""
+    factories = tuple(session_factory(tier, profile) for tier in TIERS[1:] if tier in profile["tiers"])
+    if not factories:
+        # Sitemaps and result pages of an http only profile are fetched without browser
+        factories = (http_discovery_factory(profile),)
+    return factories
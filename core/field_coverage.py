@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Field coverage module.
+This module follows the rate of None values of each field filled by a CSS selector while a scraper runs, and
+compares it with the historical rate of the scraper to detect the selectors broken by a redesign of the site.
+"""
+
+import json
+import logging
+import os
+from collections import deque
+from dataclasses import fields
+from config.scrapers_selectors import SelectorFields
+from datas.property import Property
+
+logger = logging.getLogger(__name__)
+
+# Selector keys filling a Property field with another name
+SELECTOR_FIELDS = {"global_price": "price"}
+PROPERTY_FIELDS = {field.name for field in fields(Property)}
+
+
+def is_null(value) -> bool:
+    """Returns True for None, empty strings and empty lists"""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, tuple, dict)):
+        return not value
+    return False
+
+
+class FieldCoverageMonitor:
+    """Streaming null rates of the fields of a scraper over its last pages"""
+
+    def __init__(self, scraper_name: str, selectors: SelectorFields, baseline: dict[str, float] | None = None,
+                 sample_size: int = 20, max_drop: float = 0.5, key_fields: tuple[str, ...] = ()):
+        """Initializes the monitor.
+
+        Args:
+            scraper_name (str): Name of the scraper
+            selectors (SelectorFields): CSS selectors of the scraper, only the fields with a selector are followed
+            baseline (dict[str, float] | None): Historical null rate of each field, nothing is reported without it
+            sample_size (int): Number of pages of the window compared with the baseline
+            max_drop (float): Increase of the null rate over the baseline from which a field is broken
+            key_fields (tuple[str, ...]): Fields whose breakage aborts the scraper, every followed field if empty
+        """
+        self.scraper_name = scraper_name
+        self.selectors: dict[str, str] = {}
+        for key, selector in selectors.items():
+            field = SELECTOR_FIELDS.get(key, key)
+            if selector is not None and field in PROPERTY_FIELDS:
+                self.selectors[field] = selector
+        self.baseline = baseline or {}
+        self.sample_size = sample_size
+        self.max_drop = max_drop
+        self.key_fields = tuple(field for field in key_fields if field in self.selectors) or tuple(self.selectors)
+        self.pages = 0
+        self.nulls = {field: 0 for field in self.selectors}
+        self._window: deque[tuple[bool, ...]] = deque(maxlen=sample_size)
+        self.broken_fields: dict[str, tuple[float, float]] = {}
+
+    @property
+    def broken(self) -> bool:
+        """True once a key field has collapsed"""
+        return any(field in self.broken_fields for field in self.key_fields)
+
+    def observe(self, property_: Property) -> bool:
+        """Records the fields of a scraped property, compares the window with the baseline every sample_size pages
+
+        Returns:
+            bool: True if a key field has collapsed
+        """
+        flags = tuple(is_null(getattr(property_, field)) for field in self.selectors)
+        self._window.append(flags)
+        self.pages += 1
+        for field, flag in zip(self.selectors, flags):
+            self.nulls[field] += flag
+        if self.pages % self.sample_size == 0 and not self.broken:
+            self.broken_fields = self.check()
+            if self.broken:
+                logger.error(self.report())
+        return self.broken
+
+    def merge(self, other: "FieldCoverageMonitor") -> None:
+        """Adds the pages observed by the monitor of the same scraper in another process, and its broken fields"""
+        self.pages += other.pages
+        for field, count in other.nulls.items():
+            self.nulls[field] = self.nulls.get(field, 0) + count
+        self._window.extend(other._window)
+        for field, rates in other.broken_fields.items():
+            self.broken_fields.setdefault(field, rates)
+
+    def window_null_rates(self) -> dict[str, float]:
+        """Returns the null rate of each field over the last pages"""
+        if not self._window:
+            return {}
+        return {
+            field: sum(flags[i] for flags in self._window) / len(self._window)
+            for i, field in enumerate(self.selectors)
+        }
+
+    def null_rates(self) -> dict[str, float]:
+        """Returns the null rate of each field over every page of the run"""
+        if not self.pages:
+            return {}
+        return {field: count / self.pages for field, count in self.nulls.items()}
+
+    def check(self) -> dict[str, tuple[float, float]]:
+        """Returns the fields whose null rate over the window exceeds their baseline by more than max_drop
+
+        Returns:
+            dict[str, tuple[float, float]]: Field -> (null rate of the window, baseline null rate)
+        """
+        broken_fields = {}
+        for field, rate in self.window_null_rates().items():
+            reference = self.baseline.get(field)
+            if reference is not None and rate - reference > self.max_drop:
+                broken_fields[field] = (rate, reference)
+        return broken_fields
+
+    def report(self) -> str:
+        """Describes the broken selectors"""
+        lines = [f"[{self.scraper_name}] selectors broken after {self.pages} pages :"]
+        for field, (rate, reference) in self.broken_fields.items():
+            lines.append(f"  {field} : {rate:.0%} None (usually {reference:.0%}) -> {self.selectors[field]}")
+        return "\n".join(lines)
+
+
+class FieldCoverageBaseline:
+    """Historical null rates of each scraper stored in a JSON file"""
+
+    def __init__(self, path: str, smoothing: float = 0.5):
+        """Loads the baseline.
+
+        Args:
+            path (str): Path of the JSON file
+            smoothing (float): Weight of the last run in the updated null rates
+        """
+        self.path = path
+        self.smoothing = smoothing
+        self.null_rates: dict[str, dict[str, float]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.null_rates = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Cannot read the field coverage baseline %s : %s", path, e)
+
+    def get(self, scraper_name: str) -> dict[str, float] | None:
+        """Returns the historical null rates of a scraper"""
+        return self.null_rates.get(scraper_name)
+
+    def update(self, monitor: FieldCoverageMonitor) -> None:
+        """Blends the null rates of a healthy run into the baseline of its scraper"""
+        if monitor.broken or monitor.pages < monitor.sample_size:
+            return
+        previous = self.null_rates.get(monitor.scraper_name, {})
+        self.null_rates[monitor.scraper_name] = {
+            field: rate if field not in previous else previous[field] + (rate - previous[field]) * self.smoothing
+            for field, rate in monitor.null_rates().items()
+        }
+
+    def save(self) -> None:
+        """Writes the baseline"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.null_rates, f, indent=2, sort_keys=True)
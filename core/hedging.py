@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Hedging module.
+This module decides when a slow fetch is hedged : once a request has not completed after the tail latency of its
+host, a second attempt is fired on the same or the next session tier, within a cap on the share of hedged requests.
+"""
+
+from core.latency import HostLatency
+
+
+class HedgePolicy:
+    """Delay before hedging a request and cap on the hedged requests of a run"""
+
+    def __init__(self, enabled: bool = True, percentile: float = 95, max_fraction: float = 0.05, min_samples: int = 20,
+                 next_tier: bool = False):
+        """Initializes the policy.
+
+        Args:
+            enabled (bool): Hedges the slow requests
+            percentile (float): Latency percentile of the host after which a request is hedged
+            max_fraction (float): Maximum share of the requests of the run which are hedged
+            min_samples (int): Latencies of the host needed before hedging its requests
+            next_tier (bool): Hedges on the next session tier instead of the same one
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.next_tier = next_tier
+        self.requests = 0
+        self.hedges = 0
+
+    def delay(self, latency: HostLatency, host: str, tier: str) -> float | None:
+        """Counts a request and returns the seconds after which it is hedged, None if it is never hedged"""
+        self.requests += 1
+        if not self.enabled:
+            return None
+        return latency.percentile(host, tier, self.percentile, self.min_samples)
+
+    def hedge_tier(self, tier: str, tiers: list[str]) -> str:
+        """Returns the session tier of the hedge of a request on a tier"""
+        if self.next_tier and tier in tiers and tiers.index(tier) + 1 < len(tiers):
+            return tiers[tiers.index(tier) + 1]
+        return tier
+
+    def acquire(self) -> bool:
+        """Counts a hedge if the cap on the hedged requests allows it"""
+        if self.hedges + 1 > self.max_fraction * self.requests:
+            return False
+        self.hedges += 1
+        return True
@@ -4,21 +4,24 @@ HTTP Scraper module.
 """
 
 from core.base_scraper import BaseScraper
+from core.politeness import url_host
 import logging
 from config.squirrel_settings import PROXY
 from typing import Any
-from scrapling.fetchers import AsyncStealthySession, AsyncDynamicSession
 from scrapling import Selector
 from datas.property import Property
-from config.scrapers_selectors import SelectorFields
+from config.scrapers_selectors import SelectorFields, EmbeddedJson
+from core.embedded_json import decode_embedded_json, json_fields
 from config.scrapers_config import ScraperConf
 
 logger = logging.getLogger(__name__)
 
 class HTTPScraper(BaseScraper):
     
-    def __init__(self, config: ScraperConf, selectors:SelectorFields):
+    def __init__(self, config: ScraperConf, selectors:SelectorFields, embedded_json:EmbeddedJson|None = None):
         super().__init__(config, selectors)
+        self.embedded_json:EmbeddedJson|None = embedded_json # JSON read before the CSS selectors
+        self.json_first:bool = True # False : the CSS selectors come first and the JSON only fills the fields they miss
         
     async def url_discovery_strategy(self) -> list[str]|None:
         """This method is used to collect the Urls to be scraped.
@@ -39,31 +42,25 @@ class HTTPScraper(BaseScraper):
             logger.info("Fetching urls from a single sitemap")
             urls_discovery.append(self.start_link)
         
-        try:
-            async with AsyncDynamicSession() as session:
-                for url in urls_discovery:
-                    page = await session.fetch(url)
-                    response = page.xpath('//url/loc/text()')
-                    for url in response:
-                        if self.filter_url(url):
-                            responses.append(url)
-        except Exception as e:
-            logger.error(f"AsyncDynamicSession failed: {e}")
+        for session_factory in self.discovery_session_factories:
+            session_name = getattr(session_factory, "__name__", type(session_factory).__name__)
             try:
-                async with AsyncStealthySession() as session:
+                async with session_factory() as session:
                     for url in urls_discovery:
+                        await self.rate_limiter.acquire(url_host(url))
                         page = await session.fetch(url)
                         response = page.xpath('//url/loc/text()')
                         for url in response:
                             if self.filter_url(url):
                                 responses.append(url)
             except Exception as e:
-                logger.error(f"AsyncStealthySession failed: {e}")
-                logger.warning("Both sessions failed to fetch the sitemap(s)")
-                return None
-        else:
-            logger.info(f"Successfully fetched {len(responses)} urls from the sitemap(s)")
-            return responses
+                logger.error("%s failed: %s", session_name, e)
+                responses = []
+            else:
+                logger.info("Successfully fetched %d urls from the sitemap(s)", len(responses))
+                return responses
+        logger.warning("All sessions failed to fetch the sitemap(s)")
+        return None
         
     async def select_text(self, selector, page:Selector) -> Any|None:
         """Helper function to select text from a selector"""
@@ -73,36 +70,59 @@ class HTTPScraper(BaseScraper):
         else:
             return None
         
+    def embedded_payload(self, page: Selector) -> Any | None:
+        """Returns the JSON embedded in a page, None if it is missing"""
+        return decode_embedded_json(page, self.embedded_json)
+
+    def json_values(self, payload: Any) -> dict[str, Any]:
+        """Returns the Property fields held by the embedded JSON of a page, to be overwritten for the fields
+        which cannot be read from a path"""
+        return json_fields(payload, self.embedded_json.get("fields", {}))
+
     async def get_data(self, page: Selector, url:str) -> Property | None:
-        """Collect data from an HTML element
+        """Collect data from an HTML element, from the embedded JSON first and the CSS selectors for the fields it lacks,
+        or the other way round without json_first
         
         Returns:
             Property | None: Represents a Property dataclass with all the data scraped or None if the scraper failed to scrape the data
         """
+        values: dict[str, Any] = {}
+        if self.embedded_json is not None:
+            payload = self.embedded_payload(page)
+            if payload is not None:
+                values = self.json_values(payload)
+
+        async def field(name: str, selector: str | None = None) -> Any | None:
+            if self.json_first and values.get(name) is not None:
+                return values[name]
+            text = await self.select_text(self.selectors.get(selector or name), page)
+            return text if text is not None else values.get(name)
+
         property = Property(
             agency=self.scraper_name,
             url=url,
-            reference=await self.select_text(self.selectors.get("reference"), page),
-            asset_type=await self.select_text(self.selectors.get("asset_type"), page),
-            contract=await self.select_text(self.selectors.get("contract"), page),
-            disponibility=await self.select_text(self.selectors.get("disponibility"), page),
-            area=await self.select_text(self.selectors.get("area"), page),
+            reference=await field("reference"),
+            asset_type=await field("asset_type"),
+            contract=await field("contract"),
+            disponibility=await field("disponibility"),
+            area=await field("area"),
             division=(
-                await self.select_text(self.selectors.get("division"), page)
-                if self.selectors.get("division", None) is not None
+                await field("division")
+                if self.selectors.get("division", None) is not None or "division" in values
                 else "Non divisible"
             ),
-            adress= await self.select_text(self.selectors.get("adress"), page),
-            postal_code= await self.select_text(self.selectors.get("postal_code"), page),
-            contact= await self.select_text(self.selectors.get("contact"), page),
-            resume= await self.select_text(self.selectors.get("resume"), page),
-            amenities= await self.select_text(self.selectors.get("amenities"), page),
-            url_image= await self.select_text(self.selectors.get("url_image"), page),
-            latitude= await self.select_text(self.selectors.get("latitude"), page),
-            longitude= await self.select_text(self.selectors.get("longitude"), page),
-            price= await self.select_text(self.selectors.get("global_price"), page),
+            adress= await field("adress"),
+            postal_code= await field("postal_code"),
+            contact= await field("contact"),
+            resume= await field("resume"),
+            amenities= await field("amenities"),
+            url_image= await field("url_image"),
+            latitude= await field("latitude"),
+            longitude= await field("longitude"),
+            price= await field("price", "global_price"),
         )
-        await self.data_hook(property, page, url)
+        with self.metrics.measure(self.scraper_name, "data_hook"):
+            await self.data_hook(property, page, url)
         return property
     
     async def data_hook(self, property:Property, page:Selector, url:str) -> None:
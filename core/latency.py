@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Latency module.
+This module keeps a rolling window of the fetch latencies observed for each host and session tier, from which
+the tail latency of a host is estimated during a run and the timeouts of its requests are adapted.
+"""
+
+import math
+from collections import defaultdict, deque
+from config.scrapers_config import FetchProfile
+from utils.metrics import percentile
+
+
+class HostLatency:
+    """Rolling window of the fetch latencies of each (host, tier)"""
+
+    def __init__(self, window: int = 200):
+        """Initializes empty windows.
+
+        Args:
+            window (int): Latencies kept for each (host, tier), the oldest ones are dropped
+        """
+        self.window = window
+        self._latencies: dict[tuple[str, str], deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def observe(self, host: str, tier: str, seconds: float) -> None:
+        """Records the latency of a fetch"""
+        self._latencies[(host, tier)].append(seconds)
+
+    def samples(self, host: str, tier: str) -> int:
+        """Returns the number of latencies in the window of a (host, tier)"""
+        return len(self._latencies.get((host, tier), ()))
+
+    def percentile(self, host: str, tier: str, rank: float, min_samples: int = 1) -> float | None:
+        """Returns a percentile of the latencies of a (host, tier), None below min_samples latencies"""
+        latencies = self._latencies.get((host, tier), ())
+        if len(latencies) < max(min_samples, 1):
+            return None
+        return percentile(list(latencies), rank)
+
+
+class AdaptiveTimeouts:
+    """Timeout of each (host, tier) derived from its latencies, within the floor and ceiling of the tier"""
+
+    def __init__(self, latency: HostLatency, profile: FetchProfile, percentile: float = 99, multiplier: float = 2.0,
+                 min_samples: int = 10):
+        """Initializes the timeouts.
+
+        Args:
+            latency (HostLatency): Latencies of the hosts
+            profile (FetchProfile): Resolved fetch profile, giving the initial timeout, floor and ceiling of each tier
+            percentile (float): Latency percentile of the host the timeout is derived from
+            multiplier (float): Margin applied to the latency percentile
+            min_samples (int): Latencies of the host needed before adapting its timeout
+        """
+        self.latency = latency
+        self.profile = profile
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+
+    def timeout(self, host: str, tier: str) -> float:
+        """Returns the timeout in seconds of a request to a host on a tier"""
+        tier_profile = self.profile.get(tier) or {}
+        floor = tier_profile.get("timeout_floor", 0) / 1000
+        ceiling = tier_profile.get("timeout_ceiling", math.inf) / 1000
+        observed = self.latency.percentile(host, tier, self.percentile, self.min_samples)
+        if observed is None:
+            timeout = tier_profile.get("timeout", ceiling * 1000) / 1000
+        else:
+            timeout = observed * self.multiplier
+        return min(max(timeout, floor), ceiling)
+
+    def timed_out(self, host: str, tier: str, timeout: float) -> None:
+        """Records a timed out request as a latency equal to its timeout, a lower bound of the real one"""
+        self.latency.observe(host, tier, timeout)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Politeness module.
+This module spaces the requests sent to each host with a token bucket shared by every scraper of the process, so
+that discovery, detail pages and API paging of one domain never exceed together the rate it allows : the
+Crawl-delay / Request-rate of its robots.txt, the "rate_limit" of the scrapers in SCRAPER_CONFIG, or the default,
+whichever is the slowest.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+from typing import Any, Callable
+from urllib.robotparser import RobotFileParser
+from config.squirrel_settings import DEFAULT_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+def url_host(url: str) -> str:
+    """Returns the host of a url, or the url itself if it is already a host"""
+    return urlsplit(url).netloc or url
+
+
+def url_origin(url: str) -> str | None:
+    """Returns the scheme and host of an absolute url, None for a relative one"""
+    parts = urlsplit(url)
+    return f"{parts.scheme or 'https'}://{parts.netloc}" if parts.netloc else None
+
+
+class HostRateLimiter:
+    """Token bucket of each host : `rate` requests per second with bursts of `burst` requests"""
+
+    def __init__(self, rate: float | None = None, burst: int = 1):
+        """Initializes the limiter.
+
+        Args:
+            rate (float | None): Requests per second to a host without its own limit, unlimited when None
+            burst (int): Requests sent at once to a host without its own limit
+        """
+        self.default = (rate, burst)
+        # Processes sharing the limits of each host, e.g. the workers of a sharded crawl, each one sending its share
+        self.shares = 1
+        self._limits: dict[str, tuple[float, int]] = {}
+        # Theoretical arrival time of the next request of each host (generic cell rate algorithm)
+        self._next_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Hosts whose robots.txt was read, and robots.txt being read
+        self._robots_read: set[str] = set()
+        self._robots_loading: dict[str, asyncio.Event] = {}
+
+    def configure(self, host: str, rate: float, burst: int = 1) -> None:
+        """Limits the requests to a host, the slowest of the default and the limits given by the scrapers or the
+        robots.txt is kept"""
+        host = url_host(host)
+        with self._lock:
+            current = self._limits.get(host) or (self.default if self.default[0] else None)
+            if current is None or rate < current[0]:
+                self._limits[host] = (rate, burst)
+            elif rate == current[0]:
+                self._limits[host] = (rate, min(burst, current[1]))
+
+    def limit(self, host: str) -> tuple[float | None, int]:
+        """Returns the requests per second and burst allowed to a host, divided among the processes sharing them"""
+        rate, burst = self._limits.get(url_host(host), self.default)
+        if rate and self.shares > 1:
+            return rate / self.shares, max(burst // self.shares, 1)
+        return rate, burst
+
+    def reserve(self, host: str) -> float:
+        """Books the next request to a host
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        host = url_host(host)
+        rate, burst = self.limit(host)
+        if not rate:
+            return 0.0
+        interval = 1 / rate
+        with self._lock:
+            now = time.monotonic()
+            next_at = max(self._next_at.get(host, now), now)
+            self._next_at[host] = next_at + interval
+        return max(0.0, next_at - (max(burst, 1) - 1) * interval - now)
+
+    async def acquire(self, host: str) -> None:
+        """Waits for the turn of a request to a host"""
+        delay = self.reserve(host)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def load_robots(self, url: str, session_factory: Callable[[], Any], user_agent: str = "*") -> float | None:
+        """Reads the robots.txt of the host of a url once and limits its requests to its Crawl-delay or Request-rate
+
+        Args:
+            url (str): Url of the host, whose scheme is the one of the robots.txt
+            session_factory (Callable[[], Any]): Factory of the http session of the scraper, with its proxy
+            user_agent (str): User-agent whose rules are read
+
+        Returns:
+            float | None: Requests per second allowed by the robots.txt, None without limit
+        """
+        host = url_host(url)
+        robots_url = f"{urlsplit(url).scheme or 'https'}://{host}/robots.txt"
+        if host in self._robots_read:
+            return None
+        if host in self._robots_loading:
+            await self._robots_loading[host].wait()
+            return None
+        self._robots_loading[host] = asyncio.Event()
+        rate = None
+        try:
+            async with session_factory() as session:
+                response = await session.client.get(robots_url)
+            if response.status == 200:
+                rate = robots_rate(response.body.decode("utf-8", "replace"), user_agent)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Cannot read the robots.txt of %s : %s", host, exc)
+        finally:
+            self._robots_read.add(host)
+            self._robots_loading.pop(host).set()
+        if rate is not None:
+            logger.info("[%s] robots.txt allows %.2f requests per second", host, rate)
+            self.configure(host, rate)
+        return rate
+
+
+def robots_rate(robots_txt: str, user_agent: str = "*") -> float | None:
+    """Returns the requests per second allowed by the Crawl-delay or Request-rate of a robots.txt, None if unset"""
+    parser = RobotFileParser()
+    parser.parse(robots_txt.splitlines())
+    rates = []
+    delay = parser.crawl_delay(user_agent)
+    if delay:
+        rates.append(1 / float(delay))
+    request_rate = parser.request_rate(user_agent)
+    if request_rate and request_rate.seconds:
+        rates.append(request_rate.requests / request_rate.seconds)
+    return min(rates) if rates else None
+
+
+# Limiter shared by every scraper of the process
+RATE_LIMITER = HostRateLimiter(DEFAULT_RATE_LIMIT["requests_per_second"], DEFAULT_RATE_LIMIT["burst"])
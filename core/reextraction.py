@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Offline re-extraction module.
+This module rebuilds the properties of the scrapers from the pages stored in the page archive, by feeding them
+back through the get_data / data_hook of each scraper on every CPU core, without network nor browser. The listings
+harvested from their result card are rebuilt from their last archived detail page, and the properties are sorted by
+url so that two re-extractions of the same archive give the same export.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scrapling import Selector
+from core.base_scraper import BaseScraper
+from core.registry import load_scraper
+from datas.listing_manager import ListingManager
+from datas.page_archive import PageArchive
+from datas.property import Property
+from datas.property_listing import PropertyListing
+
+logger = logging.getLogger(__name__)
+
+# Pages extracted by a worker process per task
+CHUNK_SIZE = 200
+
+# Scrapers and archive opened once per worker process
+_worker_scrapers: dict[str, BaseScraper] = {}
+_worker_archives: dict[str, PageArchive] = {}
+
+
+async def extract_pages(scraper: BaseScraper, archive: PageArchive, pages: list[tuple[str, str]]) -> tuple[list[Property], list[str]]:
+    """Runs the get_data of a scraper on archived pages
+
+    Args:
+        scraper (BaseScraper): Scraper whose extraction is replayed
+        archive (PageArchive): Archive holding the pages
+        pages (list[tuple[str, str]]): Url and hash of each page
+
+    Returns:
+        tuple[list[Property], list[str]]: Extracted properties and urls whose extraction failed
+    """
+    properties, failed_urls = [], []
+    for url, digest in pages:
+        try:
+            property_ = await scraper.get_data(Selector(archive.load(digest), url=url), url)
+            if property_ is None:
+                raise ValueError("Returned property is None")
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Cannot extract %s from the archive : %s", url, exc)
+            failed_urls.append(url)
+        else:
+            properties.append(property_)
+    return properties, failed_urls
+
+
+def _extract_chunk(archive_path: str, scraper_name: str, pages: list[tuple[str, str]]) -> tuple[str, list[Property], list[str]]:
+    """Worker process task extracting a chunk of pages of a scraper"""
+    if scraper_name not in _worker_scrapers:
+        _worker_scrapers[scraper_name] = load_scraper(scraper_name)
+    if archive_path not in _worker_archives:
+        _worker_archives[archive_path] = PageArchive(archive_path)
+    properties, failed_urls = asyncio.run(
+        extract_pages(_worker_scrapers[scraper_name], _worker_archives[archive_path], pages)
+    )
+    return scraper_name, properties, failed_urls
+
+
+def reextract_archive(archive_path: str, scraper_names: list[str], workers: int | None = None, chunk_size: int = CHUNK_SIZE) -> ListingManager:
+    """Rebuilds the listings of the scrapers from the last archived page of each url
+
+    Args:
+        archive_path (str): Folder of the page archive
+        scraper_names (list[str]): Scrapers to re-extract
+        workers (int | None): Number of worker processes, the number of CPU cores by default
+        chunk_size (int): Pages extracted by a worker process per task
+
+    Returns:
+        ListingManager: Listings of the re-extracted properties
+    """
+    archive = PageArchive(archive_path)
+    try:
+        tasks = []
+        for scraper_name in scraper_names:
+            pages = [(url, digest) for url, _, digest in archive.pages(scraper_name)]
+            logger.info("[%s] %d archived pages to re-extract", scraper_name, len(pages))
+            tasks += [(scraper_name, pages[i:i + chunk_size]) for i in range(0, len(pages), chunk_size)]
+    finally:
+        archive.close()
+
+    listings = {scraper_name: PropertyListing(scraper_name) for scraper_name in scraper_names}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(_extract_chunk, archive_path, scraper_name, pages) for scraper_name, pages in tasks]
+        for future in as_completed(futures):
+            scraper_name, properties, failed_urls = future.result()
+            for property_ in properties:
+                listings[scraper_name].add_property(property_)
+            listings[scraper_name].failed_urls.extend(failed_urls)
+
+    listing_manager = ListingManager()
+    for scraper_name, listing in listings.items():
+        # The chunks complete in any order
+        listing.properties.sort(key=lambda property_: property_.url)
+        listing.failed_urls.sort()
+        logger.info("[%s] re-extraction is finished. %d properties collected ; %d fails.",
+                    scraper_name, listing.count_properties(), len(listing.failed_urls))
+        listing_manager.add_listing(listing)
+    return listing_manager
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Scraper registry module.
+This module maps the keys of SCRAPER_CONFIG to the scraper classes and imports the module of a scraper only when
+it is loaded, so that a run only pays for the scrapers (and their fetcher backends) which are enabled.
+"""
+
+import importlib
+from config.scrapers_config import SCRAPER_CONFIG
+from core.base_scraper import BaseScraper
+
+
+def scraper_class_path(scraper_name: str) -> tuple[str, str]:
+    """Returns the module and class name of a scraper : scrapers/<NAME>.py and <NAME>Scraper
+
+    Raises:
+        KeyError: If the scraper is not in SCRAPER_CONFIG
+    """
+    if scraper_name not in SCRAPER_CONFIG:
+        raise KeyError(f"Unknown scraper {scraper_name}, it is not in SCRAPER_CONFIG")
+    return f"scrapers.{scraper_name}", f"{scraper_name}Scraper"
+
+
+def scraper_class(scraper_name: str) -> type[BaseScraper]:
+    """Imports the module of a scraper and returns its class"""
+    module_name, class_name = scraper_class_path(scraper_name)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def load_scraper(scraper_name: str) -> BaseScraper:
+    """Imports and instantiates a scraper"""
+    return scraper_class(scraper_name)()
+
+
+def scraper_names(enabled_only: bool = True, scraper_type: str | None = None) -> list[str]:
+    """Returns the scrapers of SCRAPER_CONFIG, read from the configuration without importing any scraper
+
+    Args:
+        enabled_only (bool): Only the enabled scrapers
+        scraper_type (str | None): Only the scrapers of this type, "HTTP" or "API"
+    """
+    return [
+        scraper_name for scraper_name, config in SCRAPER_CONFIG.items()
+        if (config["enabled"] or not enabled_only)
+        and (scraper_type is None or config["scraper_type"] == scraper_type)
+    ]
+
+
+def load_enabled_scrapers(scraper_type: str | None = None) -> list[BaseScraper]:
+    """Imports and instantiates the enabled scrapers only"""
+    return [load_scraper(scraper_name) for scraper_name in scraper_names(True, scraper_type)]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Response classifier module.
+This module recognizes, before any extraction, the responses which are not the page asked for : Cloudflare or
+DataDome interstitials and captcha pages, hard and soft 404, empty shells waiting for JavaScript, blocks and server
+errors. Only the status, a few headers and small fingerprints of the body are read, so that each class gets its
+reaction : challenges go straight to the stealthy tier, shells to the next tier and permanent failures fail fast.
+"""
+
+import re
+from typing import Any
+
+# Classes of responses
+OK = "ok"
+CHALLENGE = "challenge"  # anti-bot interstitial or captcha page
+BLOCKED = "blocked"  # refused without challenge (403, 429...)
+NOT_FOUND = "not_found"  # 404 / 410
+SOFT_404 = "soft_404"  # "page not found" answered with a 200
+EMPTY = "empty"  # html shell whose content is rendered by JavaScript
+SERVER_ERROR = "server_error"
+
+# Reaction to each class : escalation to the stealthy tier, to the next tier, or failure without retry. The other
+# classes are retried on the same tier
+ESCALATE_TO_STEALTHY = frozenset({CHALLENGE})
+ESCALATE_TO_NEXT_TIER = frozenset({EMPTY})
+PERMANENT_FAILURES = frozenset({NOT_FOUND, SOFT_404})
+
+# HTTP status returned by sites blocking a client
+BLOCKING_STATUS = frozenset({403, 429, 503})
+# Challenge pages, not found pages and empty shells are small : the anti-bot scripts and captcha widgets only mean a
+# challenge in a small page or a refused one, as the listing pages may embed them, and a large page titled "not found"
+# or without visible text is left to the extraction
+CHALLENGE_MAX_BYTES = 30_000
+# Bytes read for the fingerprints of the head of a page (title)
+HEAD_BYTES = 8_192
+# Visible characters below which an html page is an empty shell
+EMPTY_MAX_TEXT = 40
+
+# Title of the Cloudflare interstitials, a challenge whatever the size of the page
+INTERSTITIAL_TITLE = re.compile(rb"<title>\s*(?:Just a moment|Attention Required)", re.IGNORECASE)
+# Markers of the anti-bot pages. The bot detection script injected by Cloudflare in the normal pages is not one
+CHALLENGE_MARKERS = re.compile(
+    rb"cf-chl-|_cf_chl_opt|/cdn-cgi/challenge-platform/(?!scripts/jsd/)|captcha-delivery\.com",
+    re.IGNORECASE,
+)
+# Captcha widgets, also embedded by some contact forms
+CAPTCHA_MARKERS = re.compile(rb"g-recaptcha|h-captcha|hcaptcha\.com|cf-turnstile|px-captcha|geo\.captcha", re.IGNORECASE)
+TITLE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+NOT_FOUND_TITLE = re.compile(
+    r"^\s*404\b|(?:erreur|error|page)\s*404|page (?:introuvable|non trouv[ée]e|inexistante)|n'existe (?:plus|pas)|n.est plus disponible|"
+    r"offre (?:expir[ée]e|indisponible)|not found",
+    re.IGNORECASE,
+)
+HIDDEN_BLOCKS = re.compile(rb"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+TAGS = re.compile(rb"<[^>]*>")
+SCRIPT = re.compile(rb"<script\b", re.IGNORECASE)
+
+
+class RejectedResponse(Exception):
+    """Response which is not the page asked for"""
+
+    def __init__(self, kind: str, reason: str):
+        super().__init__(reason)
+        self.kind = kind
+
+
+def _header(headers: Any, name: str) -> str:
+    """Returns the value of a header whatever the case of its name, an empty string if it is missing"""
+    if not headers:
+        return ""
+    try:
+        items = headers.items()
+    except AttributeError:
+        return ""
+    for key, value in items:
+        if str(key).lower() == name:
+            return str(value).lower()
+    return ""
+
+
+def _body(page: Any) -> bytes | None:
+    """Returns the raw body of a page as bytes, None if the page has no body"""
+    body = getattr(page, "body", None)
+    if isinstance(body, str):
+        return body.encode("utf-8", "ignore")
+    return body
+
+
+def visible_text_length(body: bytes) -> int:
+    """Returns the number of visible characters of an html body, scripts and styles excluded"""
+    text = TAGS.sub(b" ", HIDDEN_BLOCKS.sub(b" ", body))
+    return len(b"".join(text.split()))
+
+
+def classify_response(page: Any) -> tuple[str, str]:
+    """Classifies a fetched page from its status, headers and body
+
+    Args:
+        page (Any): Response of a session, or Selector without status nor headers
+
+    Returns:
+        tuple[str, str]: Class of the response and the reason of the classification
+    """
+    status = getattr(page, "status", None)
+    headers = getattr(page, "headers", None)
+    body = _body(page)
+    if body is None:
+        return OK, "nothing to classify"
+
+    if _header(headers, "cf-mitigated") == "challenge":
+        return CHALLENGE, "Cloudflare challenge (cf-mitigated header)"
+    refused = status in BLOCKING_STATUS
+    small = len(body) < CHALLENGE_MAX_BYTES
+    if INTERSTITIAL_TITLE.search(body[:HEAD_BYTES]) or ((refused or small) and CHALLENGE_MARKERS.search(body)):
+        return CHALLENGE, f"anti-bot interstitial (HTTP {status or 200})"
+    if CAPTCHA_MARKERS.search(body) and (refused or small):
+        return CHALLENGE, f"captcha page (HTTP {status or 200})"
+    if status in (404, 410):
+        return NOT_FOUND, f"HTTP {status}"
+    if refused:
+        server = _header(headers, "server")
+        return BLOCKED, f"HTTP {status}" + (f" from {server}" if server else "")
+    if status is not None and status >= 500:
+        return SERVER_ERROR, f"HTTP {status}"
+
+    start = body.lstrip()[:5].lower()
+    if start[:1] in (b"{", b"[") or start.startswith(b"<?xml"):
+        # JSON routes and sitemaps are not html pages
+        return OK, ""
+    title = TITLE.search(body[:HEAD_BYTES]) if small else None
+    if title:
+        title_text = title.group(1).decode("utf-8", "ignore").strip()
+        if NOT_FOUND_TITLE.search(title_text):
+            return SOFT_404, f"not found page titled {title_text[:80]!r}"
+    # A shell waits for its scripts to render the content, a short page without script is only short. Shells are
+    # small : the visible text of the larger pages is not counted
+    if not body.strip() or (small and SCRIPT.search(body) and visible_text_length(body) < EMPTY_MAX_TEXT):
+        return EMPTY, f"empty shell of {len(body)} bytes"
+    return OK, ""
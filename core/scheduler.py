@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Scheduler module.
+This module orders the urls discovered by a scraper (new urls first, then the stale ones, then the rest) and
+enforces its budget of wall time, requests and browser page loads, so that a run fits a fixed window.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+# Session tiers loading the pages in a browser
+BROWSER_TIERS = ("dynamic", "stealthy")
+
+# Budget of a run, overridden per scraper by the "budget" of its entry in SCRAPER_CONFIG
+DEFAULT_BUDGET = {"max_seconds": 1800, "max_requests": 2000, "max_page_loads": 300}
+
+
+class CrawlBudget:
+    """Wall time, requests and browser page loads allowed to a scraper run, unlimited when None"""
+
+    def __init__(self, max_seconds: float | None = None, max_requests: int | None = None, max_page_loads: int | None = None):
+        """Initializes the budget.
+
+        Args:
+            max_seconds (float | None): Wall time of the run, discovery included
+            max_requests (int | None): Fetch attempts, whatever the session tier
+            max_page_loads (int | None): Fetch attempts through a browser session tier
+        """
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.max_page_loads = max_page_loads
+        self.requests = 0
+        self.page_loads = 0
+        self.started_at = time.monotonic()
+        self.reason: str | None = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the wall time or the requests are spent"""
+        if self.reason in ("max_seconds", "max_requests"):
+            return True
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            self.reason = "max_seconds"
+        elif self.max_requests is not None and self.requests >= self.max_requests:
+            self.reason = "max_requests"
+        return self.reason in ("max_seconds", "max_requests")
+
+    def acquire(self, tier: str) -> bool:
+        """Counts a fetch attempt on a session tier if the budget allows it
+
+        Returns:
+            bool: False if the budget does not allow the attempt
+        """
+        if self.exhausted:
+            return False
+        if tier in BROWSER_TIERS:
+            if self.max_page_loads is not None and self.page_loads >= self.max_page_loads:
+                self.reason = "max_page_loads"
+                return False
+            self.page_loads += 1
+        self.requests += 1
+        return True
+
+
+def order_frontier(urls: list[str], last_fetched: dict[str, str] | None = None, stale_after: timedelta = timedelta(days=7),
+                   now: datetime | None = None) -> list[str]:
+    """Orders the urls to scrape : never fetched first, then fetched before stale_after, oldest first, then the rest
+
+    Args:
+        urls (list[str]): Discovered urls, duplicates are removed
+        last_fetched (dict[str, str] | None): Last fetch time of the urls in ISO format, e.g. from the page archive
+        stale_after (timedelta): Age from which a fetched url is stale
+        now (datetime | None): Current time, now by default
+
+    Returns:
+        list[str]: Urls by priority, in discovery order within the new urls
+    """
+    urls = list(dict.fromkeys(urls))
+    if not last_fetched:
+        return urls
+    stale_before = ((now or datetime.now()) - stale_after).isoformat(timespec="seconds")
+    new = [url for url in urls if url not in last_fetched]
+    fetched = sorted((url for url in urls if url in last_fetched), key=lambda url: last_fetched[url])
+    stale = [url for url in fetched if last_fetched[url] < stale_before]
+    fresh = [url for url in fetched if last_fetched[url] >= stale_before]
+    return new + stale + fresh
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Sharded crawl module.
+This module spreads the urls of the scrapers over several worker processes : the coordinator discovers the urls
+and queues them in a shared SQLite work queue, each worker claims batches of jobs and runs _scrape_one with its
+own sessions, and the coordinator merges the properties written back in the queue into a ListingManager.
+The budget and the rate limits of the scrapers are divided among the workers, whose number is stored in the queue,
+and the jobs of the workers which died are scraped again by a last worker of the coordinator. Each worker sends back
+its run metrics and the field coverage of its scrapers, merged by the coordinator.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from config.squirrel_settings import FRONTIER_STALE_AFTER, FIELD_COVERAGE_SAMPLE, FIELD_COVERAGE_MAX_DROP, FIELD_COVERAGE_KEY_FIELDS
+from core.base_scraper import BaseScraper
+from core.field_coverage import FieldCoverageBaseline, FieldCoverageMonitor
+from core.registry import load_scraper
+from core.scheduler import CrawlBudget, order_frontier
+from core.work_queue import WorkQueue, FAILED, PENDING, UNSCHEDULED
+from datas.card_summaries import CardSummaryStore
+from datas.listing_manager import ListingManager
+from datas.page_archive import PageArchive
+from network.user_agents import ListUserAgent
+from utils.metrics import RUN_METRICS, RunMetrics
+
+logger = logging.getLogger(__name__)
+
+# Urls scraped at the same time by a worker, and jobs claimed at once
+WORKER_CONCURRENCY = 8
+BATCH_SIZE = 16
+
+
+@dataclass
+class WorkerReport:
+    """Outcome of a worker sent back to the coordinator : jobs processed, run metrics and field coverage of each
+    scraper"""
+    processed: int = 0
+    metrics: RunMetrics = field(default_factory=RunMetrics)
+    field_coverage: dict[str, FieldCoverageMonitor] = field(default_factory=dict)
+
+
+def shared_budget_limits(budget_limits: dict[str, Any], shares: int) -> dict[str, Any]:
+    """Returns the share of a worker of the budget of a scraper : its requests and page loads divided among the
+    workers, the wall time being spent by all of them at once"""
+    return {
+        limit: math.ceil(value / shares) if limit != "max_seconds" and value is not None else value
+        for limit, value in budget_limits.items()
+    }
+
+
+def coverage_monitor(scraper: BaseScraper, baselines: dict[str, dict[str, float]]) -> FieldCoverageMonitor:
+    """Returns the field coverage monitor of a scraper, compared with its historical null rates"""
+    return FieldCoverageMonitor(scraper.scraper_name, scraper.selectors, baselines.get(scraper.scraper_name),
+                                FIELD_COVERAGE_SAMPLE, FIELD_COVERAGE_MAX_DROP, FIELD_COVERAGE_KEY_FIELDS)
+
+
+def prepare_scraper(scraper_name: str, configure: Callable[[BaseScraper], None] | None = None, shares: int = 1) -> BaseScraper:
+    """Loads a scraper and applies the configuration hook, e.g. the sessions of the local agency server
+
+    Args:
+        scraper_name (str): Name of the scraper
+        configure (Callable[[BaseScraper], None] | None): Hook applied to the scraper instance
+        shares (int): Workers among which the budget and the rate limits of the scraper are divided
+    """
+    scraper = load_scraper(scraper_name)
+    if configure is not None:
+        configure(scraper)
+    scraper.budget = CrawlBudget(**shared_budget_limits(scraper.budget_limits, shares))
+    scraper.rate_limiter.shares = shares
+    return scraper
+
+
+async def scrape_batch(scraper: BaseScraper, sessions: dict[str, Any], queue: WorkQueue, jobs: list[tuple[int, str, str]]) -> None:
+    """Scrapes a batch of claimed jobs and writes their outcome in the queue"""
+    sem = asyncio.Semaphore(WORKER_CONCURRENCY)
+
+    async def worker(url: str) -> None:
+        async with sem:
+            # The urls left once the selectors of key fields broke wait for the next run, like the budget ones
+            if scraper.budget.exhausted or (scraper.field_coverage is not None and scraper.field_coverage.broken):
+                scraper.unscheduled_urls.append(url)
+                return
+            await scraper._scrape_within_deadline(url, sessions)
+
+    results = await asyncio.gather(*(worker(url) for _, _, url in jobs), return_exceptions=True)
+    for (_, _, url), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error("Broken task for %s : %r", url, result)
+
+    # Outcome of each url, the listing is emptied for the next batch
+    properties = {property_.url: property_ for property_ in scraper.listing.properties}
+    unscheduled = set(scraper.unscheduled_urls)
+    scraper.listing.properties, scraper.listing.failed_urls, scraper.unscheduled_urls = [], [], []
+    for job_id, _, url in jobs:
+        if url in properties:
+            queue.complete(job_id, properties[url])
+        else:
+            queue.release(job_id, UNSCHEDULED if url in unscheduled else FAILED)
+
+
+async def run_worker_async(queue_path: str, worker_name: str, archive_path: str | None = None,
+                           configure: Callable[[BaseScraper], None] | None = None,
+                           coverage_baselines: dict[str, dict[str, float]] | None = None) -> WorkerReport:
+    """Claims and scrapes jobs until the queue has no pending job left
+
+    Args:
+        coverage_baselines (dict[str, dict[str, float]] | None): Historical null rates of each scraper, the field
+            coverage is not followed when None
+
+    Returns:
+        WorkerReport: Jobs processed, run metrics and field coverage of the worker
+    """
+    queue = WorkQueue(queue_path)
+    shares = queue.workers()
+    archive = PageArchive(archive_path) if archive_path else None
+    user_agents = ListUserAgent(enabling_update=False)
+    await user_agents.refresh_user_agents_list()
+    scrapers: dict[str, tuple[BaseScraper, dict[str, Any]]] = {}
+    report = WorkerReport()
+    try:
+        async with AsyncExitStack() as stack:
+            while jobs := queue.claim(worker_name, BATCH_SIZE):
+                scraper_name = jobs[0][1]
+                if scraper_name not in scrapers:
+                    scraper = prepare_scraper(scraper_name, configure, shares)
+                    await scraper.prepare_politeness()
+                    scraper.user_agents = user_agents
+                    scraper.archive = archive
+                    scraper.metrics = report.metrics
+                    if coverage_baselines is not None:
+                        scraper.field_coverage = report.field_coverage[scraper_name] = coverage_monitor(scraper, coverage_baselines)
+                    sessions = {
+                        tier: await stack.enter_async_context(factory())
+                        for tier, factory in scraper.session_factories.items()
+                    }
+                    scrapers[scraper_name] = (scraper, sessions)
+                scraper, sessions = scrapers[scraper_name]
+                await scrape_batch(scraper, sessions, queue, jobs)
+                report.processed += len(jobs)
+    finally:
+        if archive is not None:
+            archive.close()
+        queue.close()
+    logger.info("Worker %s is finished, %d jobs processed", worker_name, report.processed)
+    return report
+
+
+def run_worker(queue_path: str, worker_name: str | None = None, archive_path: str | None = None,
+               configure: Callable[[BaseScraper], None] | None = None,
+               coverage_baselines: dict[str, dict[str, float]] | None = None) -> WorkerReport:
+    """Entry point of a worker process, which may run on another machine sharing the queue file and then takes the
+    share of one of the workers of the crawl"""
+    worker_name = worker_name or f"{socket.gethostname()}-{os.getpid()}"
+    return asyncio.run(run_worker_async(queue_path, worker_name, archive_path, configure, coverage_baselines))
+
+
+async def crawl_sharded(scraper_names: list[str], workers: int, queue_path: str, archive_path: str | None = None,
+                        configure: Callable[[BaseScraper], None] | None = None, stale_after: float = 600,
+                        metrics: RunMetrics | None = None, coverage_baseline: FieldCoverageBaseline | None = None,
+                        card_summaries: CardSummaryStore | None = None) -> ListingManager:
+    """Discovers the urls of the scrapers, scrapes them in worker processes and merges the results
+
+    Args:
+        scraper_names (list[str]): Scrapers to run
+        workers (int): Number of worker processes
+        queue_path (str): Path of the SQLite work queue
+        archive_path (str | None): Folder of the page archive, used to order the urls and store the pages
+        configure (Callable[[BaseScraper], None] | None): Picklable hook applied to each scraper instance
+        stale_after (float): Seconds after which the jobs claimed by a worker of another machine are queued again
+        metrics (RunMetrics | None): Metrics merging the ones of the workers, RUN_METRICS by default
+        coverage_baseline (FieldCoverageBaseline | None): Historical null rates, the listings of the scrapers whose
+            selectors broke are not returned and the baseline is updated with the healthy ones
+        card_summaries (CardSummaryStore | None): Card summaries of the scrapers harvesting their result cards
+
+    Returns:
+        ListingManager: Listings of the scraped properties
+    """
+    metrics = metrics if metrics is not None else RUN_METRICS
+    coverage_baselines = coverage_baseline.null_rates if coverage_baseline is not None else None
+    queue = WorkQueue(queue_path)
+    queue.reset()
+    queue.set_workers(workers)
+    archive = PageArchive(archive_path) if archive_path else None
+    # Scrapers of the discovery, holding the listings harvested from their result cards
+    scrapers: dict[str, BaseScraper] = {}
+    try:
+        for scraper_name in scraper_names:
+            scraper = prepare_scraper(scraper_name, configure)
+            scraper.metrics = metrics
+            scraper.archive = archive
+            scraper.card_summaries = card_summaries
+            await scraper.prepare_politeness()
+            with scraper.metrics.measure(scraper_name, "discovery"):
+                urls = await scraper.url_discovery_strategy()
+            scrapers[scraper_name] = scraper
+            if not urls:
+                if urls is None or not scraper.listing.count_properties():
+                    logger.warning("[%s] Cannot find any urls to be scraped", scraper_name)
+                continue
+            last_fetched = archive.last_fetch_times(scraper_name) if archive is not None else None
+            added = queue.enqueue(scraper_name, order_frontier(urls, last_fetched, FRONTIER_STALE_AFTER))
+            logger.info("[%s] %d urls queued", scraper_name, added)
+
+        loop = asyncio.get_running_loop()
+        hostname = socket.gethostname()
+        worker_names = [f"{hostname}-{i}" for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = [
+                loop.run_in_executor(executor, run_worker, queue_path, worker_name, archive_path, configure, coverage_baselines)
+                for worker_name in worker_names
+            ]
+            results = await asyncio.gather(*pending, return_exceptions=True)
+        reports = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Broken worker : %r", result)
+            else:
+                reports.append(result)
+        # The workers of the pool are gone : their running jobs are put back whatever their age, and the pending jobs
+        # are scraped by a last worker with the whole budget and rate limits
+        requeued = queue.requeue_stale(stale_after, worker_names)
+        if requeued:
+            logger.warning("%d jobs of dead workers are scraped again", requeued)
+        if queue.counts().get(PENDING):
+            queue.set_workers(1)
+            reports.append(await run_worker_async(queue_path, f"{hostname}-drain", archive_path, configure, coverage_baselines))
+
+        listing_manager = ListingManager()
+        for report in reports:
+            metrics.merge(report.metrics)
+        for scraper_name, scraper in scrapers.items():
+            listing = scraper.listing
+            for property_ in queue.results(scraper_name):
+                listing.add_property(property_)
+            listing.failed_urls = queue.urls(scraper_name, FAILED)
+            if coverage_baselines is not None:
+                scraper.field_coverage = coverage_monitor(scraper, coverage_baselines)
+                for report in reports:
+                    if scraper_name in report.field_coverage:
+                        scraper.field_coverage.merge(report.field_coverage[scraper_name])
+            await scraper.finish_run()
+            counts = queue.counts(scraper_name)
+            logger.info("[%s] sharded scraping is finished. %d properties collected ; %d fails ; %d left by the budget.",
+                        scraper_name, listing.count_properties(), counts.get(FAILED, 0), counts.get(UNSCHEDULED, 0))
+            if scraper.field_coverage is not None:
+                if scraper.field_coverage.broken:
+                    logger.error("Properties of %s not exported : %s", scraper_name, scraper.field_coverage.report())
+                    continue
+                coverage_baseline.update(scraper.field_coverage)
+            listing_manager.add_listing(listing)
+    finally:
+        if archive is not None:
+            archive.close()
+        queue.close()
+    return listing_manager
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Work queue module.
+This module provides a work queue of (scraper, url) jobs in a SQLite file shared by the crawl worker processes,
+which claim jobs in batches and write the scraped properties back as the results of their jobs.
+"""
+
+import json
+import sqlite3
+import time
+from dataclasses import asdict
+from datas.property import Property
+
+PENDING, RUNNING, DONE, FAILED, UNSCHEDULED = "pending", "running", "done", "failed", "unscheduled"
+
+
+class WorkQueue:
+    """(scraper, url) jobs and their results in a SQLite file"""
+
+    def __init__(self, path: str, timeout: float = 30):
+        """Opens or creates the queue.
+
+        Args:
+            path (str): Path of the SQLite file, on a disk shared by every worker
+            timeout (float): Seconds waited for the lock of another worker
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                scraper TEXT NOT NULL,
+                url TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                claimed_at REAL,
+                result TEXT,
+                UNIQUE (scraper, url)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority);
+            CREATE TABLE IF NOT EXISTS crawl (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+
+    def reset(self) -> None:
+        """Removes every job of a previous crawl"""
+        self._connection.execute("DELETE FROM jobs")
+        self._connection.execute("DELETE FROM crawl")
+
+    def set_workers(self, workers: int) -> None:
+        """Stores the number of workers of the crawl, among which the budget and rate limits are divided"""
+        self._connection.execute("INSERT OR REPLACE INTO crawl (key, value) VALUES ('workers', ?)", (str(workers),))
+
+    def workers(self) -> int:
+        """Returns the number of workers of the crawl, 1 if it was not stored"""
+        row = self._connection.execute("SELECT value FROM crawl WHERE key = 'workers'").fetchone()
+        return int(row[0]) if row else 1
+
+    def enqueue(self, scraper_name: str, urls: list[str]) -> int:
+        """Adds the urls of a scraper as pending jobs, in priority order
+
+        Returns:
+            int: Number of jobs added, the urls already queued are ignored
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO jobs (scraper, url, priority, status) VALUES (?, ?, ?, ?)",
+                ((scraper_name, url, priority, PENDING) for priority, url in enumerate(urls)),
+            )
+            added = self._connection.total_changes - before
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+        return added
+
+    def claim(self, worker: str, limit: int) -> list[tuple[int, str, str]]:
+        """Claims pending jobs for a worker, the jobs of one scraper at a time, by priority
+
+        Returns:
+            list[tuple[int, str, str]]: Id, scraper and url of each claimed job
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            first = self._connection.execute(
+                "SELECT scraper FROM jobs WHERE status = ? ORDER BY priority, id LIMIT 1", (PENDING,)
+            ).fetchone()
+            jobs = []
+            if first is not None:
+                jobs = self._connection.execute(
+                    "SELECT id, scraper, url FROM jobs WHERE status = ? AND scraper = ? ORDER BY priority, id LIMIT ?",
+                    (PENDING, first[0], limit),
+                ).fetchall()
+                self._connection.executemany(
+                    "UPDATE jobs SET status = ?, worker = ?, claimed_at = ? WHERE id = ?",
+                    ((RUNNING, worker, time.time(), job_id) for job_id, _, _ in jobs),
+                )
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+        return [tuple(job) for job in jobs]
+
+    def complete(self, job_id: int, property_: Property) -> None:
+        """Stores the property scraped by a job"""
+        self._connection.execute(
+            "UPDATE jobs SET status = ?, result = ? WHERE id = ?",
+            (DONE, json.dumps(asdict(property_), ensure_ascii=False), job_id),
+        )
+
+    def release(self, job_id: int, status: str) -> None:
+        """Ends a job without property, FAILED or UNSCHEDULED when the budget of the worker ran out"""
+        self._connection.execute("UPDATE jobs SET status = ? WHERE id = ?", (status, job_id))
+
+    def requeue_stale(self, older_than: float, workers: list[str] | None = None) -> int:
+        """Puts back the jobs claimed for more than older_than seconds by a worker which died
+
+        Args:
+            older_than (float): Seconds after which a running job is stale
+            workers (list[str] | None): Workers known to be dead, whose running jobs are put back whatever their age
+
+        Returns:
+            int: Number of jobs put back
+        """
+        query = "UPDATE jobs SET status = ?, worker = NULL, claimed_at = NULL WHERE status = ? AND (claimed_at < ?"
+        params: tuple = (PENDING, RUNNING, time.time() - older_than)
+        if workers:
+            query += f" OR worker IN ({', '.join('?' * len(workers))})"
+            params += tuple(workers)
+        return self._connection.execute(query + ")", params).rowcount
+
+    def counts(self, scraper_name: str | None = None) -> dict[str, int]:
+        """Returns the number of jobs by status"""
+        query = "SELECT status, COUNT(*) FROM jobs"
+        params: tuple = ()
+        if scraper_name is not None:
+            query += " WHERE scraper = ?"
+            params = (scraper_name,)
+        return dict(self._connection.execute(query + " GROUP BY status", params).fetchall())
+
+    def results(self, scraper_name: str) -> list[Property]:
+        """Returns the properties scraped for a scraper"""
+        rows = self._connection.execute(
+            "SELECT result FROM jobs WHERE scraper = ? AND status = ? ORDER BY priority, id", (scraper_name, DONE)
+        ).fetchall()
+        return [Property(**json.loads(row[0])) for row in rows]
+
+    def urls(self, scraper_name: str, status: str) -> list[str]:
+        """Returns the urls of the jobs of a scraper with a status"""
+        rows = self._connection.execute(
+            "SELECT url FROM jobs WHERE scraper = ? AND status = ? ORDER BY priority, id", (scraper_name, status)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        """Closes the queue"""
+        self._connection.close()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Card summaries module.
+This module keeps, for each listing harvested from the result cards of an agency, the summary of its card (surface,
+location and price, normalized) and the details read on its last detail page, so that only the new listings and the
+cards whose summary changed are fetched again. A card without surface, location or price is always fetched again, as
+its summary would stay the same whatever the listing becomes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import MISSING, asdict, fields
+from typing import Any
+from datas.property import Property
+from datas.property_normalizer import parse_price, parse_surface
+
+logger = logging.getLogger(__name__)
+
+# Raw fields kept from a detail page, the numeric ones (with a default) are filled again by the normalizer
+DETAIL_FIELDS = tuple(field.name for field in fields(Property) if field.default is MISSING)
+
+
+def card_location(card: Property) -> str | None:
+    """Returns the location of a result card, its address or else its postal code"""
+    return card.adress or card.postal_code
+
+
+def summary_complete(card: Property) -> bool:
+    """True if the surface, location and price of a result card were all read"""
+    return bool(card.area and card_location(card) and card.price)
+
+
+def empty_card_fields(cards: list[Property], max_empty: float) -> list[str]:
+    """Returns the fields of the summary (area, location, price) empty on more than max_empty of the cards, a sign
+    that their selector matches nothing"""
+    if not cards:
+        return []
+    values = {"area": [card.area for card in cards], "location": [card_location(card) for card in cards],
+              "price": [card.price for card in cards]}
+    return [field for field, field_values in values.items()
+            if sum(1 for value in field_values if not value) / len(cards) > max_empty]
+
+
+def card_summary(card: Property) -> str:
+    """Returns the fingerprint of the surface, location and price of a result card, insensitive to their formatting
+    ("1 234 m²" and "1234 m2" give the same summary)"""
+    surface = parse_surface(card.area) if card.area else None
+    price = parse_price(card.price) if card.price else (None, None, None)
+    location = card_location(card)
+    location = " ".join(location.split()).lower() if location else None
+    summary = json.dumps([surface, *price, location], ensure_ascii=False)
+    return hashlib.sha1(summary.encode("utf-8")).hexdigest()[:16]
+
+
+class CardSummaryStore:
+    """Card summary and last details of each harvested listing, stored in a JSON file"""
+
+    def __init__(self, path: str):
+        """Loads the store.
+
+        Args:
+            path (str): Path of the JSON file
+        """
+        self.path = path
+        self.cards: dict[str, dict[str, dict[str, Any]]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.cards = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Cannot read the card summaries %s : %s", path, e)
+
+    def unchanged(self, scraper_name: str, card: Property) -> Property | None:
+        """Returns the listing of an unchanged card : its last details updated with the values of the card, None if
+        the card is new, its summary changed or is incomplete"""
+        if not summary_complete(card):
+            return None
+        known = self.cards.get(scraper_name, {}).get(card.url)
+        if known is None or known.get("summary") != card_summary(card):
+            return None
+        details = {field: known.get("details", {}).get(field) for field in DETAIL_FIELDS}
+        card_values = {field: value for field, value in asdict(card).items() if field in DETAIL_FIELDS and value is not None}
+        return Property(**{**details, **card_values})
+
+    def record(self, scraper_name: str, card: Property, details: Property) -> None:
+        """Stores the summary of a card and the details read on its detail page"""
+        self.cards.setdefault(scraper_name, {})[card.url] = {
+            "summary": card_summary(card),
+            "details": {field: value for field, value in asdict(details).items() if field in DETAIL_FIELDS},
+        }
+
+    def forget(self, scraper_name: str, urls: set[str]) -> None:
+        """Drops the listings of a scraper which are not on its result pages anymore"""
+        known = self.cards.get(scraper_name, {})
+        for url in set(known) - urls:
+            del known[url]
+
+    def save(self) -> None:
+        """Writes the store"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.cards, f, ensure_ascii=False, indent=2, sort_keys=True)
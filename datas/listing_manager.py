@@ -5,6 +5,8 @@ Listing manager class
 
 from datas.property_listing import PropertyListing
 from datas.property import Property
+from datas.property_normalizer import PropertyNormalizer
+from datas.spatial_index import SpatialIndex
 
 class ListingManager:
     """Manages the property listings."""
@@ -12,14 +14,55 @@ class ListingManager:
     def __init__(self):
         """Initializes the listing manager."""
         self.listings: dict[str, PropertyListing] = {}
+        self.normalizer = PropertyNormalizer()
+        self.spatial_index = SpatialIndex()
         
     def add_listing(self, property_listing) -> None:
         """Adds a new property listing to the manager.
         
+        The numeric fields of its properties are normalized for the whole listing at once and
+        the properties are added to the spatial index.
+
         Returns:
             property_listing (PropertyListing): The created property listing instance.
         """
+        self.normalizer.normalize(property_listing.properties)
+        previous_listing = self.listings.get(property_listing.name_agency_listing)
+        if previous_listing is not None:
+            for prop in previous_listing.properties:
+                self.spatial_index.remove(prop)
+        for prop in property_listing.properties:
+            self.spatial_index.add(prop)
         self.listings[property_listing.name_agency_listing] = property_listing
+
+    def properties_within_radius(self, latitude: float, longitude: float, radius: float) -> list[tuple[Property, float]]:
+        """Returns the properties within a radius around a position.
+
+        Args:
+            latitude (float): Latitude of the center
+            longitude (float): Longitude of the center
+            radius (float): Radius in meters
+
+        Returns:
+            list[tuple[Property, float]]: Properties and their distance in meters, closest first.
+        """
+        return self.spatial_index.within_radius(latitude, longitude, radius)
+
+    def properties_in_bbox(self, min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float) -> list[Property]:
+        """Returns the properties inside a bounding box.
+
+        Returns:
+            list[Property]: Properties located inside the bounding box.
+        """
+        return self.spatial_index.in_bbox(min_latitude, min_longitude, max_latitude, max_longitude)
+
+    def nearest_properties(self, latitude: float, longitude: float, k: int = 1) -> list[tuple[Property, float]]:
+        """Returns the k nearest properties from a position.
+
+        Returns:
+            list[tuple[Property, float]]: Properties and their distance in meters, closest first.
+        """
+        return self.spatial_index.nearest(latitude, longitude, k)
     
     def get_all_properties(self) -> list[Property]:
         """Returns all properties from all listings.
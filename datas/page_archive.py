@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Page archive module
+This module stores the raw pages fetched by the scrapers in a local content-addressed archive : each page is
+compressed once under its sha256 hash, and a SQLite index records every (agency, url, fetch time) with the hash
+of the page, so that the properties can be re-extracted and debugged from disk instead of the network.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterator
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback, the codec of each page is kept in its file extension
+    zstandard = None
+
+
+class PageArchive:
+    """Content-addressed archive of raw pages indexed by agency, url and fetch time"""
+
+    def __init__(self, path: str, compression_level: int = 10, timeout: float = 30):
+        """Opens or creates the archive.
+
+        Args:
+            path (str): Folder of the archive, holding 'index.sqlite' and the compressed pages in 'objects/'
+            compression_level (int): zstd level (zlib level capped to 9 without zstandard)
+            timeout (float): Seconds waited for the lock of another process, e.g. a worker of a sharded crawl
+        """
+        self.path = path
+        self.objects_path = os.path.join(path, "objects")
+        if not os.path.exists(self.objects_path):
+            os.makedirs(self.objects_path)
+        if zstandard is not None:
+            self.extension = ".zst"
+            self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        else:
+            self.extension = ".zlib"
+            self._compressor = None
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(path, "index.sqlite"), timeout=timeout, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                agency TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pages_agency_url ON pages (agency, url, fetched_at);
+            CREATE INDEX IF NOT EXISTS pages_hash ON pages (hash);
+            """
+        )
+
+    def _object_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.objects_path, digest[:2], digest[2:] + extension)
+
+    def _compress(self, body: bytes) -> bytes:
+        if self._compressor is not None:
+            return self._compressor.compress(body)
+        return zlib.compress(body, min(self.compression_level, 9))
+
+    def store(self, agency: str, url: str, body: bytes, fetched_at: datetime | None = None) -> str:
+        """Archives a fetched page, its content is written only if no page with the same hash is stored
+
+        Args:
+            agency (str): Name of the scraper
+            url (str): Url of the page
+            body (bytes): Raw content of the page
+            fetched_at (datetime | None): Fetch time, now by default
+
+        Returns:
+            str: sha256 hash of the page
+        """
+        digest = hashlib.sha256(body).hexdigest()
+        fetched_at = (fetched_at or datetime.now()).isoformat(timespec="seconds")
+        if self.find_object(digest) is None:
+            object_path = self._object_path(digest, self.extension)
+            directory = os.path.dirname(object_path)
+            if not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            # Written under a temporary name so that a crash never leaves a truncated page under its hash
+            temporary_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "wb") as f:
+                f.write(self._compress(body))
+            os.replace(temporary_path, object_path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO pages (agency, url, fetched_at, hash, size) VALUES (?, ?, ?, ?, ?)",
+                (agency, url, fetched_at, digest, len(body)),
+            )
+        return digest
+
+    def refer(self, agency: str, url: str, fetched_at: datetime | None = None) -> str | None:
+        """Records a new fetch of a url whose page was not fetched again as it did not change, pointing to its last
+        archived page
+
+        Returns:
+            str | None: Hash of the page, None if the url was never archived
+        """
+        latest = self.latest(agency, url)
+        if latest is None:
+            return None
+        _, digest = latest
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT size FROM pages WHERE hash = ? LIMIT 1", (digest,)
+            ).fetchone()
+            self._connection.execute(
+                "INSERT INTO pages (agency, url, fetched_at, hash, size) VALUES (?, ?, ?, ?, ?)",
+                (agency, url, (fetched_at or datetime.now()).isoformat(timespec="seconds"), digest, row[0]),
+            )
+        return digest
+
+    def find_object(self, digest: str) -> str | None:
+        """Returns the path of the compressed page of a hash, None if it is not archived"""
+        for extension in (".zst", ".zlib"):
+            object_path = self._object_path(digest, extension)
+            if os.path.exists(object_path):
+                return object_path
+        return None
+
+    def load(self, digest: str) -> bytes:
+        """Returns the raw content of an archived page
+
+        Raises:
+            KeyError: If no page is archived under this hash
+        """
+        object_path = self.find_object(digest)
+        if object_path is None:
+            raise KeyError(f"No archived page for hash {digest}")
+        with open(object_path, "rb") as f:
+            data = f.read()
+        if object_path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError("The zstandard package is required to read the pages compressed with zstd")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def latest(self, agency: str, url: str) -> tuple[str, str] | None:
+        """Returns the last fetch time and hash of a url, None if it was never archived"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT fetched_at, hash FROM pages WHERE agency = ? AND url = ? ORDER BY fetched_at DESC LIMIT 1",
+                (agency, url),
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def pages(self, agency: str, latest_only: bool = True) -> Iterator[tuple[str, str, str]]:
+        """Iterates over the archived pages of an agency
+
+        Args:
+            agency (str): Name of the scraper
+            latest_only (bool): Only the last fetch of each url
+
+        Yields:
+            tuple[str, str, str]: url, fetch time and hash of each page
+        """
+        if latest_only:
+            query = (
+                "SELECT url, MAX(fetched_at), hash FROM pages WHERE agency = ? GROUP BY url ORDER BY url"
+            )
+        else:
+            query = "SELECT url, fetched_at, hash FROM pages WHERE agency = ? ORDER BY url, fetched_at"
+        with self._lock:
+            rows = self._connection.execute(query, (agency,)).fetchall()
+        yield from (tuple(row) for row in rows)
+
+    def last_fetch_times(self, agency: str) -> dict[str, str]:
+        """Returns the last fetch time in ISO format of each archived url of an agency"""
+        return {url: fetched_at for url, fetched_at, _ in self.pages(agency)}
+
+    def agencies(self) -> list[str]:
+        """Returns the agencies having archived pages"""
+        with self._lock:
+            rows = self._connection.execute("SELECT DISTINCT agency FROM pages ORDER BY agency").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        """Closes the index"""
+        with self._lock:
+            self._connection.close()
@@ -26,4 +26,10 @@ class Property:
     url_image:Optional[str]
     latitude:Optional[float]
     longitude:Optional[float]
-    price:Optional[str]
\ No newline at end of file
+    price:Optional[str]
+    # Numeric fields filled by the PropertyNormalizer
+    surface:Optional[float] = None
+    min_division:Optional[float] = None
+    price_amount:Optional[float] = None
+    price_unit:Optional[str] = None
+    price_period:Optional[str] = None
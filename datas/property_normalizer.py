@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Property normalizer module
+This module turns the raw area, division and price strings scraped by every agency into numeric fields.
+Raw values are parsed once per distinct string for a whole listing, so filters and price per m² maths only read floats.
+"""
+
+import re
+from typing import Optional
+from datas.property import Property
+
+# "1 234,5" / "1.234" / "1234" / "2,00" (spaces can be regular, non-breaking or narrow non-breaking spaces)
+_NUMBER = r"\d{1,3}(?:[ \u00a0\u202f.]\d{3})+(?:,\d+)?|\d+(?:[.,]\d+)?"
+_SQUARE_METER = r"m(?:²|2)"
+_PERIOD = r"(?:année|annuel|an|mensuel|mois|year|month)\b"
+
+SURFACE_PATTERN = re.compile(rf"({_NUMBER})\s*{_SQUARE_METER}", re.IGNORECASE)
+DIVISION_PATTERN = re.compile(
+    rf"\b(?:à partir de|a partir de|dès|des|min(?:imum)?)\b\.?\s*:?\s*({_NUMBER})\s*{_SQUARE_METER}",
+    re.IGNORECASE,
+)
+# "de 100 à 500 m²" / "entre 100 et 500 m2" / "100 - 500 m²" : the lower bound is the minimum division
+RANGE_PATTERN = re.compile(
+    rf"({_NUMBER})\s*(?:{_SQUARE_METER})?\s*(?:à|a|et|-|–)\s*({_NUMBER})\s*{_SQUARE_METER}",
+    re.IGNORECASE,
+)
+NON_DIVISIBLE_PATTERN = re.compile(r"non[\s-]*divisible", re.IGNORECASE)
+PRICE_PATTERN = re.compile(
+    rf"({_NUMBER})\s*(?P<multiplier>(?-i:M|k)|millions?(?:\s*d')?)?\s*(?:€|eur(?:os?)?)"
+    rf"(?P<taxes>(?:\s*(?:HT|HC|TTC|CC))*)"
+    # "€/m²/an" as well as "€/an/m²"
+    rf"(?:\s*/\s*(?P<period_first>{_PERIOD})(?=\s*/\s*{_SQUARE_METER}))?"
+    rf"\s*(?P<per_m2>/\s*{_SQUARE_METER})?"
+    rf"(?:\s*/\s*(?P<period>{_PERIOD}))?",
+    re.IGNORECASE,
+)
+_SEPARATORS = re.compile(r"[ \u00a0\u202f]")
+# Price written without currency, like "500000"
+BARE_PRICE_PATTERN = re.compile(rf"\s*({_NUMBER})\s*")
+MULTIPLIERS = {"m": 1_000_000, "million": 1_000_000, "millions": 1_000_000, "k": 1_000}
+
+PERIODS_MAP = {
+    "an": "year",
+    "année": "year",
+    "annuel": "year",
+    "year": "year",
+    "mois": "month",
+    "mensuel": "month",
+    "month": "month",
+}
+
+
+def parse_number(raw: str) -> float:
+    """Converts a french formatted number into a float
+
+    Args:
+        raw (str): Number like "1 234", "1.234" or "2,00"
+
+    Returns:
+        float: The parsed number
+    """
+    number = _SEPARATORS.sub("", raw)
+    if "," in number:
+        number = number.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(?:\.\d{3})+", number):
+        number = number.replace(".", "")
+    return float(number)
+
+
+def parse_surface(raw: str) -> Optional[float]:
+    """Returns the largest surface in m² found in a raw area string, None if there is not any"""
+    surfaces = [parse_number(match.group(1)) for match in SURFACE_PATTERN.finditer(raw)]
+    return max(surfaces) if surfaces else None
+
+
+def parse_min_division(raw: str) -> Optional[float]:
+    """Returns the minimum divisible surface in m² found in a raw division string, None if there is not any"""
+    match = DIVISION_PATTERN.search(raw)
+    if match:
+        return parse_number(match.group(1))
+    match = RANGE_PATTERN.search(raw)
+    if match:
+        return min(parse_number(match.group(1)), parse_number(match.group(2)))
+    surfaces = [parse_number(match.group(1)) for match in SURFACE_PATTERN.finditer(raw)]
+    return min(surfaces) if surfaces else None
+
+
+def parse_price(raw: str) -> tuple[Optional[float], Optional[str], Optional[str]]:
+    """Parses a raw price string
+
+    Args:
+        raw (str): Price like "1 700 000 €", "2,5 M€", "500000" or "250 €/m²/an HT HC"
+
+    Returns:
+        tuple[Optional[float], Optional[str], Optional[str]]: Amount, unit ("€" or "€/m²") and period ("year", "month" or None)
+    """
+    match = PRICE_PATTERN.search(raw)
+    if not match:
+        bare = BARE_PRICE_PATTERN.fullmatch(raw)
+        return (parse_number(bare.group(1)), "€", None) if bare else (None, None, None)
+    amount = parse_number(match.group(1))
+    multiplier = match.group("multiplier")
+    if multiplier:
+        amount *= MULTIPLIERS[multiplier.split()[0].lower()]
+    unit = "€/m²" if match.group("per_m2") else "€"
+    period = match.group("period") or match.group("period_first")
+    if period is None:
+        # Some agencies write the period after the taxes, like "250 € HT HC / m² / an" or "250 € HT / an / m²"
+        tail = re.search(rf"/\s*({_PERIOD})", raw[match.end():], re.IGNORECASE)
+        period = tail.group(1) if tail else None
+        if unit == "€" and re.match(
+            rf"\s*(?:HT|HC|TTC|CC|\s)*(?:/\s*{_PERIOD}\s*)?/\s*{_SQUARE_METER}", raw[match.end():], re.IGNORECASE
+        ):
+            unit = "€/m²"
+    return amount, unit, PERIODS_MAP.get(period.lower()) if period else None
+
+
+class PropertyNormalizer:
+    """Batch normalizer filling the numeric fields of Property objects.
+
+    Each distinct raw string is parsed a single time and memoized, as listings repeat the same values
+    ("Non divisible", "Nous consulter", ...) many times.
+    """
+
+    def __init__(self):
+        """Initializes the normalizer caches."""
+        self._surfaces: dict[str, Optional[float]] = {}
+        self._divisions: dict[str, Optional[float]] = {}
+        self._prices: dict[str, tuple[Optional[float], Optional[str], Optional[str]]] = {}
+
+    def normalize(self, properties: list[Property]) -> list[Property]:
+        """Fills surface, min_division, price_amount, price_unit and price_period for a whole list of properties
+
+        Args:
+            properties (list[Property]): Properties to normalize, modified in place
+
+        Returns:
+            list[Property]: The same properties, for chaining
+        """
+        areas = [self._as_text(prop.area) for prop in properties]
+        divisions = [self._as_text(prop.division) for prop in properties]
+        prices = [self._as_text(prop.price) for prop in properties]
+
+        # Parse distinct raw values only
+        for raw in set(areas).difference(self._surfaces):
+            self._surfaces[raw] = parse_surface(raw) if raw else None
+        for raw in set(divisions).difference(self._divisions):
+            self._divisions[raw] = parse_min_division(raw) if raw and not NON_DIVISIBLE_PATTERN.search(raw) else None
+        for raw in set(prices).difference(self._prices):
+            self._prices[raw] = parse_price(raw) if raw else (None, None, None)
+
+        for prop, area, division, price in zip(properties, areas, divisions, prices):
+            prop.surface = self._surfaces[area]
+            # A non divisible property can only be rented or bought as a whole, other divisions without surface
+            # ("Oui", "Nous consulter") are unknown
+            if self._divisions[division] is None and NON_DIVISIBLE_PATTERN.search(division):
+                prop.min_division = prop.surface
+            else:
+                prop.min_division = self._divisions[division]
+            prop.price_amount, prop.price_unit, prop.price_period = self._prices[price]
+        return properties
+
+    @staticmethod
+    def _as_text(value) -> str:
+        """Returns the raw value as a single string ("" for missing values)"""
+        if value is None:
+            return ""
+        if isinstance(value, (list, tuple)):
+            return " ".join(str(item) for item in value)
+        return str(value)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Spatial index module
+This module defines the SpatialIndex class, a uniform grid over latitude/longitude used to answer
+radius, bounding-box and k-nearest queries on properties without scanning every property.
+"""
+
+import heapq
+import math
+from typing import Optional
+from datas.property import Property
+from config.squirrel_settings import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+
+EARTH_RADIUS = 6_371_000  # meters
+METERS_PER_DEGREE = 111_320  # meters for one degree of latitude
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great-circle distance in meters between two GPS positions"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def property_coordinates(property: Property) -> Optional[tuple[float, float]]:
+    """Returns the (latitude, longitude) of a property as floats
+
+    Returns:
+        Optional[tuple[float, float]]: None if the position is missing, invalid or the fallback position used by the scrapers
+    """
+    try:
+        latitude = float(property.latitude)
+        longitude = float(property.longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    if math.isclose(latitude, DEFAULT_LATITUDE) and math.isclose(longitude, DEFAULT_LONGITUDE):
+        return None
+    return latitude, longitude
+
+
+class SpatialIndex:
+    """Uniform grid index over the properties GPS positions."""
+
+    def __init__(self, cell_size: float = 0.01):
+        """Initializes an empty index.
+
+        Args:
+            cell_size (float): Size of a grid cell in degrees (0.01° is about 1.1 km in latitude)
+        """
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[tuple[float, float, Property]]] = {}
+        self.size = 0
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def add(self, property: Property) -> bool:
+        """Indexes a property
+
+        Returns:
+            bool: True if the property has been indexed, False if it has no usable position
+        """
+        coordinates = property_coordinates(property)
+        if coordinates is None:
+            return False
+        latitude, longitude = coordinates
+        self.cells.setdefault(self._cell(latitude, longitude), []).append((latitude, longitude, property))
+        self.size += 1
+        return True
+
+    def remove(self, property: Property) -> bool:
+        """Removes a property from the index
+
+        Returns:
+            bool: True if the property was indexed
+        """
+        coordinates = property_coordinates(property)
+        if coordinates is None:
+            return False
+        cell = self._cell(*coordinates)
+        entries = self.cells.get(cell, [])
+        for position, entry in enumerate(entries):
+            if entry[2] is property:
+                del entries[position]
+                if not entries:
+                    del self.cells[cell]
+                self.size -= 1
+                return True
+        return False
+
+    def _cell_entries(self, min_row: int, min_col: int, max_row: int, max_col: int):
+        """Yields the entries of the occupied cells of a range of rows and columns, looking up each cell of the range
+        or scanning the occupied cells, whichever is shorter"""
+        if (max_row - min_row + 1) * (max_col - min_col + 1) <= len(self.cells):
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    yield from self.cells.get((row, col), ())
+        else:
+            for (row, col), entries in self.cells.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col:
+                    yield from entries
+
+    def in_bbox(self, min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float) -> list[Property]:
+        """Returns the properties inside a bounding box"""
+        min_row, min_col = self._cell(min_latitude, min_longitude)
+        max_row, max_col = self._cell(max_latitude, max_longitude)
+        return [
+            property
+            for latitude, longitude, property in self._cell_entries(min_row, min_col, max_row, max_col)
+            if min_latitude <= latitude <= max_latitude and min_longitude <= longitude <= max_longitude
+        ]
+
+    def within_radius(self, latitude: float, longitude: float, radius: float) -> list[tuple[Property, float]]:
+        """Returns the properties within a radius around a position
+
+        Args:
+            latitude (float): Latitude of the center
+            longitude (float): Longitude of the center
+            radius (float): Radius in meters
+
+        Returns:
+            list[tuple[Property, float]]: Properties and their distance in meters, closest first
+        """
+        d_lat = radius / METERS_PER_DEGREE
+        d_lon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+        min_row, min_col = self._cell(latitude - d_lat, longitude - d_lon)
+        max_row, max_col = self._cell(latitude + d_lat, longitude + d_lon)
+        results = []
+        for lat, lon, property in self._cell_entries(min_row, min_col, max_row, max_col):
+            distance = haversine_distance(latitude, longitude, lat, lon)
+            if distance <= radius:
+                results.append((property, distance))
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def _ring_cells(self, center_row: int, center_col: int, ring: int):
+        """Yields the cells on the edge of the square of cells at `ring` cells around a center cell"""
+        if ring == 0:
+            yield center_row, center_col
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield center_row - ring, col
+            yield center_row + ring, col
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield row, center_col - ring
+            yield row, center_col + ring
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> list[tuple[Property, float]]:
+        """Returns the k nearest properties from a position
+
+        The grid is searched ring by ring around the cell of the position, visiting only the edge of each ring, and
+        the search stops once no unvisited cell can hold a closer property than the k-th one found. Once the square of
+        the rings has more cells than the grid has occupied cells, the remaining occupied cells are visited by ring
+        instead.
+
+        Returns:
+            list[tuple[Property, float]]: Properties and their distance in meters, closest first
+        """
+        if k <= 0 or not self.cells:
+            return []
+        center_row, center_col = self._cell(latitude, longitude)
+        # Smallest width of a cell in meters over the latitudes of the grid and of the position, used as a lower bound
+        # of the distance to a ring
+        rows = [row for row, _ in self.cells]
+        highest = max(abs(latitude), abs(min(rows) * self.cell_size), abs((max(rows) + 1) * self.cell_size))
+        cell_width = self.cell_size * METERS_PER_DEGREE * max(math.cos(math.radians(min(highest, 90))), 1e-6)
+        heap: list[tuple[float, int, Property]] = []  # max-heap on distance through negative values
+
+        def visit(entries) -> None:
+            for lat, lon, property in entries:
+                distance = haversine_distance(latitude, longitude, lat, lon)
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, id(property), property))
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, id(property), property))
+
+        def done(ring: int) -> bool:
+            return len(heap) == k and ring > 0 and (ring - 1) * cell_width > -heap[0][0]
+
+        ring = 0
+        # The rings cost as many lookups as their square has cells : past the number of occupied cells, scanning the
+        # occupied cells is cheaper
+        while (2 * ring + 1) ** 2 <= len(self.cells):
+            if done(ring):
+                break
+            for cell in self._ring_cells(center_row, center_col, ring):
+                visit(self.cells.get(cell, ()))
+            ring += 1
+        else:
+            rings = {cell: max(abs(cell[0] - center_row), abs(cell[1] - center_col)) for cell in self.cells}
+            remaining = sorted((cell_ring, cell) for cell, cell_ring in rings.items() if cell_ring >= ring)
+            for cell_ring, cell in remaining:
+                if done(cell_ring):
+                    break
+                visit(self.cells[cell])
+        return sorted(((property, -distance) for distance, _, property in heap), key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        return self.size
@@ -4,43 +4,151 @@ Main program
 """
 
 from utils.logging import setup_logging
-from scrapers.CBRE import CBREScraper
-from scrapers.JLL import JLLScraper
-from scrapers.BNP import BNPScraper
-from scrapers.ARTHURLOYD import ARTHURLOYDScraper
-from scrapers.SAVILLS import SAVILLSScraper
-from scrapers.KNIGHTFRANK import KNIGHTFRANKScraper
-from scrapers.CUSHMAN import CUSHMANScraper
-from scrapers.ALEXBOLTON import ALEXBOLTONScraper
 from datas.listing_manager import ListingManager
 from datas.listing_exporter import ListingExporter
+from datas.page_archive import PageArchive
+from datas.card_summaries import CardSummaryStore
+from network.user_agents import ListUserAgent
+from core.registry import scraper_names as registered_scrapers, load_enabled_scrapers
+from core.reextraction import reextract_archive
+from core.sharded_crawl import crawl_sharded, run_worker
+from core.field_coverage import FieldCoverageBaseline, FieldCoverageMonitor
+from utils.metrics import RUN_METRICS
+from utils.profiling import SamplingProfiler, EventLoopLagMonitor, profile_path
+from config.squirrel_settings import ARCHIVE_ENABLED, ARCHIVE_PATH, SHARD_QUEUE_PATH, FIELD_COVERAGE_PATH, FIELD_COVERAGE_SAMPLE, FIELD_COVERAGE_MAX_DROP, FIELD_COVERAGE_KEY_FIELDS, CARD_SUMMARIES_PATH, METRICS_PATH, METRICS_FORMATS, PROFILES_PATH, PROFILING_INTERVAL, LOOP_LAG_THRESHOLD
+import argparse
 import logging
 import asyncio
 
-async def main():
-    """Fonction principale"""
+async def main(profile: bool = False):
+    """Fonction principale
+
+    Args:
+        profile (bool): Wraps each scraper run with a sampling profiler and monitors the event loop lag
+    """
 
     log_file = setup_logging()
     logger = logging.getLogger(__name__)
     logging.getLogger("httpx").setLevel(logging.WARNING)
 
-    scrapers = [CBREScraper(), BNPScraper(), JLLScraper(), ARTHURLOYDScraper(), SAVILLSScraper(), KNIGHTFRANKScraper(), CUSHMANScraper(), ALEXBOLTONScraper()]
-    enabled_scrapers = [scraper for scraper in scrapers if scraper.enabled]
-    logger.info(f"Starting scraping for scrapers {len(enabled_scrapers)} / {len(scrapers)} enabled : {[scraper.scraper_name for scraper in enabled_scrapers]}")
+    # Only the modules of the enabled scrapers are imported
+    enabled_scrapers = load_enabled_scrapers()
+    logger.info("Starting scraping for scrapers %d / %d enabled : %s", len(enabled_scrapers), len(registered_scrapers(enabled_only=False)),
+                [scraper.scraper_name for scraper in enabled_scrapers])
+    user_agents = ListUserAgent()
+    await user_agents.refresh_user_agents_list()
+    archive = PageArchive(ARCHIVE_PATH) if ARCHIVE_ENABLED else None
+    coverage_baseline = FieldCoverageBaseline(FIELD_COVERAGE_PATH)
+    card_summaries = CardSummaryStore(CARD_SUMMARIES_PATH)
     listing_manager = ListingManager()
+    if profile:
+        lag_monitor = EventLoopLagMonitor(threshold=LOOP_LAG_THRESHOLD)
+        lag_monitor.start()
     for scraper in enabled_scrapers:
+            scraper.user_agents = user_agents
+            scraper.archive = archive
+            scraper.card_summaries = card_summaries
+            scraper.field_coverage = FieldCoverageMonitor(
+                scraper.scraper_name, scraper.selectors, coverage_baseline.get(scraper.scraper_name),
+                FIELD_COVERAGE_SAMPLE, FIELD_COVERAGE_MAX_DROP, FIELD_COVERAGE_KEY_FIELDS,
+            )
+            if profile:
+                profiler = SamplingProfiler(interval=PROFILING_INTERVAL)
+                profiler.start()
             try:
-                logger.info(f"Starting scraping for {scraper.scraper_name} ...")
+                logger.info("Starting scraping for %s ...", scraper.scraper_name)
                 await scraper.run()
-                listing_manager.add_listing(scraper.listing)
+                if scraper.field_coverage.broken:
+                    logger.error("Properties of %s not exported : %s", scraper.scraper_name, scraper.field_coverage.report())
+                else:
+                    listing_manager.add_listing(scraper.listing)
+                    coverage_baseline.update(scraper.field_coverage)
             except Exception as e:
-                logger.error(f"Error when running the following scraper : {scraper.scraper_name} : {e}")
+                logger.error("Error when running the following scraper : %s : %s", scraper.scraper_name, e)
+            finally:
+                if profile:
+                    profiler.stop()
+                    profile_file = profiler.write_folded(profile_path(PROFILES_PATH, scraper.scraper_name))
+                    logger.info("Profile of %s written in %s", scraper.scraper_name, profile_file)
+    if profile:
+        lag_monitor.stop()
+    if archive is not None:
+        archive.close()
+    coverage_baseline.save()
+    card_summaries.save()
+    exporter = ListingExporter(listing_manager)
+    exporter.export_to_json("exports")
+    metrics_files = RUN_METRICS.export(METRICS_PATH, METRICS_FORMATS)
+    logger.info("Run metrics exported in %s", metrics_files)
+
+    logger.info(
+        f"Program finishing properly, please check the log file {log_file} for details and the exported data in the folder exports",
+    )
+
+def reextract(workers: int | None = None):
+    """Rebuilds the export of the enabled scrapers from the page archive, without network nor browser
+
+    Args:
+        workers (int | None): Number of worker processes, the number of CPU cores by default
+    """
+    log_file = setup_logging()
+    logger = logging.getLogger(__name__)
+
+    scraper_names = registered_scrapers()
+    logger.info("Re-extracting the archived pages of %s from %s", scraper_names, ARCHIVE_PATH)
+    listing_manager = reextract_archive(ARCHIVE_PATH, scraper_names, workers)
+    exporter = ListingExporter(listing_manager)
+    exporter.export_to_json("exports")
+
+    logger.info(
+        f"Re-extraction finishing properly, please check the log file {log_file} for details and the exported data in the folder exports",
+    )
+
+async def crawl_shards(shards: int):
+    """Scrapes the enabled scrapers with worker processes pulling the urls from a shared work queue
+
+    Args:
+        shards (int): Number of worker processes
+    """
+    log_file = setup_logging()
+    logger = logging.getLogger(__name__)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    # API scrapers run their own loop and cannot be sharded by url
+    scraper_names = registered_scrapers(scraper_type="HTTP")
+    logger.info("Starting a sharded crawl of %s over %d worker processes", scraper_names, shards)
+    coverage_baseline = FieldCoverageBaseline(FIELD_COVERAGE_PATH)
+    card_summaries = CardSummaryStore(CARD_SUMMARIES_PATH)
+    listing_manager = await crawl_sharded(
+        scraper_names, shards, SHARD_QUEUE_PATH, ARCHIVE_PATH if ARCHIVE_ENABLED else None,
+        coverage_baseline=coverage_baseline, card_summaries=card_summaries,
+    )
+    coverage_baseline.save()
+    card_summaries.save()
     exporter = ListingExporter(listing_manager)
     exporter.export_to_json("exports")
+    metrics_files = RUN_METRICS.export(METRICS_PATH, METRICS_FORMATS)
+    logger.info("Run metrics exported in %s", metrics_files)
 
     logger.info(
         f"Program finishing properly, please check the log file {log_file} for details and the exported data in the folder exports",
     )
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Squirrel real estate scrapers")
+    parser.add_argument("--profile", action="store_true", help="profile each scraper and monitor the event loop lag")
+    parser.add_argument("--reextract", action="store_true", help="rebuild the export from the page archive without fetching")
+    parser.add_argument("--workers", type=int, help="worker processes of the re-extraction, one per CPU core by default")
+    parser.add_argument("--shards", type=int, help="scrape with this number of worker processes sharing a work queue")
+    parser.add_argument("--join", action="store_true", help="run one more worker on the work queue of a running sharded crawl")
+    args = parser.parse_args()
+    if args.reextract:
+        reextract(workers=args.workers)
+    elif args.join:
+        setup_logging()
+        run_worker(SHARD_QUEUE_PATH, archive_path=ARCHIVE_PATH if ARCHIVE_ENABLED else None,
+                   coverage_baselines=FieldCoverageBaseline(FIELD_COVERAGE_PATH).null_rates)
+    elif args.shards:
+        asyncio.run(crawl_shards(args.shards))
+    else:
+        asyncio.run(main(profile=args.profile))
@@ -4,54 +4,98 @@ Handles user-agents management.
 This module provides a class 'ListUserAgent' that manages a list of user-agents.
 """
 
+import asyncio
 import random
+import re
+import html
 from bs4 import BeautifulSoup
+import hashlib
 import json
 import os
 import httpx
 import aiofiles
 from functools import cached_property
 from time import time
-from ua_parser import user_agent_parser
 import logging
+from network.weighted_sampler import RecencyWeightedSampler
 from config.squirrel_settings import (
     USER_AGENT_UPDATE,
     FICHIER_CACHE_USER_AGENT,
+    FICHIER_CACHE_USER_AGENT_PARSED,
+    USER_AGENT_REFRESH_CONCURRENCY,
+    USER_AGENT_BLOCK_PENALTY,
 )
 
 logger = logging.getLogger(__name__)
 
+# First h1 of the main element of a useragents.io detail page
+H1_PATTERN = re.compile(r"<main\b[^>]*>.*?<h1\b[^>]*>(.*?)</h1>", re.DOTALL | re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def extract_user_agent_h1(page: str) -> str | None:
+    """Extracts the text of the main h1 of a useragents.io page without building a DOM
+
+    Args:
+        page (str): HTML of the page
+
+    Returns:
+        (str | None): The h1 text or None if the page has no h1 in its main element
+    """
+    match = H1_PATTERN.search(page)
+    if not match:
+        return None
+    return html.unescape(TAG_PATTERN.sub("", match.group(1))).strip()
+
 
 class UserAgent:
     """Dataclass for user-agents"""
 
-    def __init__(self, user_agent: str) -> None:
+    def __init__(self, user_agent: str, parsed: list | tuple | None = None) -> None:
         """
-        Setting up a new user-agent
+        Setting up a new user-agent, the string is only parsed when one of its fields is needed
 
         Args:
             user-agent (str): String representing a user-agent like: "Mozilla/5.0 (Windows NT 10.0; Win64; x64)
                 AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+            parsed (list | tuple | None): Pre-parsed (browser, browser major version, os) triple from the cache
         """
         self.string: str = user_agent
-        # User-agent string parser
-        self.parsed_string: dict = user_agent_parser.Parse(user_agent)
+        self.preparsed: tuple | None = tuple(parsed) if parsed else None
         self.last_used: float = time()
 
+    # User-agent string parser
+    @cached_property
+    def parsed_string(self) -> dict:
+        # Imported on the first user-agent missing from the parsed cache, loading its regexes is slow
+        from ua_parser import user_agent_parser
+        return user_agent_parser.Parse(self.string)
+
+    # Get (browser, browser major version, os) from the cache or by parsing the string
+    @cached_property
+    def fields(self) -> tuple:
+        if self.preparsed is not None:
+            return self.preparsed
+        return (
+            self.parsed_string["user_agent"]["family"],
+            self.parsed_string["user_agent"]["major"],
+            self.parsed_string["os"]["family"],
+        )
+
     # Get browser name
     @cached_property
     def browser(self) -> str:
-        return self.parsed_string["user_agent"]["family"]
+        return self.fields[0]
 
     # Get browser version
     @cached_property
     def browser_version(self) -> int:
-        return int(self.parsed_string["user_agent"]["major"])
+        return int(self.fields[1])
 
     # Get OS
     @cached_property
     def os(self) -> str:
-        return self.parsed_string["os"]["family"]
+        return self.fields[2]
 
     # Returns full user_agent string after parsing
     def __str__(self) -> str:
@@ -61,25 +105,43 @@ class UserAgent:
 class ListUserAgent:
     """Set and manage user-agents list"""
 
+    # JSON caches already read in this process: path -> (modification time, content hash, content)
+    _cache_memo: dict[str, tuple[float, str, dict[str, list[str]]]] = {}
+
     def __init__(
         self,
         user_agent_cache=FICHIER_CACHE_USER_AGENT,
         enabling_update=USER_AGENT_UPDATE,
+        user_agent_parsed_cache=FICHIER_CACHE_USER_AGENT_PARSED,
     ):
         self.user_agent_cache: str = user_agent_cache
         self.enabling_update: bool = enabling_update
-
-    async def load_user_agents_list(self, user_agents_list: list[str]) -> list[UserAgent]:
+        self.user_agent_parsed_cache: str = user_agent_parsed_cache
+        self.cache_hash: str | None = None
+        self.sampler: RecencyWeightedSampler | None = None
+        # Index of the user-agent used by each host and weight multipliers of the blocked user-agents
+        self.host_user_agents: dict[str, int] = {}
+        self.penalties: dict[str, float] = {}
+
+    async def load_user_agents_list(self, user_agents_list: list[str], parsed_user_agents: dict[str, list] | None = None) -> list[UserAgent]:
         """Loads user_agents from a list and returns the complete ListUserAgents with UserAgent objects
+
+        Args:
+            user_agents_list (list[str]): List of user-agents strings
+            parsed_user_agents (dict[str, list] | None): Pre-parsed (browser, version, os) triples by user-agent string
         
         Returns: 
             (list[UserAgent]): List of UserAgent objects created from the provided user_agents_list
         """
         if not isinstance(user_agents_list, list) or not all(isinstance(ua, str) for ua in user_agents_list):
             raise ValueError("User agents list must be a list of strings.")
+        parsed_user_agents = parsed_user_agents or {}
         self.liste_user_agents: list[UserAgent] = [
-            UserAgent(ua) for ua in user_agents_list
+            UserAgent(ua, parsed_user_agents.get(ua)) for ua in user_agents_list
         ]
+        # The sampler is built on the first pick
+        self.sampler = None
+        self.host_user_agents = {}
         return self.liste_user_agents
         
     async def refresh_user_agents_list(self) -> list[UserAgent]:
@@ -89,7 +151,11 @@ class ListUserAgent:
             (list[UserAgent]): List of UserAgent objects created from the provided user_agents_list
         """
         user_agents_list = await self.get_update_user_agents_list()
-        return await self.load_user_agents_list(user_agents_list)
+        parsed_user_agents = await self.read_parsed_user_agents()
+        liste_user_agents = await self.load_user_agents_list(user_agents_list, parsed_user_agents)
+        if self.cache_hash is not None and any(ua.preparsed is None for ua in liste_user_agents):
+            await self.save_parsed_user_agents()
+        return liste_user_agents
 
     async def get_updated_url_user_agents(self) -> str:
         """
@@ -151,49 +217,77 @@ class ListUserAgent:
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0",
         ]
-        try:
-            async with httpx.AsyncClient(follow_redirects=True) as client:
+        limits = httpx.Limits(
+            max_connections=USER_AGENT_REFRESH_CONCURRENCY,
+            max_keepalive_connections=USER_AGENT_REFRESH_CONCURRENCY,
+        )
+        # A single pooled client is kept open for the sitemap and every user-agent page
+        async with httpx.AsyncClient(follow_redirects=True, limits=limits) as client:
+            try:
                 response = await client.get(self.actual_url_user_agents)
                 actual_url = BeautifulSoup(response.text, "xml")
                 user_agents_liens = [
                     url.find("loc").text for url in actual_url.find_all("url")
                 ]
-        except httpx.HTTPError as e:
-            logger.error(
-                f"[{self.actual_url_user_agents}] Error retrieving last updated list of user-agents : {e}"
-            )
-            return default_user_agents_list
-        except IndexError as e:
-            logger.error(
-                f"[{self.actual_url_user_agents}] Error retrieving value from last updated user-agents list because 'loc' tag doesn't exist : {e}"
-            )
-            return default_user_agents_list
-        except AttributeError as e:
-            logger.error(
-                f"[{self.actual_url_user_agents}] Error retrieving value from last updated user-agents list because 'url' tag doesn't exist : {e}"
+            except httpx.HTTPError as e:
+                logger.error(
+                    f"[{self.actual_url_user_agents}] Error retrieving last updated list of user-agents : {e}"
+                )
+                return default_user_agents_list
+            except IndexError as e:
+                logger.error(
+                    f"[{self.actual_url_user_agents}] Error retrieving value from last updated user-agents list because 'loc' tag doesn't exist : {e}"
+                )
+                return default_user_agents_list
+            except AttributeError as e:
+                logger.error(
+                    f"[{self.actual_url_user_agents}] Error retrieving value from last updated user-agents list because 'url' tag doesn't exist : {e}"
+                )
+                return default_user_agents_list
+
+            semaphore = asyncio.Semaphore(USER_AGENT_REFRESH_CONCURRENCY)
+            results = await asyncio.gather(
+                *(self.fetch_user_agent_page(client, url, semaphore) for url in user_agents_liens)
             )
-            return default_user_agents_list
-        else:
-            user_agents_string = []
-            for url in user_agents_liens:
-                response = await client.get(url)
-                soup = BeautifulSoup(response.text, "html.parser")
-                ua_chaine = soup.select_one("body > div:nth-child(1) > main > h1")
-                if ua_chaine:
-                    ua_chaine = ua_chaine.get_text()
-                    if any(
-                        ua_chaine.startswith(browser)
-                        for browser in ["Mozilla", "Opera"]
-                    ):
-                        user_agents_string.append(ua_chaine)
-                else:
-                    logger.warning(
-                        f"CSS selector doesn't find any user-agents, it may be broke : {url}"
-                    )
-            logger.info(
-                f"Found {len(user_agents_string)} updated user-agents available for scraping"
+        user_agents_string = [ua_chaine for ua_chaine in results if ua_chaine]
+        logger.info(
+            f"Found {len(user_agents_string)} updated user-agents available for scraping"
+        )
+        return user_agents_string
+
+    async def fetch_user_agent_page(self, client: httpx.AsyncClient, url: str, semaphore: asyncio.Semaphore, retries: int = 3) -> str | None:
+        """
+        Fetches a useragents.io detail page and extracts the user-agent string from its h1, with retries
+
+        Args:
+            client (httpx.AsyncClient): Live pooled client
+            url (str): Url of the user-agent detail page
+            semaphore (asyncio.Semaphore): Bounds the number of pages fetched at the same time
+            retries (int): Number of attempts for this page
+
+        Returns:
+            (str | None): The user-agent string or None if the page doesn't contain a usable user-agent
+        """
+        async with semaphore:
+            for attempt in range(1, retries + 1):
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    break
+                except httpx.HTTPError as e:
+                    if attempt == retries:
+                        logger.warning("[%s] Error retrieving user-agent page after %d tries : %s", url, retries, e)
+                        return None
+                    await asyncio.sleep(0.5 * attempt)
+        ua_chaine = extract_user_agent_h1(response.text)
+        if ua_chaine is None:
+            logger.warning(
+                f"h1 extraction doesn't find any user-agents, it may be broke : {url}"
             )
-            return user_agents_string
+            return None
+        if any(ua_chaine.startswith(browser) for browser in ["Mozilla", "Opera"]):
+            return ua_chaine
+        return None
 
     async def read_cache_user_agents(self) -> dict[str, list[str]]:
         """Checks for the presence of the user-agents cache file
@@ -214,9 +308,16 @@ class ListUserAgent:
                 "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0",
             ]
         }
+        self.cache_hash = None
         try:
-            if os.path.exists("user_agent.json"):
+            if os.path.exists(self.user_agent_cache):
                 logger.info("Cache file with user-agents exists")
+                modification_time = os.path.getmtime(self.user_agent_cache)
+                memo = ListUserAgent._cache_memo.get(self.user_agent_cache)
+                if memo is not None and memo[0] == modification_time:
+                    # Already read and validated in this process
+                    self.cache_hash = memo[1]
+                    return memo[2]
                 async with aiofiles.open(
                     self.user_agent_cache, "r", encoding="utf-8"
                 ) as f:
@@ -226,6 +327,8 @@ class ListUserAgent:
                     isinstance(v, list) and all(isinstance(i, str) for i in v)
                     for v in data.values()
                 ):
+                    self.cache_hash = hashlib.sha256(cache_user_agents.encode("utf-8")).hexdigest()
+                    ListUserAgent._cache_memo[self.user_agent_cache] = (modification_time, self.cache_hash, data)
                     return data
                 else:
                     logger.error(
@@ -278,10 +381,12 @@ class ListUserAgent:
         try:
             liste_user_agents = user_agents
             contenu_actualise = {self.actual_url_user_agents: liste_user_agents}
+            contenu_json = json.dumps(contenu_actualise, ensure_ascii=False, indent=4)
             async with aiofiles.open(self.user_agent_cache, "w", encoding="utf-8") as f:
-                await f.write(
-                    json.dumps(contenu_actualise, ensure_ascii=False, indent=4)
-                )
+                await f.write(contenu_json)
+            # The next read has to reload the new content
+            ListUserAgent._cache_memo.pop(self.user_agent_cache, None)
+            self.cache_hash = hashlib.sha256(contenu_json.encode("utf-8")).hexdigest()
         except IOError as e:
             logger.error(
                 f"[{self.user_agent_cache}] Error with JSON cache file openning : {e}"
@@ -291,6 +396,43 @@ class ListUserAgent:
                 f"[{self.user_agent_cache}] Error when reading JSON cache file : {e}"
             )
 
+    async def read_parsed_user_agents(self) -> dict[str, list]:
+        """Reads the pre-parsed user-agents cache matching the current JSON cache
+
+        Returns:
+            (dict[str, list]): (browser, browser major version, os) triples by user-agent string, empty if the
+                pre-parsed cache is missing or was built from another version of the JSON cache
+        """
+        if self.cache_hash is None or not os.path.exists(self.user_agent_parsed_cache):
+            return {}
+        try:
+            async with aiofiles.open(self.user_agent_parsed_cache, "r", encoding="utf-8") as f:
+                data = json.loads(await f.read())
+        except (OSError, ValueError) as e:
+            logger.error(
+                f"[{self.user_agent_parsed_cache}] Error when reading pre-parsed user-agents cache : {e}"
+            )
+            return {}
+        if not isinstance(data, dict) or data.get("hash") != self.cache_hash:
+            logger.info("Pre-parsed user-agents cache is outdated")
+            return {}
+        return data.get("user_agents", {})
+
+    async def save_parsed_user_agents(self) -> None:
+        """Parses the loaded user-agents if needed and saves their (browser, version, os) triples, keyed by the JSON cache hash"""
+        logger.info("Saving the pre-parsed user-agents cache")
+        contenu = {
+            "hash": self.cache_hash,
+            "user_agents": {ua.string: list(ua.fields) for ua in self.liste_user_agents},
+        }
+        try:
+            async with aiofiles.open(self.user_agent_parsed_cache, "w", encoding="utf-8") as f:
+                await f.write(json.dumps(contenu, ensure_ascii=False, separators=(",", ":")))
+        except IOError as e:
+            logger.error(
+                f"[{self.user_agent_parsed_cache}] Error with pre-parsed user-agents cache file openning : {e}"
+            )
+
     async def get_update_user_agents_list(self) -> list[str]:
         """Get the list of user-agents to update or not 
         
@@ -320,12 +462,25 @@ class ListUserAgent:
         Returns:
             (int): Rating of the user-agent being analyzed
         """
-        notation: int = 1000
+        notation: int = self.static_score_user_agent(user_agent)
 
         # Increases the score for the least-used user-agents
         if user_agent.last_used:
             _seconds_since_last_use = int(time() - user_agent.last_used)
             notation += _seconds_since_last_use
+        return notation
+
+    def static_score_user_agent(self, user_agent: UserAgent) -> int:
+        """
+        Rates a user-agent according to its characteristics, without its recency term
+
+        Args:
+            user_agent (UserAgent): Object representing a user-agent
+            
+        Returns:
+            (int): Rating of the user-agent which doesn't depend on its last usage date
+        """
+        notation: int = 1000
 
         # Increases the score by the browser used
         if user_agent.browser == "Chrome":
@@ -354,23 +509,96 @@ class ListUserAgent:
             notation -= 100
         return notation
 
+    def _pick_user_agent(self) -> int:
+        """Picks the index of a user-agent according to its rating and its last usage date, in O(log n)"""
+        now = time()
+        if self.sampler is None:
+            self.sampler = RecencyWeightedSampler(
+                [
+                    self.static_score_user_agent(user_agent) * self.penalties.get(user_agent.string, 1.0)
+                    for user_agent in self.liste_user_agents
+                ],
+                [user_agent.last_used or now for user_agent in self.liste_user_agents],
+            )
+        index = self.sampler.sample(now)
+        self._mark_used(index, now)
+        return index
+
+    def _mark_used(self, index: int, now: float | None = None) -> None:
+        """Updates the last used time of a user-agent"""
+        now = time() if now is None else now
+        self.liste_user_agents[index].last_used = now
+        if self.sampler is not None:
+            self.sampler.mark_used(index, now)
+
     def get_user_agent(self) -> str:
         """
         Public method to return a user-agent chosen according to its rating and its last usage date
 
+        The static part of each rating is computed once, then every pick only updates the recency term of the
+        chosen user-agent, so a pick costs O(log n).
+
         Returns:
             (str): Returns a user-agent chosen according to its rating and its last usage date
         """
-        # Calculates the rating of each user-agent
-        user_agent_notes = []
-        for user_agent in self.liste_user_agents:
-            user_agent_notes.append(self.scored_user_agent(user_agent))
-        # Select a user-agent
-        user_agent = random.choices(
-            self.liste_user_agents,
-            weights=user_agent_notes,
-            k=1,
-        )[0]
-        # Update the last used time
-        user_agent.last_used = time()
-        return str(user_agent)
+        return str(self.liste_user_agents[self._pick_user_agent()])
+
+    def get_user_agent_for_host(self, host: str) -> str:
+        """
+        Returns the user-agent used for a host, the same one is kept for a host until it gets blocked
+
+        Args:
+            host (str): Host of the requested url, like "www.bnppre.fr"
+
+        Returns:
+            (str): The user-agent string to send to this host
+        """
+        index = self.host_user_agents.get(host)
+        if index is None:
+            index = self._pick_user_agent()
+            self.host_user_agents[host] = index
+        else:
+            self._mark_used(index)
+        return str(self.liste_user_agents[index])
+
+    def report_block(self, host: str) -> None:
+        """
+        Down-weights the user-agent used for a host after it has been blocked, the host gets a new user-agent on its next request
+
+        Args:
+            host (str): Host which has blocked the request
+        """
+        index = self.host_user_agents.pop(host, None)
+        if index is None:
+            return
+        user_agent = self.liste_user_agents[index]
+        penalty = self.penalties.get(user_agent.string, 1.0) * USER_AGENT_BLOCK_PENALTY
+        self.penalties[user_agent.string] = penalty
+        logger.info("[%s] User-agent blocked, its weight is now x%.2f : %s", host, penalty, user_agent)
+        if self.sampler is not None:
+            self.sampler.set_static_score(index, self.static_score_user_agent(user_agent) * penalty)
+
+    def impersonate_for_host(self, host: str) -> str | None:
+        """
+        Returns the TLS fingerprint to impersonate so that it matches the browser of the user-agent used for a host
+
+        Args:
+            host (str): Host of the requested url
+
+        Returns:
+            (str | None): Browser to impersonate like "chrome", "firefox", "safari" or "edge", None if unknown
+        """
+        index = self.host_user_agents.get(host)
+        if index is None:
+            return None
+        browser = self.liste_user_agents[index].browser
+        impersonate_map = {
+            "Edge": "edge",
+            "Firefox": "firefox",
+            "Safari": "safari",
+            "Chrome": "chrome",
+        }
+        return next(
+            (target for family, target in impersonate_map.items() if family in browser),
+            None,
+        )
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Weighted sampling module.
+This module provides a Fenwick tree and a sampler picking items with a weight made of a static score
+plus the number of seconds since the item was last used, in O(log n) per pick.
+"""
+
+import random
+from time import time
+
+
+class FenwickTree:
+    """Binary indexed tree over non-negative weights"""
+
+    def __init__(self, weights: list[float]) -> None:
+        """Builds the tree in O(n)
+
+        Args:
+            weights (list[float]): Initial weight of each item
+        """
+        self.size: int = len(weights)
+        self.tree: list[float] = [0.0] + list(weights)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.total: float = sum(weights)
+
+    def update(self, index: int, delta: float) -> None:
+        """Adds delta to the weight of the item at index"""
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value: float) -> int:
+        """Returns the index of the item whose cumulative weight range contains value
+
+        Args:
+            value (float): Number between 0 and the total weight
+
+        Returns:
+            (int): Index of the selected item
+        """
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= value:
+                position = next_position
+                value -= self.tree[next_position]
+            step >>= 1
+        return min(position, self.size - 1)
+
+
+class RecencyWeightedSampler:
+    """Samples items with a weight equal to 'static score + seconds since last use'.
+
+    The recency term grows at the same rate for every item, so each weight is stored relative to an origin
+    time: weight(now) = base + (now - origin) with base = static + origin - last_used.
+    The common '(now - origin)' part is drawn as a uniform pick, the rest through the Fenwick tree, and only
+    the item just used has its base updated.
+    """
+
+    def __init__(self, static_scores: list[float], last_used: list[float], rng: random.Random | None = None) -> None:
+        """Setting up the sampler
+
+        Args:
+            static_scores (list[float]): Score of each item without its recency term
+            last_used (list[float]): Last usage timestamp of each item
+            rng (random.Random | None): Random generator, the random module by default
+        """
+        if len(static_scores) != len(last_used):
+            raise ValueError("Static scores and last usages must have the same length.")
+        if not static_scores:
+            raise ValueError("Cannot sample from an empty list.")
+        self.static_scores: list[float] = list(static_scores)
+        self.last_used: list[float] = list(last_used)
+        self.rng = rng or random
+        self._rebuild(max(self.last_used))
+
+    def _rebuild(self, origin: float) -> None:
+        """Rebuilds the tree relative to a new origin time, in O(n)"""
+        self.origin: float = origin
+        self.bases: list[float] = [
+            max(score + origin - used, 0.0)
+            for score, used in zip(self.static_scores, self.last_used)
+        ]
+        self.tree = FenwickTree(self.bases)
+
+    def __len__(self) -> int:
+        return len(self.static_scores)
+
+    def weight(self, index: int, now: float | None = None) -> float:
+        """Returns the current weight of an item"""
+        now = time() if now is None else now
+        return self.bases[index] + max(now - self.origin, 0.0)
+
+    def sample(self, now: float | None = None) -> int:
+        """Picks an item index according to the current weights in O(log n)"""
+        now = time() if now is None else now
+        elapsed = max(now - self.origin, 0.0)
+        shared = elapsed * len(self)
+        value = self.rng.random() * (self.tree.total + shared)
+        if value < shared:
+            return min(int(value / elapsed), len(self) - 1)
+        return self.tree.find(value - shared)
+
+    def _set_base(self, index: int, base: float) -> None:
+        if base < 0:
+            # The origin is too old to express this weight, rebuilding from now keeps every base positive
+            self._rebuild(max(self.last_used))
+            return
+        self.tree.update(index, base - self.bases[index])
+        self.bases[index] = base
+
+    def mark_used(self, index: int, now: float | None = None) -> None:
+        """Resets the recency term of an item after its use in O(log n)"""
+        now = time() if now is None else now
+        self.last_used[index] = now
+        self._set_base(index, self.static_scores[index] + self.origin - now)
+
+    def set_static_score(self, index: int, score: float) -> None:
+        """Changes the static score of an item in O(log n)"""
+        self.static_scores[index] = score
+        self._set_base(index, max(score, 0.0) + self.origin - self.last_used[index])
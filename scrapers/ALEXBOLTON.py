@@ -8,7 +8,7 @@ from core.http_scraper import HTTPScraper
 from scrapling import Selector
 from config.scrapers_config import SCRAPER_CONFIG
 from config.scrapers_selectors import SELECTORS
-from config.squirrel_settings import DEPARTMENTS_IDF
+from config.squirrel_settings import DEPARTMENTS_IDF, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
@@ -94,9 +94,9 @@ class ALEXBOLTONScraper(HTTPScraper):
                 property.latitude = float(lat)
                 property.longitude = float(lon)
             else:
-                property.latitude = 48.866669
-                property.longitude = 2.33333
+                property.latitude = DEFAULT_LATITUDE
+                property.longitude = DEFAULT_LONGITUDE
         else:
-            property.latitude = 48.866669
-            property.longitude = 2.33333
+            property.latitude = DEFAULT_LATITUDE
+            property.longitude = DEFAULT_LONGITUDE
         
\ No newline at end of file
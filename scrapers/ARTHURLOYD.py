@@ -6,11 +6,10 @@ Scraper for ARTHURLOYD
 import logging
 from core.http_scraper import HTTPScraper
 from urllib.parse import urljoin
-import json
-import html
 from scrapling import Selector
 from config.scrapers_config import SCRAPER_CONFIG
-from config.scrapers_selectors import SELECTORS
+from config.scrapers_selectors import SELECTORS, EMBEDDED_JSON
+from config.squirrel_settings import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
@@ -19,7 +18,7 @@ class ARTHURLOYDScraper(HTTPScraper):
     """CBRE scraper which inherits from VanillaHTTP class"""
 
     def __init__(self):
-        super().__init__(SCRAPER_CONFIG["ARTHURLOYD"], SELECTORS["ARTHURLOYD"])
+        super().__init__(SCRAPER_CONFIG["ARTHURLOYD"], SELECTORS["ARTHURLOYD"], EMBEDDED_JSON["ARTHURLOYD"])
 
     def instance_url_filter(self, url:str|Selector) -> bool:
         """Overwrite to add a url filter at the instance level"""
@@ -67,25 +66,7 @@ class ARTHURLOYDScraper(HTTPScraper):
             property.url_image = urljoin(
                 "https://www.arthur-loyd.com", li.attrib["data-background"]
             )
-        # GPS position
-        div = page.css_first("div[data-live-props-value]")
-
-        if div:
-            encoded_data = div.attrib.get("data-live-props-value")
-            if encoded_data:
-                decoded_data = html.unescape(encoded_data)
-                data_dict = json.loads(decoded_data)
-
-                markers = data_dict.get("markers", [])
-                if markers:
-                    property.latitude = float(markers[0].get("latitude"))
-                    property.longitude = float(markers[0].get("longitude"))
-                else:
-                    property.latitude = 48.866669
-                    property.longitude = 2.33333
-            else:
-                property.latitude = 48.866669
-                property.longitude = 2.33333
-        else:
-            property.latitude = 48.866669
-            property.longitude = 2.33333
\ No newline at end of file
+        # GPS position, read from the data-live-props-value JSON by get_data
+        if property.latitude is None or property.longitude is None:
+            property.latitude = DEFAULT_LATITUDE
+            property.longitude = DEFAULT_LONGITUDE
\ No newline at end of file
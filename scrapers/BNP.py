@@ -7,11 +7,9 @@ import logging
 from core.http_scraper import HTTPScraper
 from scrapling import Selector
 from urllib.parse import urljoin
-import json
-import re
 from config.scrapers_config import SCRAPER_CONFIG
-from config.scrapers_selectors import SELECTORS
-from config.squirrel_settings import DEPARTMENTS_IDF
+from config.scrapers_selectors import SELECTORS, EMBEDDED_JSON
+from config.squirrel_settings import DEPARTMENTS_IDF, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
@@ -20,7 +18,7 @@ class BNPScraper(HTTPScraper):
     """CBRE scraper which inherits from VanillaHTTP class"""
 
     def __init__(self):
-        super().__init__(SCRAPER_CONFIG["BNP"], SELECTORS["BNP"])
+        super().__init__(SCRAPER_CONFIG["BNP"], SELECTORS["BNP"], EMBEDDED_JSON["BNP"])
 
     def instance_url_filter(self, url:str|Selector) -> bool:
         """Overwrite to add a url filter at the instance level"""
@@ -32,6 +30,16 @@ class BNPScraper(HTTPScraper):
         else:
             return False
 
+    def json_values(self, payload) -> dict:
+        """Adds the postal code of the address components of the geocoding answer to the fields read from paths"""
+        values = super().json_values(payload)
+        results = payload.get("results") if isinstance(payload, dict) else None
+        for component in (results[0].get("address_components") or []) if results else []:
+            if "postal_code" in (component.get("types") or []) and component.get("long_name"):
+                values["postal_code"] = str(component["long_name"])
+                break
+        return values
+
     async def data_hook(self, property:Property, page, url: str) -> None:
         """Post-processing hook method to be overwritten if necessary for specific datas in the Property dataclass
 
@@ -75,25 +83,7 @@ class BNPScraper(HTTPScraper):
             property.url_image = None
 
 
-        # GPS
-        script = page.css_first("script:contains('var geocode')")
-
-        if script:
-            script_text = script.text
-            match = re.search(r"var geocode\s*=\s*(\{.*?\});", script_text, re.DOTALL)
-
-            if match:
-                geocode_json = match.group(1)
-                geocode = json.loads(geocode_json)
-
-                # Extraire la localisation
-                location = geocode["results"][0]["geometry"]["location"]
-                property.latitude = float(location["lat"])
-                property.longitude = float(location["lng"])
-            else:
-                # fallback si pas de match
-                property.latitude = 48.866669
-                property.longitude = 2.33333
-        else:
-            property.latitude = 48.866669
-            property.longitude = 2.33333
\ No newline at end of file
+        # GPS, read from the var geocode JSON by get_data
+        if property.latitude is None or property.longitude is None:
+            property.latitude = DEFAULT_LATITUDE
+            property.longitude = DEFAULT_LONGITUDE
\ No newline at end of file
@@ -9,7 +9,7 @@ from core.http_scraper import HTTPScraper
 from scrapling import Selector
 from config.scrapers_config import SCRAPER_CONFIG
 from config.scrapers_selectors import SELECTORS
-from config.squirrel_settings import DEPARTMENTS_IDF
+from config.squirrel_settings import DEPARTMENTS_IDF, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
@@ -82,8 +82,8 @@ class CBREScraper(HTTPScraper):
                     property.latitude = float(match.group(1))
                     property.longitude = float(match.group(2))
                 else:
-                    property.latitude = 48.866669
-                    property.longitude = 2.33333
+                    property.latitude = DEFAULT_LATITUDE
+                    property.longitude = DEFAULT_LONGITUDE
         else:
-            property.latitude = 48.866669
-            property.longitude = 2.33333
\ No newline at end of file
+            property.latitude = DEFAULT_LATITUDE
+            property.longitude = DEFAULT_LONGITUDE
\ No newline at end of file
@@ -7,11 +7,9 @@ import logging
 from core.http_scraper import HTTPScraper
 from scrapling import Selector
 import re
-import html
-import json
 from config.scrapers_config import SCRAPER_CONFIG
-from config.scrapers_selectors import SELECTORS
-from config.squirrel_settings import DEPARTMENTS_IDF
+from config.scrapers_selectors import SELECTORS, EMBEDDED_JSON
+from config.squirrel_settings import DEPARTMENTS_IDF, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
@@ -20,7 +18,7 @@ class CUSHMANScraper(HTTPScraper):
     """CBRE scraper which inherits from VanillaHTTP class"""
 
     def __init__(self):
-        super().__init__(SCRAPER_CONFIG["CUSHMAN"], SELECTORS["CUSHMANWAKEFIELD"])
+        super().__init__(SCRAPER_CONFIG["CUSHMAN"], SELECTORS["CUSHMANWAKEFIELD"], EMBEDDED_JSON["CUSHMAN"])
 
     def instance_url_filter(self, url:str|Selector) -> bool:
         """Overwrite to add a url filter at the instance level"""
@@ -86,24 +84,7 @@ class CUSHMANScraper(HTTPScraper):
             property.url_image = parent_image.attrib["srcset"]
         else:
             property.url_image = None
-        # GPS position
-        div_map = page.css_first("div.c-map.js-map")
-
-        if div_map:
-            data_property = div_map.attrib["data-property"]
-            if data_property:
-                decoded_json_str = html.unescape(data_property)
-                positions = json.loads(decoded_json_str)
-
-                property.latitude = float(
-                    positions["address"]["displayedGeolocation"]["lat"]
-                )
-                property.longitude = float(
-                    positions["address"]["displayedGeolocation"]["lon"]
-                )
-            else:
-                property.latitude = 48.866669
-                property.longitude = 2.33333
-        else:
-            property.latitude = 48.866669
-            property.longitude = 2.33333
+        # GPS position, read from the data-property JSON by get_data
+        if property.latitude is None or property.longitude is None:
+            property.latitude = DEFAULT_LATITUDE
+            property.longitude = DEFAULT_LONGITUDE
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 """
-Scraper for CBRE
+Scraper for JLL
 """
 
 import logging
+from typing import Any
+from urllib.parse import urlsplit
 from scrapling import Selector
 from core.http_scraper import HTTPScraper
+from core.response_classifier import PERMANENT_FAILURES, RejectedResponse
 from config.scrapers_config import SCRAPER_CONFIG
-from config.scrapers_selectors import SELECTORS
+from config.scrapers_selectors import SELECTORS, EMBEDDED_JSON
 from config.squirrel_settings import DEPARTMENTS_IDF
 from datas.property import Property
 
@@ -16,8 +19,74 @@ logger = logging.getLogger(__name__)
 class JLLScraper(HTTPScraper):
     """JLL scraper which inherits from VanillaHTTP class"""
 
+    # The JSON paths of EMBEDDED_JSON["JLL"] were written against synthetic fixtures : the /_next/data/ routes, which
+    # have no html for the CSS selectors, stay off until the paths are checked on live payloads
+    data_routes:bool = False
+
     def __init__(self):
-        super().__init__(SCRAPER_CONFIG["JLL"], SELECTORS["JLL"])
+        super().__init__(SCRAPER_CONFIG["JLL"], SELECTORS["JLL"], EMBEDDED_JSON["JLL"])
+        self.build_id:str|None = None # Next.js build of the site, read from the first __NEXT_DATA__
+        # The html page is the authority, its __NEXT_DATA__ only fills the fields missed by the CSS selectors
+        self.json_first = False
+
+    def fetch_url(self, url: str) -> str:
+        """Fetches the /_next/data/ route of a page, its JSON alone, once the build of the site is known"""
+        if self.build_id is None or not self.data_routes:
+            return url
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}/_next/data/{self.build_id}{parts.path.rstrip('/') or '/index'}.json"
+
+    def fetch_failed(self, url: str, exc: Exception) -> bool:
+        """Forgets the build of the site when its /_next/data/ route is not found, after a new deployment, so that
+        the page is fetched again from its html page and its __NEXT_DATA__"""
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if not (isinstance(exc, RejectedResponse) and exc.kind in PERMANENT_FAILURES) and status not in (404, 410):
+            return False
+        self.forget_build()
+        return True
+
+    def forget_build(self) -> None:
+        """Forgets the build of the site, gone after a new deployment, the next pages being fetched from their html"""
+        logger.info("[JLL] Next.js build %s is gone, back to the html pages", self.build_id)
+        self.build_id = None
+
+    def embedded_payload(self, page: Selector) -> Any | None:
+        """Returns the Next.js data of a page
+
+        Raises:
+            ValueError: If a /_next/data/ route answered without data, after a new deployment of the site. The build
+                is forgotten so that the retry fetches the html page and its __NEXT_DATA__
+        """
+        payload = super().embedded_payload(page)
+        if payload is None and "/_next/data/" in (page.url or ""):
+            self.forget_build()
+            raise ValueError(f"No Next.js data at {page.url}")
+        return payload
+
+    def json_values(self, payload: Any) -> dict[str, Any]:
+        """Reads the fields of the __NEXT_DATA__ of a html page or of a /_next/data/ route, with the surfaces, address
+        and amenities formatted like the texts of the page"""
+        if isinstance(payload, dict) and "props" in payload:
+            if payload.get("buildId"):
+                self.build_id = payload["buildId"]
+            payload = payload["props"]
+        values = super().json_values(payload)
+        property_ = (payload.get("pageProps") or {}).get("property") if isinstance(payload, dict) else None
+        if not isinstance(property_, dict):
+            return values
+        surface = property_.get("surface") or {}
+        if surface.get("value") is not None:
+            values["area"] = f"{surface['value']} m²"
+        if surface.get("minDivision") is not None:
+            values["division"] = f"à partir de {surface['minDivision']} m²"
+        address = property_.get("address") or {}
+        city = " ".join(str(address[key]) for key in ("postalCode", "city") if address.get(key))
+        adress = ", ".join(part for part in (address.get("line1"), city) if part)
+        if adress:
+            values["adress"] = adress
+        if property_.get("amenities"):
+            values["amenities"] = ", ".join(str(amenity) for amenity in property_["amenities"])
+        return values
         
     def instance_url_filter(self, url:str|Selector) -> bool:
         """Overwrite to add a url filter at the instance level"""
@@ -50,7 +119,7 @@ class JLLScraper(HTTPScraper):
             "a-vendre": "Vente",
         }
         property.contract = next(
-            (label for key, label in contrat_map.items() if key in url), None
+            (label for key, label in contrat_map.items() if key in url), property.contract
         )
         # Surcharger la méthode obtenir le contrat
         actif_map = {
@@ -59,9 +128,11 @@ class JLLScraper(HTTPScraper):
             "entrepot": "Entrepots",
         }
         property.asset_type = next(
-            (label for key, label in actif_map.items() if key in url), None
+            (label for key, label in actif_map.items() if key in url), property.asset_type
         )
-        # Url image (basique)
+        # Url image (basique), when the Next.js data has none
+        if property.url_image is not None:
+            return
         parent_image = page.css_first("#__next > div > div > main > div.max-\\[50vh\\].relative.flex.h-auto.flex-col.items-center.bg-neutral-800\\/95.\\[\\&\\>img\\]\\:object-contain.md\\:\\[\\&\\>img\\]\\:object-cover > img")
         if parent_image and parent_image.attrib["src"]:
             property.url_image = parent_image.attrib["src"]
@@ -3,25 +3,88 @@
 Scraper for KNIGHT FRANK
 """
 
+import asyncio
 import logging
 from core.http_scraper import HTTPScraper
+from core.politeness import url_host
 from scrapling import Selector
 from config.squirrel_settings import PROXY
-from scrapling.fetchers import AsyncStealthySession, AsyncDynamicSession
 import re
 from config.scrapers_config import SCRAPER_CONFIG
-from config.scrapers_selectors import SELECTORS
-from config.squirrel_settings import DEPARTMENTS_IDF
+from config.scrapers_selectors import SELECTORS, CARD_SELECTORS
+from config.squirrel_settings import CARD_FIELDS_MAX_EMPTY, DEPARTMENTS_IDF, DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+from datas.card_summaries import empty_card_fields
 from datas.property import Property
 
 logger = logging.getLogger(__name__)
 
+CONTRAT_MAP = {
+    "location": "Location",
+    "vente": "Vente",
+}
+
 class KNIGHTFRANKScraper(HTTPScraper):
     """CBRE scraper which inherits from VanillaHTTP class"""
 
     def __init__(self):
         super().__init__(SCRAPER_CONFIG["KNIGHTFRANK"], SELECTORS["KNIGHTFRANK"])
         self.base_url = "https://www.knightfrank.fr"
+        self.card_selectors = CARD_SELECTORS["KNIGHTFRANK"]
+        self.cards:dict[str, Property] = {} # result cards of the run by url
+        self.harvested_urls:set[str] = set() # listings built from their card, without detail page
+        self.cards_complete:bool = False # every result page was read
+
+    async def run(self) -> None:
+        """Launch the scraper with the result cards of the run only"""
+        self.cards = {}
+        self.harvested_urls = set()
+        self.cards_complete = False
+        await super().run()
+
+    async def finish_run(self) -> None:
+        """Stores the summary of the cards whose detail page was scraped and archives the harvested listings"""
+        # Details read with broken selectors are not kept for the next runs
+        broken = self.field_coverage is not None and self.field_coverage.broken
+        if self.harvest and self.card_summaries is not None and not broken:
+            self.record_cards()
+            logger.info("[%s] %d listings harvested from their result card, %d detail pages scraped",
+                        self.scraper_name, len(self.harvested_urls), len(self.cards) - len(self.harvested_urls))
+        if self.archive is not None and self.harvested_urls:
+            await asyncio.to_thread(self.archive_harvested)
+
+    def archive_harvested(self) -> None:
+        """Records the harvested listings in the archive under their last detail page, so that the re-extraction
+        rebuilds them too. The listings whose detail page was never archived cannot be re-extracted"""
+        missing = [url for url in sorted(self.harvested_urls) if self.archive.refer(self.scraper_name, url) is None]
+        if missing:
+            logger.warning("[%s] %d harvested listings have no archived detail page and will be left out of the "
+                           "re-extraction", self.scraper_name, len(missing))
+
+    def record_cards(self) -> None:
+        """Stores the card summary and the details of the listings scraped on their detail page, and forgets the
+        listings which left the result pages"""
+        for property in self.listing.properties:
+            card = self.cards.get(property.url)
+            if card is not None and property.url not in self.harvested_urls:
+                self.card_summaries.record(self.scraper_name, card, property)
+        if self.cards_complete:
+            self.card_summaries.forget(self.scraper_name, set(self.cards))
+
+    def harvest_card(self, card: Property) -> bool:
+        """Adds the listing of a card whose summary did not change since its last detail page, with the values of the
+        card over the last details
+
+        Returns:
+            bool: True if the listing was harvested, False if its detail page must be scraped
+        """
+        if not self.harvest or self.card_summaries is None:
+            return False
+        property = self.card_summaries.unchanged(self.scraper_name, card)
+        if property is None:
+            return False
+        self.listing.add_property(property)
+        self.harvested_urls.add(card.url)
+        return True
 
     def instance_url_filter(self, url:str|Selector) -> bool:
         """Overwrite to add a url filter at the instance level"""
@@ -36,12 +99,8 @@ class KNIGHTFRANKScraper(HTTPScraper):
             url (str): Url of the property to scrap
         """
         # Contract
-        contrat_map = {
-            "location": "Location",
-            "vente": "Vente",
-        }
         property.contract = next(
-            (label for key, label in contrat_map.items() if key in url), None
+            (label for key, label in CONTRAT_MAP.items() if key in url), None
         )
         # Asset type
         property.asset_type = "Bureaux"
@@ -64,34 +123,64 @@ class KNIGHTFRANKScraper(HTTPScraper):
                     property.longitude = float(lng_match.group(1))
                     break
                 else:
-                    property.latitude = 48.866669
-                    property.longitude = 2.33333
+                    property.latitude = DEFAULT_LATITUDE
+                    property.longitude = DEFAULT_LONGITUDE
             else:
-                property.latitude = 48.866669
-                property.longitude = 2.33333
+                property.latitude = DEFAULT_LATITUDE
+                property.longitude = DEFAULT_LONGITUDE
      
-    async def _trouver_formater_urls_offres(self, page: Selector) -> list[str]|None:
-        """Méthode qui permet de formater les urls KnightFrank lors de la méthode _navigation_page()
+    async def _trouver_cartes_offres(self, page: Selector) -> list[Property]|None:
+        """Méthode qui construit une Property partielle (url, contrat, surface, localisation, prix) pour chaque carte
+        d'offre d'une page de résultats
 
         Args:
-            soup (BeautifulSoup): Représente le parser lié à la page html à scraper
+            page (Selector): Représente la page de résultats
 
         Returns:
-            list[str]: Représente la liste d'urls formatées des offres à scraper
+            list[Property]|None: Représente les offres de la page, None si la liste des cartes est absente
         """
         div_parent = page.css_first("#listCards > div")
         if not div_parent:
             logger.info("Pas d'élément listCards trouvé")
             return None
-        else:
-            offres = div_parent.css("div[class*='cardOffreListe']")
-            liens = [offre.css_first("a.infosCard") for offre in offres if offre.css_first("a.infosCard")]
-            hrefs = [
-                self.base_url + lien.attrib["href"]
-                for lien in liens
-                if lien and lien.attrib["href"]
-            ]
-            return hrefs
+        cartes = []
+        for offre in div_parent.css("div[class*='cardOffreListe']"):
+            lien = offre.css_first("a.infosCard")
+            if not lien or not lien.attrib.get("href"):
+                continue
+            url = self.base_url + lien.attrib["href"]
+            cartes.append(Property(
+                agency=self.scraper_name,
+                url=url,
+                reference=None,
+                asset_type="Bureaux",
+                contract=next((label for key, label in CONTRAT_MAP.items() if key in url), None),
+                disponibility=None,
+                area=await self.select_text(self.card_selectors.get("area"), offre),
+                division=None,
+                adress=await self.select_text(self.card_selectors.get("adress"), offre),
+                postal_code=None,
+                contact=None,
+                resume=None,
+                amenities=None,
+                url_image=None,
+                latitude=None,
+                longitude=None,
+                price=await self.select_text(self.card_selectors.get("global_price"), offre),
+            ))
+        return cartes
+
+    async def _trouver_formater_urls_offres(self, page: Selector) -> list[str]|None:
+        """Méthode qui permet de formater les urls KnightFrank lors de la méthode _navigation_page()
+
+        Args:
+            page (Selector): Représente la page de résultats
+
+        Returns:
+            list[str]: Représente la liste d'urls formatées des offres à scraper
+        """
+        cartes = await self._trouver_cartes_offres(page)
+        return [carte.url for carte in cartes] if cartes is not None else None
 
     async def _navigation_page(self, page:Selector, url: str|None) -> list[str]|None:
         """Permet de naviguer entre les différentes pages d'offres
@@ -134,7 +223,7 @@ class KNIGHTFRANKScraper(HTTPScraper):
             logger.info("Fetching urls from multiple HTML pages")
             for actif, url in self.start_link.items():
                 urls_discovery.append(url)
-                logger.info(urls_discovery)
+                logger.info("Start links : %s", urls_discovery)
         else:
             logger.info("Fetching urls from a single HTML page")
             urls_discovery.append(self.start_link)
@@ -142,30 +231,40 @@ class KNIGHTFRANKScraper(HTTPScraper):
         if urls_discovery:
             for discover_url in urls_discovery:
                 while discover_url and isinstance(discover_url, str):
-                    logger.info(f"Fetching offers from page: {discover_url}")
-                    try:
-                        async with AsyncDynamicSession() as session:
-                            page = await session.fetch(discover_url)
-                    except Exception as e:
-                        logger.error(f"AsyncDynamicSession failed: {e}")
+                    logger.info("Fetching offers from page: %s", discover_url)
+                    page = None
+                    for session_factory in self.discovery_session_factories:
+                        session_name = getattr(session_factory, "__name__", type(session_factory).__name__)
                         try:
-                            async with AsyncStealthySession() as session:
+                            async with session_factory() as session:
+                                await self.rate_limiter.acquire(url_host(discover_url))
                                 page = await session.fetch(discover_url)
+                            break
                         except Exception as e:
-                            logger.error(f"AsyncStealthySession failed: {e}")
-                            logger.warning("Both sessions failed to fetch the page")
-                            return None
+                            logger.error("%s failed: %s", session_name, e)
+                    if page is None:
+                        logger.warning("All sessions failed to fetch the page")
+                        return None
                     else:
-                        urls_page = await self._trouver_formater_urls_offres(page)
-                        if not urls_page:
-                            logger.info(f"No urls found on this page {discover_url}")
+                        cards_page = await self._trouver_cartes_offres(page)
+                        if not cards_page:
+                            logger.info("No urls found on this page %s", discover_url)
+                            discover_url = None
                         else:
-                            for formated_url in urls_page:
-                                if self.filter_url(formated_url):
-                                    responses.append(formated_url)
+                            for card in cards_page:
+                                if self.filter_url(card.url):
+                                    self.cards[card.url] = card
+                                    # Only the new or changed cards need their detail page
+                                    if not self.harvest_card(card):
+                                        responses.append(card.url)
                             discover_url = await self._navigation_page(page, discover_url)
+            self.cards_complete = True
+            empty_fields = empty_card_fields(list(self.cards.values()), CARD_FIELDS_MAX_EMPTY)
+            if empty_fields:
+                logger.warning("[%s] %s missing on most result cards, the card selectors look broken : these cards "
+                               "are fetched again", self.scraper_name, ", ".join(empty_fields))
             return responses
         else:
-            logger.warning(f"[{self.scraper_name}]No start_link(s) provided for URL discovery")
+            logger.warning("[%s]No start_link(s) provided for URL discovery", self.scraper_name)
             return None
                         
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the datas layer scale benchmark
+"""
+
+import subprocess
+import sys
+from benchmarks.bench_datas import (
+    BASELINE_PATH, SCALES, compare_to_baseline, load_baseline, make_manager, make_properties, missing_from_baseline,
+    run_benchmark, save_baseline,
+)
+
+
+class TestBenchDatas:
+    """Regroup all tests related to the datas layer benchmark."""
+
+    def test_synthetic_properties_are_aggregated(self):
+        manager = make_manager(make_properties(1000))
+        assert len(manager.get_all_properties()) == 1000
+        assert len(manager.get_flat_dict()) == 1000
+        assert any(prop.surface is not None for prop in manager.get_all_properties())
+
+    def test_measures_each_operation(self):
+        results = run_benchmark(scales=(200,), rounds=1)
+        assert set(results) == {"add_listing[200]", "get_all_properties[200]", "get_flat_dict[200]", "export_to_json[200]"}
+        assert all(result["min"] > 0 and result["peak_memory"] > 0 for result in results.values())
+
+    def test_flags_regressions(self, tmp_path):
+        path = str(tmp_path / "baselines" / "datas.json")
+        save_baseline({"get_flat_dict[1000]": {"min": 1.0, "mean": 1.0, "peak_memory": 1000}}, path)
+        baseline = load_baseline(path)
+        within = {"get_flat_dict[1000]": {"min": 1.2, "mean": 1.2, "peak_memory": 1100}}
+        slower = {"get_flat_dict[1000]": {"min": 1.5, "mean": 1.5, "peak_memory": 1100}, "export_to_json[1000]": {"min": 9.0, "mean": 9.0, "peak_memory": 1}}
+        assert compare_to_baseline(within, baseline) == []
+        regressions = compare_to_baseline(slower, baseline)
+        assert len(regressions) == 1 and regressions[0].startswith("get_flat_dict[1000] time")
+        assert missing_from_baseline(slower, baseline) == ["export_to_json[1000]"]
+
+    def test_baseline_is_committed(self):
+        operations = ("add_listing", "get_all_properties", "get_flat_dict", "export_to_json")
+        expected = {f"{operation}[{scale}]": {} for scale in SCALES for operation in operations}
+        assert missing_from_baseline(expected, load_baseline(BASELINE_PATH)) == []
+
+    def test_missing_baseline_is_an_error(self, tmp_path):
+        command = [sys.executable, "-m", "benchmarks.bench_datas", "--baseline", str(tmp_path / "none.json")]
+        process = subprocess.run(command, capture_output=True, text=True)
+        assert process.returncode == 2
+        assert "No baseline" in process.stderr
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the offline end-to-end benchmark
+"""
+
+import asyncio
+from benchmarks.agency_server import AgencyServer, LocalAgencySession, LocalAgencySetup
+from benchmarks.bench_pipeline import run_benchmark
+from core.registry import load_scraper
+
+
+class TestBenchPipeline:
+    """Regroup all tests related to the offline benchmark."""
+
+    def test_local_session_redirects_to_the_agency_server(self):
+        server = AgencyServer(listings=3)
+        base_url = server.start()
+
+        async def fetch_sitemap():
+            async with LocalAgencySession(base_url, "CBRE") as session:
+                page = await session.fetch("https://immobilier.cbre.fr/sitemap.xml")
+                return list(page.xpath("//url/loc/text()"))
+
+        try:
+            locs = asyncio.run(fetch_sitemap())
+        finally:
+            server.stop()
+        assert locs == [f"https://immobilier.cbre.fr/offre/a-louer/bureaux/75008{i:04d}" for i in range(3)]
+
+    def test_runs_the_scrapers_offline(self):
+        report = asyncio.run(run_benchmark(("ALEXBOLTON", "KNIGHTFRANK"), listings=12))
+        results = {result["agency"]: result for result in report["agencies"]}
+        assert results["ALEXBOLTON"]["properties"] == 12
+        # Two start links of two result pages each
+        assert results["KNIGHTFRANK"]["properties"] == 24
+        assert all(result["failures"] == 0 for result in results.values())
+        stages = {serie["stage"] for serie in results["ALEXBOLTON"]["stages"]}
+        assert {"discovery", "fetch", "extraction", "data_hook"} <= stages
+
+    def test_local_setup_keeps_long_timeouts_without_hedging(self):
+        scraper = load_scraper("CUSHMAN")
+        LocalAgencySetup("http://127.0.0.1:1")(scraper)
+        for _ in range(100):
+            scraper.latency.observe("www.cushmanwakefield.fr", "http", 0.001)
+        assert scraper.timeouts.timeout("www.cushmanwakefield.fr", "http") == 30
+        assert scraper.hedging.enabled is False
+        assert scraper.hedging_conf["enabled"] is False
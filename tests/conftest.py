@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures shared by the testing modules
+"""
+
+from dataclasses import MISSING, fields
+import pytest
+from core.hedging import HedgePolicy
+from core.politeness import HostRateLimiter
+from core.registry import load_scraper
+from datas.property import Property
+from utils.metrics import RunMetrics
+
+
+@pytest.fixture
+def make_property():
+    """Builds a property of the test agency, every raw field None unless given and its url ending with its reference"""
+
+    def build(**values) -> Property:
+        raw_fields = {field.name: None for field in fields(Property) if field.default is MISSING}
+        url = f"https://test.com/annonce/{values.get('reference') or 1}"
+        return Property(**{**raw_fields, "agency": "ImmoTest", "url": url, **values})
+
+    return build
+
+
+@pytest.fixture
+def make_scraper():
+    """Builds a scraper without rate limit, recording its metrics, with the hedging options given or without hedging"""
+
+    def build(scraper_name: str = "ALEXBOLTON", **hedging):
+        scraper = load_scraper(scraper_name)
+        scraper.rate_limiter = HostRateLimiter()
+        scraper.metrics = RunMetrics()
+        scraper.hedging = HedgePolicy(**(hedging or {"enabled": False}))
+        return scraper
+
+    return build
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the extraction from the JSON embedded in the pages
+"""
+
+import asyncio
+from pathlib import Path
+import pytest
+from scrapling import Selector
+from benchmarks.agency_server import AgencyServer
+from benchmarks.bench_pipeline import bench_agency
+from core.embedded_json import decode_embedded_json, json_fields, json_path
+from core.registry import load_scraper
+from core.response_classifier import RejectedResponse
+from scrapers.JLL import JLLScraper
+from utils.metrics import RunMetrics
+
+FIXTURES = Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures"
+
+GEOCODE = {
+    "results": [{
+        "geometry": {"location": {"lat": "48.8781", "lng": 2.3079}},
+        "address_components": [
+            {"long_name": "Paris", "types": ["locality"]},
+            {"long_name": "75008", "types": ["postal_code"]},
+        ],
+    }]
+}
+
+
+def scrape_fixture(name: str):
+    scraper = load_scraper(name)
+    scraper.metrics = RunMetrics()
+    url = f"https://{name.lower()}.test/annonce/1"
+    page = Selector((FIXTURES / name / "listing.html").read_bytes(), url=url)
+    return asyncio.run(scraper.get_data(page, url))
+
+
+class TestEmbeddedJson:
+    """Regroup all tests related to the extraction from the embedded JSON."""
+
+    def test_json_path(self):
+        assert json_path(GEOCODE, "results.0.geometry.location.lng") == 2.3079
+        assert json_path(GEOCODE, "results.1.geometry") is None
+        assert json_path(GEOCODE, "results.first") is None
+        assert json_path(GEOCODE, "missing.key") is None
+
+    def test_json_fields(self):
+        fields = {
+            "latitude": ["results.0.geometry.location.lat"],
+            "reference": ["results.0.reference", "results.0.address_components.1.long_name"],
+            "area": ["results.0.geometry"],
+        }
+        assert json_fields(GEOCODE, fields) == {"latitude": 48.8781, "reference": "75008"}
+
+    def test_decode_attribute_and_script(self):
+        page = Selector(
+            b"<div class='map' data-json='{&quot;lat&quot;: 1.5}'></div>"
+            b"<script>var geocode = {\"lat\": 2.5};</script><div class='bad' data-json='{oops'></div>",
+            url="https://test.com",
+        )
+        assert decode_embedded_json(page, {"css": "div.map", "attribute": "data-json"}) == {"lat": 1.5}
+        script = {"script": "var geocode", "pattern": r"var geocode\s*=\s*(\{.*?\});"}
+        assert decode_embedded_json(page, script) == {"lat": 2.5}
+        assert decode_embedded_json(page, {"css": "div.bad", "attribute": "data-json"}) is None
+        assert decode_embedded_json(page, {"css": "div.none", "attribute": "data-json"}) is None
+
+    @pytest.mark.parametrize("name, latitude, longitude", [
+        ("CUSHMAN", 48.8752, 2.3003),
+        ("ARTHURLOYD", 48.8767, 2.3264),
+        ("BNP", 48.8781, 2.3079),
+    ])
+    def test_scrapers_read_the_json_first(self, name, latitude, longitude):
+        property = scrape_fixture(name)
+        assert property.latitude == pytest.approx(latitude)
+        assert property.longitude == pytest.approx(longitude)
+
+    def test_bnp_postal_code(self):
+        assert load_scraper("BNP").json_values(GEOCODE) == {"latitude": 48.8781, "longitude": 2.3079, "postal_code": "75008"}
+
+
+class TestNextData:
+    """Regroup all tests related to the Next.js data of JLL."""
+
+    def test_html_page_is_the_authority(self):
+        scraper = load_scraper("JLL")
+        scraper.metrics = RunMetrics()
+        url = "https://immobilier.jll.fr/location/bureaux-paris-75008-42"
+        page = Selector((FIXTURES / "JLL" / "listing.html").read_bytes(), url=url)
+        property = asyncio.run(scraper.get_data(page, url))
+        assert scraper.build_id == "kP3xR9fWq2bZ"
+        # Fields of the CSS selectors, even where the __NEXT_DATA__ differs
+        assert (property.reference, property.contract, property.asset_type) == ("JLL-0042", "Location", "Bureaux")
+        assert property.area == "1234 m²"
+        assert property.adress == "Bureaux à louer 75008 Paris - JLL"
+        assert property.price == "520 € HT HC/m²/an"
+        # Fields without selector, filled by the __NEXT_DATA__
+        assert property.postal_code == "75008"
+        assert property.url_image.endswith("/1.jpg")
+        assert (property.latitude, property.longitude) == (48.8745, 2.3052)
+        # The data routes stay off until the JSON paths are checked on the live site
+        assert scraper.fetch_url(url) == url
+
+    def test_data_route_once_enabled(self, monkeypatch):
+        monkeypatch.setattr(JLLScraper, "data_routes", True)
+        scraper = load_scraper("JLL")
+        scraper.metrics = RunMetrics()
+        url = "https://immobilier.jll.fr/location/bureaux-paris-75008-42"
+        assert scraper.fetch_url(url) == url
+        page = Selector((FIXTURES / "JLL" / "listing.html").read_bytes(), url=url)
+        asyncio.run(scraper.get_data(page, url))
+        route = scraper.fetch_url(url)
+        assert route == "https://immobilier.jll.fr/_next/data/kP3xR9fWq2bZ/location/bureaux-paris-75008-42.json"
+        page = Selector((FIXTURES / "JLL" / "next_data.json").read_bytes(), url=route)
+        property = asyncio.run(scraper.get_data(page, url))
+        assert (property.reference, property.area, property.division) == ("JLL-0042", "1234 m²", "à partir de 250 m²")
+        assert property.adress == "12 rue de Berri, 75008 Paris"
+        assert property.amenities == "Climatisation, Ascenseur"
+
+    def test_stale_build_falls_back_on_the_html_page(self, monkeypatch):
+        monkeypatch.setattr(JLLScraper, "data_routes", True)
+        paths = []
+
+        class StaleBuildServer(AgencyServer):
+            """Agency server whose Next.js data routes are all gone, as after a new deployment"""
+
+            def respond(self, path, query):
+                paths.append(path)
+                if "/_next/data/" in path:
+                    return 404, "application/json", b'{"notFound":true}'
+                return super().respond(path, query)
+
+        server = StaleBuildServer(listings=20)
+        base_url = server.start()
+        try:
+            result = asyncio.run(bench_agency("JLL", base_url))
+        finally:
+            server.stop()
+        assert result["properties"] == 20
+        assert result["failures"] == 0
+        routes = [path for path in paths if "/_next/data/" in path]
+        html_pages = [path for path in paths if path.startswith("/JLL/location/")]
+        # Each route not found is followed by its html page
+        assert routes and len(html_pages) == 20
+
+    def test_only_a_missing_route_forgets_the_build(self, monkeypatch):
+        monkeypatch.setattr(JLLScraper, "data_routes", True)
+        scraper = load_scraper("JLL")
+        scraper.build_id = "old-build"
+        url = "https://immobilier.jll.fr/location/bureaux-paris-75008-42"
+        assert not scraper.fetch_failed(url, TimeoutError("No answer"))
+        assert scraper.build_id == "old-build"
+        assert scraper.fetch_failed(url, RejectedResponse("not_found", "not_found on http : HTTP 404"))
+        assert scraper.fetch_url(url) == url
+
+    def test_offline_run_uses_the_data_routes(self, monkeypatch):
+        monkeypatch.setattr(JLLScraper, "data_routes", True)
+        paths = []
+
+        class RecordingServer(AgencyServer):
+            def respond(self, path, query):
+                paths.append(path)
+                return super().respond(path, query)
+
+        server = RecordingServer(listings=20)
+        base_url = server.start()
+        try:
+            result = asyncio.run(bench_agency("JLL", base_url))
+        finally:
+            server.stop()
+        assert result["properties"] == 20
+        assert result["failures"] == 0
+        routes = [path for path in paths if path.startswith("/JLL/_next/data/kP3xR9fWq2bZ/location/")]
+        html_pages = [path for path in paths if path.startswith("/JLL/location/")]
+        # Only the listings fetched before the first __NEXT_DATA__ was read are html pages
+        assert routes and len(routes) + len(html_pages) == 20
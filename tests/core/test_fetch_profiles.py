@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the declarative fetch profiles
+"""
+
+import asyncio
+import pytest
+import core.fetch_profiles as fetch_profiles
+from benchmarks.agency_server import AgencyServer
+from core.fetch_profiles import resolve_fetch_profile, session_tiers, session_factories, discovery_session_factories
+
+
+class RecordingSession:
+    """Stands for a scrapling session class, records its options"""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+
+@pytest.fixture
+def recording_sessions(monkeypatch):
+    classes = {tier: type(name, (RecordingSession,), {}) for tier, name in fetch_profiles.SESSION_CLASSES.items()}
+    monkeypatch.setattr(fetch_profiles, "load_session_class", classes.__getitem__)
+
+
+class TestFetchProfiles:
+    """Regroup all tests related to the fetch profiles."""
+
+    def test_default_profile(self):
+        profile = resolve_fetch_profile()
+        assert session_tiers(profile) == ["http", "dynamic", "stealthy"]
+        assert profile["dynamic"]["disable_resources"] is True
+        assert profile["stealthy"]["options"]["solve_cloudflare"] is True
+
+    def test_profile_overrides_the_default(self):
+        profile = resolve_fetch_profile({
+            "tiers": ["http", "stealthy"],
+            "stealthy": {"timeout": 5000, "wait_selector": "h1", "options": {"block_webrtc": False}},
+        })
+        assert session_tiers(profile) == ["http", "stealthy"]
+        assert profile["stealthy"]["timeout"] == 5000
+        assert profile["stealthy"]["options"]["block_webrtc"] is False
+        assert profile["stealthy"]["options"]["solve_cloudflare"] is True
+        assert session_tiers(resolve_fetch_profile({"start_tier": "dynamic"})) == ["dynamic", "stealthy"]
+
+    def test_invalid_profiles(self):
+        with pytest.raises(ValueError):
+            resolve_fetch_profile({"tiers": ["http", "curl"]})
+        with pytest.raises(ValueError):
+            resolve_fetch_profile({"tiers": ["http"], "start_tier": "stealthy"})
+
+    def test_session_options(self, recording_sessions):
+        profile = resolve_fetch_profile({
+            "tiers": ["http", "dynamic"],
+            "http": {"timeout": 3000, "timeout_ceiling": 4000},
+            "dynamic": {"network_idle": True, "wait_selector": "#listCards", "options": {"blocked_domains": ["ads.example.com"]}},
+        })
+        factories = session_factories(profile)
+        assert list(factories) == ["http", "dynamic"]
+        http_session = factories["http"]()
+        assert type(http_session).__name__ == "FetcherSession"
+        assert http_session.kwargs["timeout"] == 4
+        dynamic_session = factories["dynamic"]()
+        assert dynamic_session.kwargs["disable_resources"] is True
+        assert dynamic_session.kwargs["network_idle"] is True
+        assert dynamic_session.kwargs["wait_selector"] == "#listCards"
+        assert dynamic_session.kwargs["blocked_domains"] == ["ads.example.com"]
+        assert dynamic_session.kwargs["locale"] == "fr-FR"
+        assert dynamic_session.kwargs["timeout"] == 30000
+        discovery = discovery_session_factories(profile)
+        assert [factory.__name__ for factory in discovery] == ["AsyncDynamicSession"]
+        http_only = discovery_session_factories(resolve_fetch_profile({"tiers": ["http"], "http": {"timeout_ceiling": 3000}}))
+        assert [factory.__name__ for factory in http_only] == ["FetcherSession"]
+        assert http_only[0]().session.kwargs["timeout"] == 3
+
+    def test_http_discovery_of_the_sitemaps(self):
+        server = AgencyServer(listings=3)
+        base_url = server.start()
+
+        async def discover():
+            factory, = discovery_session_factories(resolve_fetch_profile({"tiers": ["http"]}))
+            async with factory() as session:
+                page = await session.fetch(f"{base_url}/BNP/sitemaps/bureaux.xml")
+                with pytest.raises(ValueError, match="HTTP 404"):
+                    await session.fetch(f"{base_url}/UNKNOWN/sitemap.xml")
+            return page.xpath("//url/loc/text()")
+
+        try:
+            urls = asyncio.run(discover())
+        finally:
+            server.stop()
+        assert len(urls) == 3
+        assert urls[0].startswith("https://www.bnppre.fr/a-louer/")
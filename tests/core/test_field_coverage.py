@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the field coverage monitor
+"""
+
+import asyncio
+from core.field_coverage import FieldCoverageBaseline, FieldCoverageMonitor
+from config.scrapers_selectors import SELECTORS
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from scrapers.CBRE import CBREScraper
+
+SELECTORS_TEST = {"reference": "div.ref", "area": "div.area", "global_price": "div.price", "title": "h1", "url_image": None}
+
+
+
+class TestFieldCoverage:
+    """Regroup all tests related to the field coverage monitor."""
+
+    def test_follows_only_fields_with_a_selector(self):
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST)
+        assert list(monitor.selectors) == ["reference", "area", "price"]
+
+    def test_reports_collapsed_fields_after_the_sample(self, make_property):
+        baseline = {"reference": 0.0, "area": 0.1, "price": 0.2}
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST, baseline, sample_size=10, key_fields=("reference",))
+        for _ in range(9):
+            assert monitor.observe(make_property(area="100 m²", price="  ")) is False
+        assert monitor.observe(make_property(area="100 m²", price="  ")) is True
+        assert set(monitor.broken_fields) == {"reference", "price"}
+        report = monitor.report()
+        assert "reference : 100% None (usually 0%) -> div.ref" in report
+        assert "div.price" in report and "div.area" not in report
+
+    def test_no_report_without_baseline_or_for_other_fields(self, make_property):
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST, None, sample_size=5)
+        for _ in range(10):
+            monitor.observe(make_property())
+        assert not monitor.broken
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST, {"area": 0.0, "reference": 0.0}, sample_size=5, key_fields=("reference",))
+        for _ in range(10):
+            monitor.observe(make_property(reference="REF", price="500 €"))
+        assert "area" in monitor.broken_fields and not monitor.broken
+
+    def test_baseline_blends_healthy_runs(self, tmp_path, make_property):
+        path = str(tmp_path / "field_coverage.json")
+        baseline = FieldCoverageBaseline(path)
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST, sample_size=4)
+        for reference in ("A", None, "B", "C"):
+            monitor.observe(make_property(reference=reference, area="100 m²", price="500 €"))
+        baseline.update(monitor)
+        baseline.save()
+        baseline = FieldCoverageBaseline(path)
+        assert baseline.get("ImmoTest") == {"reference": 0.25, "area": 0.0, "price": 0.0}
+        monitor = FieldCoverageMonitor("ImmoTest", SELECTORS_TEST, sample_size=4)
+        for _ in range(4):
+            monitor.observe(make_property(reference="A", area="100 m²", price="500 €"))
+        baseline.update(monitor)
+        assert baseline.get("ImmoTest")["reference"] == 0.125
+
+    def test_aborts_the_scraper_on_a_redesign(self, monkeypatch):
+        monkeypatch.setattr("benchmarks.agency_server.listing_page", lambda agency: b"<html><body><h1>New design</h1></body></html>")
+        server = AgencyServer(listings=200)
+        base_url = server.start()
+        scraper = CBREScraper()
+        LocalAgencySetup(base_url, 4)(scraper)
+        baseline = {"area": 0.0, "adress": 0.05, "price": 0.1}
+        scraper.field_coverage = FieldCoverageMonitor("CBRE", SELECTORS["CBRE"], baseline, sample_size=20)
+        try:
+            asyncio.run(scraper.run())
+        finally:
+            server.stop()
+        assert scraper.field_coverage.broken
+        assert {"area", "adress", "price"} <= set(scraper.field_coverage.broken_fields)
+        # Stopped after the sample, plus the pages already in flight
+        assert scraper.listing.count_properties() < 40
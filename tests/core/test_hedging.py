@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the hedged requests
+"""
+
+import asyncio
+import pytest
+from core.hedging import HedgePolicy
+from core.latency import HostLatency
+
+HOST = "www.alexbolton.fr"
+URL = f"https://{HOST}/annonces/bureaux-paris-1"
+
+
+class DelayedSession:
+    """Session answering after the delay of each call, in order"""
+
+    def __init__(self, delays: list[float]):
+        self.delays = list(delays)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def fetch(self, url: str) -> str:
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"page after {delay}"
+
+
+class TestHedging:
+    """Regroup all tests related to the hedged requests."""
+
+    @pytest.fixture
+    def observed_scraper(self, make_scraper):
+        """Builds a scraper hedging after the 95th percentile of the latencies it observed"""
+
+        def build(max_fraction: float = 1.0, samples: int = 20, latency: float = 0.01, next_tier: bool = False):
+            scraper = make_scraper(percentile=95, max_fraction=max_fraction, min_samples=20, next_tier=next_tier)
+            for _ in range(samples):
+                scraper.latency.observe(HOST, "http", latency)
+            return scraper
+
+        return build
+
+    def test_latency_percentile(self):
+        latency = HostLatency(window=10)
+        for seconds in range(20):
+            latency.observe(HOST, "http", float(seconds))
+        assert latency.samples(HOST, "http") == 10
+        assert latency.percentile(HOST, "http", 50) == pytest.approx(14.5)
+        assert latency.percentile(HOST, "dynamic", 50) is None
+        assert latency.percentile(HOST, "http", 50, min_samples=11) is None
+
+    def test_policy_caps_the_hedges(self):
+        policy = HedgePolicy(max_fraction=0.1)
+        latency = HostLatency()
+        allowed = 0
+        for _ in range(50):
+            policy.delay(latency, HOST, "http")
+            allowed += policy.acquire()
+        assert allowed == 5
+        assert policy.hedge_tier("http", ["http", "dynamic"]) == "http"
+        assert HedgePolicy(next_tier=True).hedge_tier("http", ["http", "dynamic"]) == "dynamic"
+        assert HedgePolicy(next_tier=True).hedge_tier("dynamic", ["http", "dynamic"]) == "dynamic"
+
+    def test_slow_request_is_hedged(self, observed_scraper):
+        scraper = observed_scraper()
+        session = DelayedSession([5.0, 0.01])
+        page, tier = asyncio.run(scraper._hedged_request(URL, "http", {"http": session}))
+        assert page == "page after 0.01"
+        assert tier == "http"
+        assert session.calls == 2
+        assert session.cancelled == 1
+        assert scraper.hedging.hedges == 1
+        assert len(scraper.metrics.durations[("ALEXBOLTON", "hedge", "http", "won")]) == 1
+
+    def test_hedge_on_the_next_tier(self, observed_scraper):
+        scraper = observed_scraper(next_tier=True)
+        sessions = {"http": DelayedSession([5.0]), "dynamic": DelayedSession([0.01])}
+        page, tier = asyncio.run(scraper._hedged_request(URL, "http", sessions))
+        assert tier == "dynamic"
+        assert sessions["http"].cancelled == 1
+        assert scraper.budget.page_loads == 1
+
+    def test_no_hedge_without_latencies_or_over_the_cap(self, observed_scraper):
+        scraper = observed_scraper(samples=5)
+        session = DelayedSession([0.1])
+        assert asyncio.run(scraper._hedged_request(URL, "http", {"http": session}))[1] == "http"
+        assert session.calls == 1
+
+        scraper = observed_scraper(max_fraction=0.0)
+        session = DelayedSession([0.1, 0.01])
+        asyncio.run(scraper._hedged_request(URL, "http", {"http": session}))
+        assert session.calls == 1
+        assert scraper.hedging.hedges == 0
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the per host rate limiter
+"""
+
+import asyncio
+import time
+import pytest
+from core.politeness import HostRateLimiter, robots_rate, url_host, url_origin
+from core.registry import load_scraper
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /admin
+Crawl-delay: 2
+"""
+
+
+class RobotsSession:
+    """Http session answering the robots.txt, recording the requested urls"""
+
+    requested: list[str] = []
+
+    def __init__(self):
+        self.client = self
+
+    async def __aenter__(self) -> "RobotsSession":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return None
+
+    async def get(self, url: str):
+        self.requested.append(url)
+        return type("Response", (), {"status": 200, "body": ROBOTS_TXT.encode("utf-8")})()
+
+
+class TestPoliteness:
+    """Regroup all tests related to the per host rate limiter."""
+
+    def test_reserve_spaces_the_requests(self):
+        limiter = HostRateLimiter(rate=10, burst=3)
+        delays = [limiter.reserve("www.cbre.fr") for _ in range(5)]
+        assert delays[:3] == [0.0, 0.0, 0.0]
+        assert delays[3] == pytest.approx(0.1, abs=0.01)
+        assert delays[4] == pytest.approx(0.2, abs=0.01)
+        # Each host has its own bucket
+        assert limiter.reserve("www.jll.fr") == 0.0
+        assert HostRateLimiter().reserve("www.cbre.fr") == 0.0
+
+    def test_slowest_limit_is_kept(self):
+        limiter = HostRateLimiter(rate=4, burst=4)
+        limiter.configure("https://www.bnppre.fr/sitemap.xml", 2, 2)
+        limiter.configure("www.bnppre.fr", 5, 5)
+        assert limiter.limit("www.bnppre.fr") == (2, 2)
+        limiter.configure("www.bnppre.fr", 0.5)
+        assert limiter.limit("www.bnppre.fr") == (0.5, 1)
+        assert limiter.limit("www.cbre.fr") == (4, 4)
+        # A limit faster than the default does not loosen it
+        limiter.configure("www.cbre.fr", 10, 10)
+        assert limiter.limit("www.cbre.fr") == (4, 4)
+        limiter.configure("www.cbre.fr", 4, 2)
+        assert limiter.limit("www.cbre.fr") == (4, 2)
+
+    def test_robots_rate(self):
+        assert robots_rate(ROBOTS_TXT) == pytest.approx(0.5)
+        assert robots_rate(ROBOTS_TXT + "Request-rate: 1/10\n") == pytest.approx(0.1)
+        assert robots_rate("User-agent: *\nDisallow: /admin\n") is None
+
+    def test_robots_read_through_the_session_of_the_scraper(self, monkeypatch):
+        monkeypatch.setattr(RobotsSession, "requested", [])
+        limiter = HostRateLimiter(rate=4, burst=4)
+        assert asyncio.run(limiter.load_robots("http://www.test.fr", RobotsSession)) == pytest.approx(0.5)
+        assert asyncio.run(limiter.load_robots("http://www.test.fr", RobotsSession)) is None
+        assert RobotsSession.requested == ["http://www.test.fr/robots.txt"]
+        assert limiter.limit("www.test.fr") == (0.5, 1)
+
+    def test_acquire_waits_for_the_turn_of_the_host(self):
+        limiter = HostRateLimiter(rate=20, burst=1)
+
+        async def requests():
+            start = time.perf_counter()
+            await asyncio.gather(*(limiter.acquire("www.cbre.fr") for _ in range(5)))
+            return time.perf_counter() - start
+
+        assert asyncio.run(requests()) == pytest.approx(0.2, abs=0.1)
+
+    def test_scraper_rate_limit(self):
+        scraper = load_scraper("BNP")
+        scraper.rate_limiter = HostRateLimiter(rate=4, burst=4)
+        scraper.rate_limit = {"requests_per_second": 1, "burst": 2}
+        scraper.robots_txt = False
+        asyncio.run(scraper.prepare_politeness())
+        assert scraper.politeness_origins() == ["https://www.bnppre.fr", "https://bnppre.fr"]
+        assert scraper.rate_limiter.limit("www.bnppre.fr") == (1, 2)
+        assert url_host("https://bnppre.fr/sitemaps/x.xml") == "bnppre.fr"
+        assert url_origin("http://bnppre.fr/sitemaps/x.xml") == "http://bnppre.fr"
+        assert url_origin("/fr/fr/liste") is None
+        savills = load_scraper("SAVILLS")
+        # Its start links are relative paths of the site
+        assert savills.politeness_origins() == ["https://search.savills.com", "https://livev6-searchapi.savills.com"]
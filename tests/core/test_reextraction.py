@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the offline re-extraction of the archived pages
+"""
+
+import asyncio
+from dataclasses import asdict
+from datas.page_archive import PageArchive
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from benchmarks.bench_pipeline import bench_agency
+from core.registry import load_scraper
+from core.reextraction import reextract_archive
+from datas.card_summaries import CardSummaryStore
+from utils.metrics import RunMetrics
+
+
+class TestReextraction:
+    """Regroup all tests related to the offline re-extraction."""
+
+    def test_rebuilds_the_listings_from_the_archive(self, tmp_path):
+        archive_path = str(tmp_path / "archive")
+        archive = PageArchive(archive_path)
+        server = AgencyServer(listings=30)
+        base_url = server.start()
+        try:
+            for agency in ("ALEXBOLTON", "CUSHMAN"):
+                asyncio.run(bench_agency(agency, base_url, archive=archive))
+        finally:
+            server.stop()
+        archive.close()
+
+        listing_manager = reextract_archive(archive_path, ["ALEXBOLTON", "CUSHMAN", "JLL"], workers=2, chunk_size=7)
+        assert listing_manager.listings["ALEXBOLTON"].count_properties() == 30
+        assert listing_manager.listings["CUSHMAN"].count_properties() == 30
+        assert listing_manager.listings["JLL"].count_properties() == 0
+        urls = [prop.url for prop in listing_manager.listings["ALEXBOLTON"].properties]
+        assert urls == sorted(urls)
+        properties = {prop.url: prop for prop in listing_manager.get_all_properties()}
+        prop = properties["https://www.alexbolton.fr/annonces/bureaux-paris-3"]
+        assert prop.reference == "Réf. AB-2045"
+        assert prop.contract == "Location"
+        assert prop.surface == 1234
+        assert asdict(properties["https://immobilier.cushmanwakefield.fr/location/bureaux/paris-75008-3AB"])["latitude"] == 48.8752
+
+    def test_harvested_listings_are_re_extracted(self, tmp_path, caplog):
+        server = AgencyServer(listings=6)
+        base_url = server.start()
+
+        def harvest_run(store, archive):
+            scraper = load_scraper("KNIGHTFRANK")
+            LocalAgencySetup(base_url)(scraper)
+            scraper.metrics = RunMetrics()
+            scraper.card_summaries = store
+            scraper.archive = archive
+            asyncio.run(scraper.run())
+            return scraper
+
+        archive = PageArchive(str(tmp_path / "archive"))
+        unarchived = PageArchive(str(tmp_path / "unarchived"))
+        try:
+            store = CardSummaryStore(str(tmp_path / "card_summaries.json"))
+            harvest_run(store, archive)
+            harvested = harvest_run(store, archive)
+            # Detail pages fetched without archive : the listings harvested next have no page to be re-extracted from
+            store = CardSummaryStore(str(tmp_path / "other_summaries.json"))
+            harvest_run(store, None)
+            harvest_run(store, unarchived)
+        finally:
+            server.stop()
+            archive.close()
+            unarchived.close()
+        assert len(harvested.harvested_urls) == 12
+        listing = reextract_archive(str(tmp_path / "archive"), ["KNIGHTFRANK"], workers=1).listings["KNIGHTFRANK"]
+        assert [prop.url for prop in listing.properties] == sorted(harvested.harvested_urls)
+        assert "12 harvested listings have no archived detail page" in caplog.text
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the lazy scraper registry
+"""
+
+import json
+import subprocess
+import sys
+import pytest
+from config.scrapers_config import SCRAPER_CONFIG
+from core.registry import scraper_class_path, scraper_names, load_scraper, load_enabled_scrapers
+
+# Modules imported by a cold start with only ALEXBOLTON enabled
+COLD_START = """
+import json, sys
+from config.scrapers_config import SCRAPER_CONFIG
+for name, config in SCRAPER_CONFIG.items():
+    config["enabled"] = name == "ALEXBOLTON"
+import main
+from core.registry import load_enabled_scrapers
+scrapers = load_enabled_scrapers()
+print(json.dumps({
+    "scrapers": [scraper.scraper_name for scraper in scrapers],
+    "modules": sorted(name for name in sys.modules if name.startswith("scrapers.") or name.split(".")[0] in ("curl_cffi", "playwright", "patchright", "ua_parser")),
+}))
+"""
+
+
+class TestRegistry:
+    """Regroup all tests related to the scraper registry."""
+
+    def test_class_path(self):
+        assert scraper_class_path("KNIGHTFRANK") == ("scrapers.KNIGHTFRANK", "KNIGHTFRANKScraper")
+        with pytest.raises(KeyError):
+            scraper_class_path("UNKNOWN")
+
+    def test_scraper_names(self, monkeypatch):
+        monkeypatch.setitem(SCRAPER_CONFIG["SAVILLS"], "enabled", True)
+        monkeypatch.setitem(SCRAPER_CONFIG["JLL"], "enabled", False)
+        assert "SAVILLS" in scraper_names()
+        assert "JLL" not in scraper_names()
+        assert "SAVILLS" not in scraper_names(scraper_type="HTTP")
+        assert scraper_names(enabled_only=False) == list(SCRAPER_CONFIG)
+
+    def test_load_scrapers(self, monkeypatch):
+        for name in SCRAPER_CONFIG:
+            monkeypatch.setitem(SCRAPER_CONFIG[name], "enabled", name in ("CBRE", "BNP"))
+        assert load_scraper("CBRE").scraper_name == "CBRE"
+        assert sorted(scraper.scraper_name for scraper in load_enabled_scrapers()) == ["BNP", "CBRE"]
+
+    def test_cold_start_imports_enabled_scrapers_only(self):
+        output = subprocess.run([sys.executable, "-c", COLD_START], capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        assert result["scrapers"] == ["ALEXBOLTON"]
+        assert result["modules"] == ["scrapers.ALEXBOLTON"]
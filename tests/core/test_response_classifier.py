@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the response classifier and the reaction to each class
+"""
+
+import asyncio
+import json
+from pathlib import Path
+import pytest
+from scrapling import Selector
+import core.response_classifier as response_classifier
+from core.response_classifier import classify_response
+from utils.metrics import RunMetrics
+
+URL = "https://www.alexbolton.fr/annonces/bureaux-paris-1"
+LISTING = (Path(__file__).resolve().parents[2] / "benchmarks" / "fixtures" / "ALEXBOLTON" / "listing.html").read_bytes()
+CLOUDFLARE = (
+    b"<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>"
+    b"<script src='/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1'></script></body></html>"
+)
+CLOUDFLARE_BOT_SCRIPT = b"<script src='/cdn-cgi/challenge-platform/scripts/jsd/main.js'></script>"
+SHELL = b"<html><head><script src='/app.js'></script></head><body><div id='root'></div></body></html>"
+
+
+class Response:
+    """Response with the status, headers and body of the scrapling responses"""
+
+    def __init__(self, body: bytes, status: int = 200, headers: dict | None = None):
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+
+class ScriptedSession:
+    """Session answering the same response to every url"""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def fetch(self, url: str):
+        self.calls += 1
+        if isinstance(self.response, Response) and self.response.status == 200 and self.response.body == LISTING:
+            return Selector(LISTING, url=url)
+        return self.response
+
+
+class TestResponseClassifier:
+    """Regroup all tests related to the response classifier."""
+
+    @pytest.mark.parametrize("response, kind", [
+        (Response(LISTING), "ok"),
+        (Response(b'{"pageProps": {}}'), "ok"),
+        (Response(b"", 403, {"CF-Mitigated": "challenge", "Server": "cloudflare"}), "challenge"),
+        (Response(CLOUDFLARE, 403), "challenge"),
+        (Response(b"<html><script src='https://geo.captcha-delivery.com/captcha/'></script></html>", 403), "challenge"),
+        (Response(b"<html><body><div class='g-recaptcha'></div>Verify you are human</body></html>"), "challenge"),
+        (Response(LISTING.replace(b"</body>", b"<form><div class='g-recaptcha'></div></form>" + b" " * 40_000 + b"</body>")), "ok"),
+        (Response(b"<html><body>Not Found</body></html>", 404), "not_found"),
+        (Response(b"<html><head><title>Page introuvable - Alex Bolton</title></head><body>Cette offre n'existe plus.</body></html>"), "soft_404"),
+        (Response(LISTING.replace(b"<title>", b"<title>Bureaux 404 m\xc2\xb2 ")), "ok"),
+        # Listing pages served by Cloudflare embed its bot detection script, in large pages any marker is ignored
+        (Response(LISTING.replace(b"</body>", CLOUDFLARE_BOT_SCRIPT + b"</body>")), "ok"),
+        (Response(LISTING.replace(b"</body>", b"<script>window._cf_chl_opt={}</script>" + b" " * 40_000 + b"</body>")), "ok"),
+        (Response(CLOUDFLARE.replace(b"Just a moment...", b"Bureaux") + b" " * 40_000, 403), "challenge"),
+        # A large page titled "not found" is left to the extraction
+        (Response(LISTING.replace(b"<title>", b"<title>Page introuvable ") + b" " * 40_000), "ok"),
+        (Response(SHELL), "empty"),
+        # The visible text of a large page is not counted
+        (Response(SHELL.replace(b"</head>", b"<script>" + b" " * 40_000 + b"</script></head>")), "ok"),
+        (Response(b"   "), "empty"),
+        (Response(b"<html><body>Too many requests</body></html>", 429, {"server": "nginx"}), "blocked"),
+        (Response(b"<html><body>Bad gateway</body></html>", 502), "server_error"),
+    ])
+    def test_classes(self, response, kind):
+        assert classify_response(response)[0] == kind
+
+    def test_visible_text_of_small_pages_only(self, monkeypatch):
+        counted = []
+        monkeypatch.setattr(response_classifier, "visible_text_length", lambda body: counted.append(len(body)) or 1000)
+        classify_response(Response(LISTING + b"<script></script>" + b" " * 40_000))
+        classify_response(Response(SHELL))
+        assert counted == [len(SHELL)]
+
+    def test_selector_without_status(self):
+        assert classify_response(Selector(LISTING, url=URL)) == ("ok", "")
+        assert classify_response(Selector(CLOUDFLARE, url=URL))[0] == "challenge"
+        assert classify_response("page")[0] == "ok"
+
+    def test_challenge_goes_straight_to_the_stealthy_tier(self, make_scraper):
+        scraper = make_scraper()
+        sessions = {
+            "http": ScriptedSession(Response(CLOUDFLARE, 403)),
+            "dynamic": ScriptedSession(Response(CLOUDFLARE, 403)),
+            "stealthy": ScriptedSession(Response(LISTING)),
+        }
+        asyncio.run(scraper._scrape_one(URL, sessions))
+        assert [session.calls for session in sessions.values()] == [1, 0, 1]
+        assert scraper.listing.count_properties() == 1
+        assert scraper.metrics.response_counts("ALEXBOLTON") == {"challenge": 1, "ok": 1}
+
+    def test_empty_shell_goes_to_the_next_tier(self, make_scraper):
+        scraper = make_scraper()
+        sessions = {
+            "http": ScriptedSession(Response(SHELL)),
+            "dynamic": ScriptedSession(Response(LISTING)),
+            "stealthy": ScriptedSession(Response(LISTING)),
+        }
+        asyncio.run(scraper._scrape_one(URL, sessions))
+        assert [session.calls for session in sessions.values()] == [1, 1, 0]
+        assert scraper.listing.count_properties() == 1
+
+    def test_permanent_failures_fail_fast(self, make_scraper):
+        scraper = make_scraper()
+        sessions = {
+            "http": ScriptedSession(Response(b"<html><body>Not Found</body></html>", 404)),
+            "stealthy": ScriptedSession(Response(LISTING)),
+        }
+        asyncio.run(scraper._scrape_one(URL, sessions))
+        assert [session.calls for session in sessions.values()] == [1, 0]
+        assert scraper.listing.failed_urls == [URL]
+        assert scraper.metrics.response_counts("ALEXBOLTON") == {"not_found": 1}
+
+    def test_counters_in_the_metrics_exports(self):
+        metrics = RunMetrics()
+        metrics.count_response("ALEXBOLTON", "http", "challenge")
+        metrics.count_response("ALEXBOLTON", "stealthy", "ok")
+        metrics.count_response("CBRE", "http", "soft_404")
+        assert metrics.response_counts("ALEXBOLTON") == {"challenge": 1, "ok": 1}
+        exported = json.loads(metrics.to_json())["response_classes"]
+        assert {"scraper": "CBRE", "tier": "http", "class": "soft_404", "count": 1} in exported
+        assert 'squirrel_responses_total{scraper="ALEXBOLTON",tier="http",class="challenge"} 1' in metrics.to_prometheus()
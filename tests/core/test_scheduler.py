@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the frontier ordering and the crawl budget
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from config.scrapers_config import SCRAPER_CONFIG
+from core.registry import load_scraper
+from core.scheduler import DEFAULT_BUDGET, CrawlBudget, order_frontier
+from datas.page_archive import PageArchive
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from scrapers.CBRE import CBREScraper
+
+
+def local_scraper(base_url: str, budget_limits: dict) -> CBREScraper:
+    scraper = CBREScraper()
+    LocalAgencySetup(base_url, 4)(scraper)
+    scraper.budget_limits = budget_limits
+    return scraper
+
+
+class TestScheduler:
+    """Regroup all tests related to the scheduler."""
+
+    def test_frontier_order(self):
+        now = datetime(2025, 6, 30)
+        last_fetched = {
+            "https://a.fr/fresh": "2025-06-29T10:00:00",
+            "https://a.fr/old": "2025-05-01T10:00:00",
+            "https://a.fr/older": "2025-04-01T10:00:00",
+        }
+        urls = ["https://a.fr/fresh", "https://a.fr/old", "https://a.fr/new1", "https://a.fr/older", "https://a.fr/new2", "https://a.fr/new1"]
+        assert order_frontier(urls, last_fetched, timedelta(days=7), now) == [
+            "https://a.fr/new1", "https://a.fr/new2", "https://a.fr/older", "https://a.fr/old", "https://a.fr/fresh",
+        ]
+        assert order_frontier(urls) == ["https://a.fr/fresh", "https://a.fr/old", "https://a.fr/new1", "https://a.fr/older", "https://a.fr/new2"]
+
+    def test_budget_limits(self):
+        budget = CrawlBudget(max_requests=3, max_page_loads=1)
+        assert budget.acquire("stealthy")
+        assert not budget.acquire("dynamic")
+        assert budget.reason == "max_page_loads" and not budget.exhausted
+        assert budget.acquire("http") and budget.acquire("http")
+        assert not budget.acquire("http")
+        assert budget.exhausted and budget.reason == "max_requests"
+        budget = CrawlBudget(max_seconds=0)
+        assert budget.exhausted and budget.reason == "max_seconds"
+        unlimited = CrawlBudget()
+        assert all(unlimited.acquire("dynamic") for _ in range(1000))
+
+    def test_scrapers_share_the_default_budget(self, monkeypatch):
+        assert load_scraper("CBRE").budget_limits == DEFAULT_BUDGET
+        monkeypatch.setitem(SCRAPER_CONFIG["CBRE"], "budget", {"max_page_loads": 50})
+        assert load_scraper("CBRE").budget_limits == {**DEFAULT_BUDGET, "max_page_loads": 50}
+
+    def test_run_stops_when_the_requests_are_spent(self):
+        server = AgencyServer(listings=50)
+        base_url = server.start()
+        scraper = local_scraper(base_url, {"max_requests": 10})
+        try:
+            asyncio.run(scraper.run())
+        finally:
+            server.stop()
+        assert scraper.listing.count_properties() == 10
+        assert len(scraper.unscheduled_urls) == 40
+        assert scraper.budget.reason == "max_requests"
+
+    def test_run_scrapes_new_urls_first(self, tmp_path):
+        archive = PageArchive(str(tmp_path / "archive"))
+        old_urls = [f"https://immobilier.cbre.fr/offre/a-louer/bureaux/75008{i:04d}" for i in range(10)]
+        for url in old_urls:
+            archive.store("CBRE", url, b"<html></html>", datetime.now() - timedelta(days=1))
+        server = AgencyServer(listings=15)
+        base_url = server.start()
+        scraper = local_scraper(base_url, {"max_requests": 5})
+        scraper.archive = archive
+        try:
+            asyncio.run(scraper.run())
+        finally:
+            server.stop()
+        scraped = {prop.url for prop in scraper.listing.properties}
+        assert len(scraped) == 5 and not scraped & set(old_urls)
+        archive.close()
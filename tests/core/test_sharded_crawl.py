@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the work queue and the sharded crawl
+"""
+
+import asyncio
+import os
+from core.field_coverage import FieldCoverageBaseline
+from core.politeness import HostRateLimiter
+from core.work_queue import WorkQueue, DONE, FAILED, PENDING, RUNNING
+from core.sharded_crawl import crawl_sharded, prepare_scraper, shared_budget_limits
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from datas.card_summaries import CardSummaryStore
+from utils.metrics import RunMetrics
+
+
+class CrashingWorkerSetup(LocalAgencySetup):
+    """Local agency setup whose first worker process dies with the jobs it claimed"""
+
+    def __init__(self, base_url: str, flag: str):
+        super().__init__(base_url)
+        self.coordinator = os.getpid()
+        self.flag = flag
+
+    def __call__(self, scraper) -> None:
+        super().__call__(scraper)
+        if os.getpid() != self.coordinator and not os.path.exists(self.flag):
+            open(self.flag, "w").close()
+            os._exit(1)
+
+
+class TestWorkQueue:
+    """Regroup all tests related to the work queue."""
+
+    def test_claims_are_exclusive_and_by_priority(self, tmp_path, make_property):
+        queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+        assert queue.enqueue("A", ["a1", "a2", "a3"]) == 3
+        assert queue.enqueue("A", ["a1"]) == 0
+        queue.enqueue("B", ["b1"])
+        other = WorkQueue(str(tmp_path / "queue.sqlite"))
+        first = queue.claim("w1", 2)
+        # The first url of each scraper comes before the following urls of the others
+        second = other.claim("w2", 2)
+        assert [url for _, _, url in first] == ["a1", "a2"]
+        assert [url for _, _, url in second] == ["b1"]
+        assert [url for _, _, url in other.claim("w2", 2)] == ["a3"]
+        assert other.claim("w2", 2) == []
+        queue.complete(first[0][0], make_property(url="a1", reference="REF", area="100 m²", latitude=48.85, longitude=2.35))
+        queue.release(first[1][0], FAILED)
+        assert queue.results("A")[0].url == "a1"
+        assert queue.urls("A", FAILED) == ["a2"]
+        assert queue.counts("A") == {DONE: 1, FAILED: 1, RUNNING: 1}
+        assert queue.requeue_stale(older_than=-1) == 2
+        queue.claim("w2", 2)
+        queue.claim("w2", 2)
+        assert queue.requeue_stale(older_than=600, workers=["w1"]) == 0
+        assert queue.requeue_stale(older_than=600, workers=["w2"]) == 2
+        assert queue.counts()[PENDING] == 2
+        queue.close()
+        other.close()
+
+    def test_workers_of_the_crawl(self, tmp_path):
+        queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+        assert queue.workers() == 1
+        queue.set_workers(4)
+        assert WorkQueue(str(tmp_path / "queue.sqlite")).workers() == 4
+        queue.reset()
+        assert queue.workers() == 1
+        queue.close()
+
+
+class TestShardedCrawl:
+    """Regroup all tests related to the sharded crawl."""
+
+    def test_limits_are_divided_among_the_workers(self):
+        limits = {"max_seconds": 600, "max_requests": 1000, "max_page_loads": 10, "unknown": None}
+        assert shared_budget_limits(limits, 4) == {"max_seconds": 600, "max_requests": 250, "max_page_loads": 3, "unknown": None}
+        limiter = HostRateLimiter(2.0, burst=4)
+        limiter.configure("www.cbre.fr", 0.5)
+        limiter.shares = 4
+        assert limiter.limit("www.alexbolton.fr") == (0.5, 1)
+        assert limiter.limit("www.cbre.fr") == (0.125, 1)
+        scraper = prepare_scraper("ALEXBOLTON", lambda scraper: setattr(scraper, "rate_limiter", limiter), shares=2)
+        assert scraper.rate_limiter.limit("www.alexbolton.fr") == (1.0, 2)
+
+    def test_jobs_of_a_dead_worker_are_scraped_again(self, tmp_path):
+        server = AgencyServer(listings=40)
+        base_url = server.start()
+        try:
+            listing_manager = asyncio.run(crawl_sharded(
+                ["ALEXBOLTON"], 2, str(tmp_path / "queue.sqlite"),
+                configure=CrashingWorkerSetup(base_url, str(tmp_path / "crashed")),
+            ))
+        finally:
+            server.stop()
+        assert os.path.exists(tmp_path / "crashed")
+        assert listing_manager.listings["ALEXBOLTON"].count_properties() == 40
+        assert listing_manager.listings["ALEXBOLTON"].failed_urls == []
+
+    def test_workers_share_the_urls(self, tmp_path):
+        server = AgencyServer(listings=40)
+        base_url = server.start()
+        try:
+            listing_manager = asyncio.run(crawl_sharded(
+                ["ALEXBOLTON", "CBRE"], 3, str(tmp_path / "queue.sqlite"), configure=LocalAgencySetup(base_url),
+            ))
+        finally:
+            server.stop()
+        assert listing_manager.listings["ALEXBOLTON"].count_properties() == 40
+        assert listing_manager.listings["CBRE"].count_properties() == 40
+        urls = [prop.url for prop in listing_manager.get_all_properties()]
+        assert len(set(urls)) == 80
+        queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+        workers = {row[0] for row in queue._connection.execute("SELECT DISTINCT worker FROM jobs")}
+        assert len(workers) > 1
+        queue.close()
+
+    def test_worker_metrics_and_card_summaries_are_merged(self, tmp_path):
+        server = AgencyServer(listings=12)
+        base_url = server.start()
+        store = CardSummaryStore(str(tmp_path / "card_summaries.json"))
+        baseline = FieldCoverageBaseline(str(tmp_path / "field_coverage.json"))
+        runs = []
+        try:
+            for _ in range(2):
+                metrics = RunMetrics()
+                listing_manager = asyncio.run(crawl_sharded(
+                    ["KNIGHTFRANK"], 2, str(tmp_path / "queue.sqlite"), configure=LocalAgencySetup(base_url),
+                    metrics=metrics, coverage_baseline=baseline, card_summaries=store,
+                ))
+                runs.append((listing_manager.listings["KNIGHTFRANK"], metrics))
+        finally:
+            server.stop()
+        (first, first_metrics), (second, second_metrics) = runs
+        # Two start links of two result pages each, scraped by the workers then harvested from their cards
+        assert first.count_properties() == second.count_properties() == 24
+        assert len(first_metrics.durations[("KNIGHTFRANK", "extraction", "http", "ok")]) == 24
+        assert first_metrics.response_counts("KNIGHTFRANK") == {"ok": 24}
+        assert ("KNIGHTFRANK", "extraction", "http", "ok") not in second_metrics.durations
+        assert set(baseline.get("KNIGHTFRANK")) >= {"reference", "area", "price"}
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the adaptive timeouts and the url watchdog
+"""
+
+import asyncio
+import pytest
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from core.fetch_profiles import resolve_fetch_profile
+from core.hedging import HedgePolicy
+from core.politeness import HostRateLimiter
+from core.latency import HostLatency, AdaptiveTimeouts
+from core.registry import load_scraper
+from utils.metrics import RunMetrics
+
+HOST = "www.alexbolton.fr"
+URL = f"https://{HOST}/annonces/bureaux-paris-1"
+
+
+class SleepingSession:
+    """Session answering after a fixed delay"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def fetch(self, url: str) -> str:
+        await asyncio.sleep(self.delay)
+        return "page"
+
+
+def make_timeouts(**tier_profile) -> AdaptiveTimeouts:
+    profile = resolve_fetch_profile({"http": tier_profile})
+    return AdaptiveTimeouts(HostLatency(), profile, percentile=99, multiplier=2.0, min_samples=5)
+
+
+class TestAdaptiveTimeouts:
+    """Regroup all tests related to the adaptive timeouts and the watchdog."""
+
+    def test_initial_timeout_until_enough_latencies(self):
+        timeouts = make_timeouts(timeout=3000, timeout_floor=500, timeout_ceiling=8000)
+        for _ in range(4):
+            timeouts.latency.observe(HOST, "http", 0.1)
+        assert timeouts.timeout(HOST, "http") == pytest.approx(3.0)
+        timeouts.latency.observe(HOST, "http", 0.4)
+        assert timeouts.timeout(HOST, "http") == pytest.approx(0.8, rel=0.05)
+        assert timeouts.timeout("other.host", "http") == pytest.approx(3.0)
+
+    def test_floor_and_ceiling(self):
+        timeouts = make_timeouts(timeout=3000, timeout_floor=500, timeout_ceiling=8000)
+        for _ in range(5):
+            timeouts.latency.observe(HOST, "http", 0.01)
+            timeouts.latency.observe("slow.host", "http", 20.0)
+        assert timeouts.timeout(HOST, "http") == pytest.approx(0.5)
+        assert timeouts.timeout("slow.host", "http") == pytest.approx(8.0)
+
+    def test_timeouts_grow_for_a_slow_host(self):
+        timeouts = make_timeouts(timeout=1000, timeout_floor=500, timeout_ceiling=8000)
+        values = []
+        for _ in range(20):
+            timeout = timeouts.timeout(HOST, "http")
+            values.append(timeout)
+            timeouts.timed_out(HOST, "http", timeout)
+        assert values[0] == pytest.approx(1.0)
+        assert values == sorted(values)
+        assert values[-1] == pytest.approx(8.0)
+
+    def test_timed_request_times_out(self):
+        scraper = load_scraper("ALEXBOLTON")
+        scraper.rate_limiter = HostRateLimiter()
+        scraper.timeouts = make_timeouts(timeout=50, timeout_floor=10, timeout_ceiling=1000)
+        with pytest.raises(TimeoutError, match="within 0.05s"):
+            asyncio.run(scraper._timed_request(SleepingSession(1.0), URL, "http"))
+        assert scraper.timeouts.latency.samples(HOST, "http") == 1
+        assert asyncio.run(scraper._timed_request(SleepingSession(0.0), URL, "http")) == "page"
+
+    def test_watchdog_cancels_a_url(self):
+        scraper = load_scraper("ALEXBOLTON")
+        scraper.rate_limiter = HostRateLimiter()
+        scraper.metrics = RunMetrics()
+        scraper.hedging = HedgePolicy(enabled=False)
+        scraper.timeouts = make_timeouts(timeout=5000, timeout_ceiling=5000)
+        scraper.url_deadline = 0.05
+        asyncio.run(scraper._scrape_within_deadline(URL, {"http": SleepingSession(1.0)}))
+        assert scraper.listing.failed_urls == [URL]
+        assert scraper.deadline_failures == {URL: "fetch on http (try 1/2)"}
+        assert scraper.url_steps == {}
+        assert len(scraper.metrics.durations[("ALEXBOLTON", "deadline", "", "cancelled")]) == 1
+
+    def test_rate_limit_waits_do_not_count_in_the_deadline(self):
+        server = AgencyServer(listings=8)
+        base_url = server.start()
+        try:
+            scraper = load_scraper("ALEXBOLTON")
+            LocalAgencySetup(base_url)(scraper)
+            scraper.metrics = RunMetrics()
+            # The last of the 8 urls waits 2 s for its turn, twice the deadline
+            scraper.rate_limiter = HostRateLimiter(rate=4)
+            scraper.url_deadline = 1.0
+            asyncio.run(scraper.run())
+        finally:
+            server.stop()
+        assert scraper.deadline_failures == {}
+        assert scraper.listing.count_properties() == 8
+        assert scraper.url_watchdogs == {}
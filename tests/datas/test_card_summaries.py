@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the card summaries of the harvest mode
+"""
+
+import asyncio
+import logging
+from dataclasses import replace
+import pytest
+from benchmarks.agency_server import AgencyServer, LocalAgencySetup
+from core.registry import load_scraper
+from datas.card_summaries import CardSummaryStore, card_summary, empty_card_fields
+from utils.metrics import RunMetrics
+
+URL = "https://www.knightfrank.fr/offre/location-bureaux-paris-1-3"
+
+
+class PriceChangeServer(AgencyServer):
+    """Agency server whose first card of each start link shows a lower price once changed"""
+
+    price_changed = False
+
+    def respond(self, path, query):
+        status, content_type, body = super().respond(path, query)
+        if self.price_changed and "resultat" in path:
+            body = body.replace("400 € HT".encode("utf-8"), "380 € HT".encode("utf-8"))
+        return status, content_type, body
+
+
+class RedesignServer(AgencyServer):
+    """Agency server whose result cards lost the classes of their surface, location and price"""
+
+    def respond(self, path, query):
+        status, content_type, body = super().respond(path, query)
+        if "resultat" in path:
+            for name in (b"surfaceCard", b"villeCard", b"prixCard"):
+                body = body.replace(name, b"newCard")
+        return status, content_type, body
+
+
+def harvest_run(base_url: str, store: CardSummaryStore):
+    scraper = load_scraper("KNIGHTFRANK")
+    LocalAgencySetup(base_url)(scraper)
+    scraper.metrics = RunMetrics()
+    scraper.card_summaries = store
+    asyncio.run(scraper.run())
+    return scraper
+
+
+class TestCardSummaries:
+    """Regroup all tests related to the card summaries and the harvest mode."""
+
+    @pytest.fixture
+    def make_card(self, make_property):
+        """Builds a result card of KNIGHTFRANK"""
+
+        def build(area="1 234 m²", adress="Paris 75008", price="450 € HT HC/m²/an"):
+            return make_property(agency="KNIGHTFRANK", url=URL, asset_type="Bureaux", contract="Location", area=area,
+                                 adress=adress, price=price)
+
+        return build
+
+    def test_summary_ignores_the_formatting(self, make_card):
+        assert card_summary(make_card()) == card_summary(make_card(area="1234 m2", adress="  paris   75008 ", price="450 € HT HC / m² / an"))
+        assert card_summary(make_card()) != card_summary(make_card(price="460 € HT HC/m²/an"))
+        assert card_summary(make_card()) != card_summary(make_card(area="1 300 m²"))
+
+    def test_unchanged_card_gives_the_last_details(self, tmp_path, make_card):
+        path = str(tmp_path / "card_summaries.json")
+        store = CardSummaryStore(path)
+        assert store.unchanged("KNIGHTFRANK", make_card()) is None
+        details = replace(make_card(), reference="KF-12", resume="Bureaux rénovés", latitude=48.87, surface=1234.0)
+        store.record("KNIGHTFRANK", make_card(), details)
+        store.save()
+
+        store = CardSummaryStore(path)
+        property = store.unchanged("KNIGHTFRANK", make_card(area="1234 m²"))
+        assert (property.reference, property.resume, property.latitude) == ("KF-12", "Bureaux rénovés", 48.87)
+        # Values of the card, numeric fields left to the normalizer
+        assert property.area == "1234 m²"
+        assert property.surface is None
+        assert store.unchanged("KNIGHTFRANK", make_card(price="500 €")) is None
+        store.forget("KNIGHTFRANK", set())
+        assert store.unchanged("KNIGHTFRANK", make_card()) is None
+
+    def test_incomplete_card_is_always_fetched(self, tmp_path, make_card):
+        store = CardSummaryStore(str(tmp_path / "card_summaries.json"))
+        for card in (make_card(area=None), make_card(adress=None), make_card(price="")):
+            store.record("KNIGHTFRANK", card, card)
+            assert store.unchanged("KNIGHTFRANK", card) is None
+        cards = [make_card(), make_card(area=None, price=None), make_card(area=None)]
+        assert empty_card_fields(cards, 0.5) == ["area"]
+        assert empty_card_fields(cards, 0.7) == []
+        assert empty_card_fields([], 0.5) == []
+
+    def test_broken_card_selectors_do_not_freeze_the_listings(self, tmp_path, caplog):
+        store = CardSummaryStore(str(tmp_path / "card_summaries.json"))
+        server = RedesignServer(listings=12)
+        base_url = server.start()
+        try:
+            harvest_run(base_url, store)
+            with caplog.at_level(logging.WARNING, logger="scrapers.KNIGHTFRANK"):
+                second = harvest_run(base_url, store)
+        finally:
+            server.stop()
+        assert second.harvested_urls == set()
+        assert second.budget.requests == 24
+        assert "area, location, price missing on most result cards" in caplog.text
+
+    def test_harvest_fetches_only_new_or_changed_cards(self, tmp_path):
+        store = CardSummaryStore(str(tmp_path / "card_summaries.json"))
+        server = PriceChangeServer(listings=12)
+        base_url = server.start()
+        try:
+            first = harvest_run(base_url, store)
+            second = harvest_run(base_url, store)
+            server.price_changed = True
+            third = harvest_run(base_url, store)
+        finally:
+            server.stop()
+        # Two start links of two result pages each
+        assert first.listing.count_properties() == 24
+        assert first.harvested_urls == set()
+        assert second.listing.count_properties() == 24
+        assert len(second.harvested_urls) == 24
+        assert second.budget.requests == 0
+        harvested = {property.url: property for property in second.listing.properties}
+        detailed = {property.url: property for property in first.listing.properties}
+        assert harvested.keys() == detailed.keys()
+        property = harvested[URL]
+        # Details of the last detail page, values of the card over them
+        assert (property.reference, property.contact, property.latitude) == ("KF-30412", "Claire Moreau", 48.8702)
+        assert (property.area, property.adress, property.price) == ("103 m²", "Paris 75004", "403 € HT HC/m²/an")
+        assert detailed[URL].area == "920 m²"
+        # The first card of each start link changed its price
+        assert third.listing.count_properties() == 24
+        assert len(third.harvested_urls) == 22
+        assert third.budget.requests == 2
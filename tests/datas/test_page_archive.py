@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the raw page archive
+"""
+
+import asyncio
+import os
+from datetime import datetime
+import datas.page_archive as page_archive
+from datas.page_archive import PageArchive
+from benchmarks.agency_server import AgencyServer
+from benchmarks.bench_pipeline import bench_agency
+
+
+def count_objects(archive: PageArchive) -> int:
+    return sum(len(files) for _, _, files in os.walk(archive.objects_path))
+
+
+class TestPageArchive:
+    """Regroup all tests related to the page archive."""
+
+    def test_store_deduplicates_by_hash(self, tmp_path):
+        archive = PageArchive(str(tmp_path / "archive"))
+        first = archive.store("ImmoTest", "https://test.com/1", b"<html>same</html>", datetime(2025, 1, 1))
+        second = archive.store("ImmoTest", "https://test.com/2", b"<html>same</html>", datetime(2025, 1, 2))
+        assert first == second
+        assert count_objects(archive) == 1
+        assert archive.load(first) == b"<html>same</html>"
+        assert [url for url, _, _ in archive.pages("ImmoTest")] == ["https://test.com/1", "https://test.com/2"]
+        archive.close()
+
+    def test_latest_fetch_of_a_url(self, tmp_path):
+        archive = PageArchive(str(tmp_path / "archive"))
+        archive.store("ImmoTest", "https://test.com/1", b"v1", datetime(2025, 1, 1))
+        digest = archive.store("ImmoTest", "https://test.com/1", b"v2", datetime(2025, 2, 1))
+        assert archive.latest("ImmoTest", "https://test.com/1") == ("2025-02-01T00:00:00", digest)
+        assert archive.latest("Other", "https://test.com/1") is None
+        assert list(archive.pages("ImmoTest")) == [("https://test.com/1", "2025-02-01T00:00:00", digest)]
+        assert len(list(archive.pages("ImmoTest", latest_only=False))) == 2
+        assert archive.agencies() == ["ImmoTest"]
+        archive.close()
+
+    def test_archive_shared_by_processes(self, tmp_path):
+        archive = PageArchive(str(tmp_path / "archive"))
+        other = PageArchive(str(tmp_path / "archive"))
+        assert archive._connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        digest = archive.store("ImmoTest", "https://test.com/1", b"v1", datetime(2025, 1, 1))
+        assert other.latest("ImmoTest", "https://test.com/1") == ("2025-01-01T00:00:00", digest)
+        assert not [name for _, _, files in os.walk(archive.objects_path) for name in files if name.endswith(".tmp")]
+        archive.close()
+        other.close()
+
+    def test_zlib_fallback_without_zstandard(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(page_archive, "zstandard", None)
+        archive = PageArchive(str(tmp_path / "archive"))
+        digest = archive.store("ImmoTest", "https://test.com/1", b"<html>page</html>" * 100)
+        assert archive.find_object(digest).endswith(".zlib")
+        assert archive.load(digest) == b"<html>page</html>" * 100
+        archive.close()
+
+    def test_scraper_archives_fetched_pages(self, tmp_path):
+        archive = PageArchive(str(tmp_path / "archive"))
+        server = AgencyServer(listings=5)
+        base_url = server.start()
+        try:
+            result = asyncio.run(bench_agency("ALEXBOLTON", base_url, archive=archive))
+        finally:
+            server.stop()
+        assert result["properties"] == 5
+        pages = list(archive.pages("ALEXBOLTON"))
+        assert len(pages) == 5
+        # Every listing page served is the same fixture, stored once
+        assert count_objects(archive) == 1
+        archive.close()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the property normalizer
+"""
+
+import pytest
+from datas.property_listing import PropertyListing
+from datas.listing_manager import ListingManager
+from datas.property_normalizer import PropertyNormalizer, parse_min_division, parse_number, parse_price, parse_surface
+
+
+class TestPropertyNormalizer:
+    """Regroup all tests related to area, division and price normalization."""
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [("1 234", 1234.0), ("1 234,5", 1234.5), ("1.234", 1234.0), ("2,00", 2.0), ("300", 300.0)],
+    )
+    def test_parse_number(self, raw, expected):
+        assert parse_number(raw) == expected
+
+    def test_parse_surface(self):
+        assert parse_surface("1 234 m²") == 1234.0
+        assert parse_surface("de 200 à 1 500 m2") == 1500.0
+        assert parse_surface("Nous consulter") is None
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("1 700 000 €", (1700000.0, "€", None)),
+            ("250 €/m²/an HT HC", (250.0, "€/m²", "year")),
+            ("350 € HT HC / m² / an", (350.0, "€/m²", "year")),
+            ("180 €/an/m²", (180.0, "€/m²", "year")),
+            ("180 € HT / an / m²", (180.0, "€/m²", "year")),
+            ("1 500 €/annuel", (1500.0, "€", "year")),
+            ("12 500 € HT/mois", (12500.0, "€", "month")),
+            ("2,5 M€", (2500000.0, "€", None)),
+            ("120 k€ HT/an", (120000.0, "€", "year")),
+            ("500000", (500000.0, "€", None)),
+            ("Nous consulter", (None, None, None)),
+        ],
+    )
+    def test_parse_price(self, raw, expected):
+        assert parse_price(raw) == expected
+
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("à partir de 300 m²", 300.0),
+            ("de 100 à 500 m²", 100.0),
+            ("entre 100 et 500 m2", 100.0),
+            ("100 - 500 m²", 100.0),
+            ("dès 120 m²", 120.0),
+            # "des" inside another word is not a division marker
+            ("Commodes 450 m², divisible à partir de 120 m²", 120.0),
+            ("Oui", None),
+            ("Nous consulter", None),
+        ],
+    )
+    def test_parse_min_division(self, raw, expected):
+        assert parse_min_division(raw) == expected
+
+    def test_division_falls_back_on_the_surface_only_when_non_divisible(self, make_property):
+        properties = [
+            make_property(area="800 m²", division="Oui"),
+            make_property(area="800 m²", division="Nous consulter"),
+            make_property(area="800 m²"),
+            make_property(area="800 m²", division="Non divisible"),
+        ]
+        PropertyNormalizer().normalize(properties)
+        assert [prop.min_division for prop in properties] == [None, None, None, 800.0]
+
+    def test_normalize_listing(self, make_property):
+        properties = [
+            make_property(area="1 111 m²", division="Non divisible", price="1 700 000 €"),
+            make_property(area="800 m²", division="divisibles à partir de 300 m²", price="250 €/m²/an HT HC"),
+            make_property(),
+        ]
+        PropertyNormalizer().normalize(properties)
+        assert properties[0].surface == 1111.0
+        assert properties[0].min_division == 1111.0
+        assert properties[0].price_amount == 1700000.0
+        assert properties[1].min_division == 300.0
+        assert (properties[1].price_unit, properties[1].price_period) == ("€/m²", "year")
+        assert properties[2].surface is None and properties[2].price_amount is None
+
+    def test_listing_manager_normalizes_on_add(self, make_property):
+        listing = PropertyListing("ImmoTest")
+        listing.add_property(make_property(area="100 m²", price="500 000 €"))
+        manager = ListingManager()
+        manager.add_listing(listing)
+        flat = manager.get_flat_dict()
+        assert flat[0]["surface"] == 100.0
+        assert flat[0]["price_amount"] == 500000.0
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the spatial index and the listing manager geographic queries
+"""
+
+import random
+import time
+import pytest
+from datas.property_listing import PropertyListing
+from datas.listing_manager import ListingManager
+from datas.spatial_index import SpatialIndex, haversine_distance
+from config.squirrel_settings import DEFAULT_LATITUDE, DEFAULT_LONGITUDE
+
+
+@pytest.fixture
+def random_properties(make_property):
+    generator = random.Random(42)
+    return [
+        make_property(reference=str(i), latitude=48.7 + generator.random() * 0.3, longitude=2.2 + generator.random() * 0.3)
+        for i in range(500)
+    ]
+
+
+class TestSpatialIndex:
+    """Regroup all tests related to the spatial index."""
+
+    def test_skips_placeholder_and_invalid_positions(self, make_property):
+        index = SpatialIndex()
+        assert index.add(make_property(reference="a", latitude=DEFAULT_LATITUDE, longitude=DEFAULT_LONGITUDE)) is False
+        assert index.add(make_property(reference="b", latitude=None, longitude=None)) is False
+        assert index.add(make_property(reference="c", latitude="48.85", longitude="2.35")) is True
+        assert len(index) == 1
+
+    def test_radius_matches_brute_force(self, random_properties):
+        index = SpatialIndex()
+        for prop in random_properties:
+            index.add(prop)
+        found = {prop.reference for prop, _ in index.within_radius(48.85, 2.35, 2000)}
+        expected = {
+            prop.reference
+            for prop in random_properties
+            if haversine_distance(48.85, 2.35, prop.latitude, prop.longitude) <= 2000
+        }
+        assert found == expected
+
+    def test_nearest_matches_brute_force(self, random_properties):
+        index = SpatialIndex()
+        for prop in random_properties:
+            index.add(prop)
+        nearest = [prop.reference for prop, _ in index.nearest(48.9, 2.3, k=10)]
+        expected = sorted(
+            random_properties,
+            key=lambda prop: haversine_distance(48.9, 2.3, prop.latitude, prop.longitude),
+        )[:10]
+        assert nearest == [prop.reference for prop in expected]
+
+    def test_far_apart_points_are_fast(self, make_property):
+        index = SpatialIndex(cell_size=0.001)
+        paris = make_property(reference="paris", latitude=48.8566, longitude=2.3522)
+        marseille = make_property(reference="marseille", latitude=43.2965, longitude=5.3698)
+        index.add(paris)
+        index.add(marseille)
+        start = time.perf_counter()
+        assert [prop.reference for prop, _ in index.nearest(48.85, 2.35)] == ["paris"]
+        assert [prop.reference for prop, _ in index.nearest(43.3, 5.37, k=3)] == ["marseille", "paris"]
+        assert [prop.reference for prop in index.in_bbox(41.0, -5.0, 51.5, 9.5)] == ["paris", "marseille"]
+        assert index.within_radius(46.0, 4.0, 1000) == []
+        assert time.perf_counter() - start < 0.5
+
+    def test_nearest_at_every_k(self, random_properties):
+        index = SpatialIndex()
+        for prop in random_properties:
+            index.add(prop)
+        for latitude, longitude in ((48.9, 2.3), (43.3, 5.37), (48.75, 2.45)):
+            expected = sorted(random_properties, key=lambda prop: haversine_distance(latitude, longitude, prop.latitude, prop.longitude))
+            for k in (1, 7, 600):
+                found = [prop.reference for prop, _ in index.nearest(latitude, longitude, k=k)]
+                assert found == [prop.reference for prop in expected[:k]]
+
+    def test_bbox(self, random_properties):
+        index = SpatialIndex()
+        for prop in random_properties:
+            index.add(prop)
+        found = {prop.reference for prop in index.in_bbox(48.8, 2.3, 48.85, 2.4)}
+        expected = {
+            prop.reference
+            for prop in random_properties
+            if 48.8 <= prop.latitude <= 48.85 and 2.3 <= prop.longitude <= 2.4
+        }
+        assert found == expected
+
+    def test_listing_manager_incremental_update(self, make_property):
+        manager = ListingManager()
+        listing = PropertyListing("ImmoTest")
+        listing.add_property(make_property(reference="1", latitude=48.85, longitude=2.35))
+        manager.add_listing(listing)
+        assert [prop.reference for prop, _ in manager.properties_within_radius(48.85, 2.35, 500)] == ["1"]
+
+        other = PropertyListing("Other")
+        other.add_property(make_property(reference="2", latitude=48.851, longitude=2.351))
+        manager.add_listing(other)
+        assert len(manager.properties_within_radius(48.85, 2.35, 500)) == 2
+
+        # Replacing a listing removes its previous properties from the index
+        replacement = PropertyListing("ImmoTest")
+        manager.add_listing(replacement)
+        assert [prop.reference for prop, _ in manager.nearest_properties(48.85, 2.35, k=5)] == ["2"]
@@ -2,7 +2,11 @@
 """
 Testing module for user-agents handling
 """
-from network.user_agents import UserAgent, ListUserAgent
+from network.user_agents import UserAgent, ListUserAgent, extract_user_agent_h1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import json
+import aiofiles
 import pytest
 import pytest_asyncio
 from unittest.mock import AsyncMock, patch
@@ -177,3 +181,127 @@ class TestListUserAgentFunctionnal():
         assert len(liste_user_agents) == 2
         assert all(isinstance(x, UserAgent) for x in liste_user_agents)
 
+
+
+class TestUserAgentsCaches:
+    """Test class for the lazy parsing and the pre-parsed cache of user-agents"""
+
+    def test_lazy_parsing(self):
+        ua = UserAgent("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36")
+        assert "parsed_string" not in ua.__dict__
+        assert ua.browser == "Chrome"
+        assert "parsed_string" in ua.__dict__
+
+    def test_preparsed_fields_skip_parsing(self):
+        ua = UserAgent("not a real user-agent", ["Chrome", "120", "Windows"])
+        assert (ua.browser, ua.browser_version, ua.os) == ("Chrome", 120, "Windows")
+        assert "parsed_string" not in ua.__dict__
+
+    @pytest.mark.asyncio
+    async def test_parsed_cache_roundtrip(self, tmp_path):
+        cache = tmp_path / "user_agent.json"
+        cache.write_text(json.dumps({"cached_url": [
+            "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/114.0",
+        ]}), encoding="utf-8")
+        parsed_cache = tmp_path / "user_agent.parsed.json"
+        first = ListUserAgent(str(cache), False, str(parsed_cache))
+        with patch.object(ListUserAgent, "get_updated_url_user_agents", new_callable=AsyncMock, return_value="cached_url"):
+            await first.refresh_user_agents_list()
+        assert json.loads(parsed_cache.read_text(encoding="utf-8"))["hash"] == first.cache_hash
+
+        second = ListUserAgent(str(cache), False, str(parsed_cache))
+        with patch.object(ListUserAgent, "get_updated_url_user_agents", new_callable=AsyncMock, return_value="cached_url"):
+            liste_user_agents = await second.refresh_user_agents_list()
+        assert liste_user_agents[0].preparsed == ("Firefox", "114", "Ubuntu")
+        assert liste_user_agents[0].browser == "Firefox"
+
+    @pytest.mark.asyncio
+    async def test_cache_read_once(self, tmp_path):
+        cache = tmp_path / "user_agent.json"
+        cache.write_text(json.dumps({"cached_url": ["Mozilla/5.0"]}), encoding="utf-8")
+        ua = ListUserAgent(str(cache))
+        with patch("network.user_agents.aiofiles.open", wraps=aiofiles.open) as mock_open:
+            await ua.read_cache_user_agents()
+            await ua.read_cache_user_agents()
+            await ua.get_cache_url_user_agents()
+        assert mock_open.call_count == 1
+
+
+@pytest.fixture
+def local_useragents_server():
+    """Local stand-in for useragents.io serving a sitemap and user-agents detail pages"""
+    pages = {
+        f"/ua/{i}": f"<html><body><div><main><h1>Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/{100 + i}.0.0.0</h1></main></div></body></html>"
+        for i in range(20)
+    }
+    pages["/ua/bot"] = "<html><body><div><main><h1>curl/8.0</h1></main></div></body></html>"
+    flaky_hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            host = f"http://127.0.0.1:{self.server.server_address[1]}"
+            if self.path == "/sitemap.xml":
+                urls = "".join(f"<url><loc>{host}{path}</loc></url>" for path in [*pages, "/ua/flaky"])
+                body, status = f"<urlset>{urls}</urlset>", 200
+            elif self.path == "/ua/flaky":
+                # Fails on the first try to check that each page is retried on its own
+                flaky_hits.append(self.path)
+                if len(flaky_hits) == 1:
+                    body, status = "error", 500
+                else:
+                    body, status = "<main><h1>Opera/9.80 (Windows NT 6.1)</h1></main>", 200
+            else:
+                body, status = pages.get(self.path, "not found"), 200 if self.path in pages else 404
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class TestUserAgentsRefresh:
+    """Test class for the concurrent refresh of the user-agents list"""
+
+    def test_extract_user_agent_h1(self):
+        page = "<body><div><main class='x'><p>intro</p><h1 class='t'>Mozilla/5.0 <span>(X11)</span> &amp; co</h1></main></div></body>"
+        assert extract_user_agent_h1(page) == "Mozilla/5.0 (X11) & co"
+        assert extract_user_agent_h1("<body><h1>Outside main</h1></body>") is None
+
+    @pytest.mark.asyncio
+    async def test_refresh_against_local_server(self, local_useragents_server, list_user_agent):
+        list_user_agent.actual_url_user_agents = f"{local_useragents_server}/sitemap.xml"
+        user_agents = await list_user_agent.get_updated_user_agents_list()
+        assert len(user_agents) == 21
+        assert "Opera/9.80 (Windows NT 6.1)" in user_agents
+        assert "curl/8.0" not in user_agents
+
+
+class TestUserAgentsRotation:
+    """Test class for the per-host user-agents rotation"""
+
+    def test_host_stickiness(self, list_user_agent):
+        user_agent = list_user_agent.get_user_agent_for_host("www.bnppre.fr")
+        assert all(list_user_agent.get_user_agent_for_host("www.bnppre.fr") == user_agent for _ in range(20))
+
+    def test_blocked_user_agent_is_down_weighted(self, list_user_agent):
+        user_agent = list_user_agent.get_user_agent_for_host("www.bnppre.fr")
+        index = list_user_agent.host_user_agents["www.bnppre.fr"]
+        before = list_user_agent.sampler.static_scores[index]
+        list_user_agent.report_block("www.bnppre.fr")
+        assert "www.bnppre.fr" not in list_user_agent.host_user_agents
+        assert list_user_agent.penalties[user_agent] == 0.5
+        assert list_user_agent.sampler.static_scores[index] == pytest.approx(before * 0.5)
+
+    def test_impersonate_matches_browser(self, list_user_agent):
+        list_user_agent.host_user_agents["example.com"] = 2  # Firefox on Ubuntu
+        list_user_agent.sampler = None
+        assert list_user_agent.impersonate_for_host("example.com") == "firefox"
+        assert list_user_agent.impersonate_for_host("unknown.com") is None
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the weighted sampler used to pick user-agents
+"""
+import random
+import pytest
+from network.weighted_sampler import FenwickTree, RecencyWeightedSampler
+
+
+class TestFenwickTree:
+    """Test class for FenwickTree class"""
+
+    def test_find_and_update(self):
+        tree = FenwickTree([1.0, 0.0, 3.0, 2.0])
+        assert tree.total == 6.0
+        assert tree.find(0.5) == 0
+        assert tree.find(1.0) == 2
+        assert tree.find(3.99) == 2
+        assert tree.find(4.0) == 3
+        tree.update(1, 5.0)
+        assert tree.total == 11.0
+        assert tree.find(1.0) == 1
+        assert tree.find(5.99) == 1
+        assert tree.find(6.0) == 2
+
+
+class TestRecencyWeightedSampler:
+    """Test class for RecencyWeightedSampler class"""
+
+    def test_weights_follow_recency(self):
+        sampler = RecencyWeightedSampler([100.0, 200.0], [0.0, 50.0], rng=random.Random(1))
+        assert sampler.weight(0, now=60.0) == pytest.approx(160.0)
+        assert sampler.weight(1, now=60.0) == pytest.approx(210.0)
+        sampler.mark_used(0, now=60.0)
+        assert sampler.weight(0, now=70.0) == pytest.approx(110.0)
+        assert sampler.weight(1, now=70.0) == pytest.approx(220.0)
+
+    def test_rebuild_keeps_weights(self):
+        sampler = RecencyWeightedSampler([10.0, 10.0], [0.0, 0.0], rng=random.Random(1))
+        # Used long after the origin, the base would be negative without a rebuild
+        sampler.mark_used(0, now=1000.0)
+        assert sampler.weight(0, now=1000.0) == pytest.approx(10.0)
+        assert sampler.weight(1, now=1000.0) == pytest.approx(1010.0)
+
+    def test_distribution_matches_weights(self):
+        static_scores = [1000.0, 2000.0, 500.0, 1500.0]
+        last_used = [0.0, 300.0, 100.0, 200.0]
+        now = 400.0
+        sampler = RecencyWeightedSampler(static_scores, last_used, rng=random.Random(7))
+        weights = [score + now - used for score, used in zip(static_scores, last_used)]
+        draws = 40000
+        counts = [0] * len(weights)
+        for _ in range(draws):
+            counts[sampler.sample(now)] += 1
+        for count, weight in zip(counts, weights):
+            assert count / draws == pytest.approx(weight / sum(weights), abs=0.01)
+
+    def test_static_score_change(self):
+        sampler = RecencyWeightedSampler([100.0, 100.0], [0.0, 0.0], rng=random.Random(3))
+        sampler.set_static_score(1, 0.0)
+        assert all(sampler.sample(now=0.0) == 0 for _ in range(100))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the queue based logging
+"""
+
+import json
+import logging
+import pytest
+from utils.logging import LogRateLimiter, TextFormatter, setup_logging, stop_logging
+
+
+def make_record(name: str, msg: str, *args, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 0, msg, args, None)
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    stop_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogging:
+    """Regroup all tests related to the logging setup."""
+
+    def test_rate_limiter(self):
+        limiter = LogRateLimiter("core.base_scraper", rate=0.0, burst=3)
+        kept = [limiter.filter(make_record("core.base_scraper", "OK %s", f"url-{i}")) for i in range(10)]
+        assert kept == [True] * 3 + [False] * 7
+        # Other templates, other loggers and errors are not limited
+        assert limiter.filter(make_record("core.base_scraper", "Fallback on %s", "url"))
+        assert limiter.filter(make_record("datas.page_archive", "OK %s", "url"))
+        assert limiter.filter(make_record("core.base_scraper", "OK %s", "url", level=logging.ERROR))
+
+    def test_rate_limiter_reports_suppressed_messages(self):
+        limiter = LogRateLimiter("scrapers", rate=0.0, burst=1, sample=4)
+        records = [make_record("scrapers.KNIGHTFRANK", "Fetching offers from page: %s", i) for i in range(9)]
+        kept = [record for record in records if limiter.filter(record)]
+        assert [record.args[0] for record in kept] == [0, 4, 8]
+        assert kept[1].getMessage() == "Fetching offers from page: 4"
+        assert kept[1].suppressed == 3
+        assert TextFormatter("%(message)s").format(kept[1]) == "Fetching offers from page: 4 (3 similar messages suppressed)"
+
+    def test_rate_limiter_groups_the_formatted_messages(self):
+        limiter = LogRateLimiter("network", rate=0.0, burst=1, sample=3)
+        records = [
+            make_record("network.user_agents", f"[www.host{i}.fr] User-agent blocked, its weight is now x0.{i}0 : 100% Chrome")
+            for i in range(4)
+        ]
+        kept = [record for record in records if limiter.filter(record)]
+        assert kept == [records[0], records[3]]
+        # A literal % in the message is left untouched
+        assert kept[1].getMessage() == "[www.host3.fr] User-agent blocked, its weight is now x0.30 : 100% Chrome"
+        assert TextFormatter("%(message)s").format(kept[1]).endswith("100% Chrome (2 similar messages suppressed)")
+
+    def test_setup_logging_writes_from_the_queue(self, root_logger, tmp_path):
+        log_file = setup_logging(str(tmp_path), json_lines=True, rate_limits={"tests": {"rate": 0.0, "burst": 2, "sample": 3}})
+        logger = logging.getLogger("tests.hot_path")
+        for i in range(5):
+            logger.info("OK %s", f"url-{i}")
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger.exception("Surrender %s", "url-5")
+        stop_logging()
+        with open(log_file, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        messages = [entry["message"] for entry in entries if entry["logger"] == "tests.hot_path"]
+        assert messages == ["OK url-0", "OK url-1", "OK url-4", "Surrender url-5"]
+        assert [entry.get("suppressed") for entry in entries if entry["logger"] == "tests.hot_path"] == [None, None, 2, None]
+        assert "ValueError: broken" in entries[-1]["exception"]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the run metrics
+"""
+
+import json
+import pytest
+from utils.metrics import RunMetrics, percentile
+
+
+class TestRunMetrics:
+    """Regroup all tests related to run metrics."""
+
+    def test_percentile(self):
+        assert percentile([], 50) is None
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == pytest.approx(2.5)
+        assert percentile([float(i) for i in range(101)], 95) == pytest.approx(95.0)
+
+    def test_measure_records_outcome(self):
+        metrics = RunMetrics()
+        with metrics.measure("CBRE", "extraction", "http"):
+            pass
+        with pytest.raises(ValueError):
+            with metrics.measure("CBRE", "extraction", "http"):
+                raise ValueError("broken")
+        assert len(metrics.durations[("CBRE", "extraction", "http", "ok")]) == 1
+        assert len(metrics.durations[("CBRE", "extraction", "http", "error")]) == 1
+
+    def test_merge_of_the_worker_metrics(self):
+        metrics, worker = RunMetrics(), RunMetrics()
+        metrics.observe("CBRE", "fetch", 1.0, "http", received_bytes=100)
+        worker.observe("CBRE", "fetch", 2.0, "http", received_bytes=50)
+        worker.count_response("CBRE", "http", "ok")
+        metrics.merge(worker)
+        assert metrics.durations[("CBRE", "fetch", "http", "ok")] == [1.0, 2.0]
+        assert metrics.received_bytes[("CBRE", "http")] == 150
+        assert metrics.response_counts("CBRE") == {"ok": 1}
+
+    def test_exports(self, tmp_path):
+        metrics = RunMetrics()
+        for seconds in (0.01, 0.2, 0.7, 3.0):
+            metrics.observe("BNP", "fetch", seconds, "http", "ok", 1000)
+        metrics.observe("BNP", "fetch", 12.0, "stealthy", "error")
+
+        data = json.loads(metrics.to_json())
+        http = next(serie for serie in data["stages"] if serie["tier"] == "http")
+        assert http["count"] == 4
+        assert http["buckets"]["0.25"] == 2
+        assert http["buckets"]["+Inf"] == 4
+        assert data["received_bytes"] == [{"scraper": "BNP", "tier": "http", "bytes": 4000}]
+
+        prometheus = metrics.to_prometheus()
+        assert 'squirrel_stage_duration_seconds_count{scraper="BNP",stage="fetch",tier="stealthy",outcome="error"} 1' in prometheus
+        assert 'squirrel_received_bytes_total{scraper="BNP",tier="http"} 4000' in prometheus
+
+        files = metrics.export(str(tmp_path))
+        assert len(files) == 2
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Testing module for the profiling utilities
+"""
+
+import asyncio
+import logging
+import time
+from utils.profiling import EventLoopLagMonitor, SamplingProfiler, set_current_activity
+
+
+def busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiling:
+    """Regroup all tests related to profiling."""
+
+    def test_sampling_profiler_writes_folded_stacks(self, tmp_path):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy_wait(0.1)
+        profiler.stop()
+        path = profiler.write_folded(str(tmp_path / "profiles" / "TEST.folded"))
+        lines = open(path, encoding="utf-8").read().splitlines()
+        assert lines
+        assert any("busy_wait" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_lag_monitor_reports_blocking_callback(self, caplog):
+        async def scenario():
+            monitor = EventLoopLagMonitor(threshold=0.05, interval=0.01)
+            monitor.start()
+            await asyncio.sleep(0.05)
+            set_current_activity("CBRE", "https://immobilier.cbre.fr/offre/a-louer/bureaux/75001")
+            busy_wait(0.3)  # synchronous parsing blocking the loop
+            await asyncio.sleep(0.05)
+            monitor.stop()
+            return monitor
+
+        with caplog.at_level(logging.WARNING, logger="utils.profiling"):
+            monitor = asyncio.run(scenario())
+        assert monitor.blocked_callbacks == 1
+        assert monitor.max_lag >= 0.2
+        assert "https://immobilier.cbre.fr/offre/a-louer/bureaux/75001" in caplog.text
+        assert "busy_wait" in caplog.text
@@ -1,54 +1,202 @@
 # -*- coding: utf-8 -*-
 """
 Configuration et utilitaires pour le logging
+Les loggers ne font que déposer leurs records dans une file : un thread d'écriture (QueueListener) les formate et
+les écrit dans la console et le fichier de log, en dehors de la boucle asyncio. Les messages répétés à chaque URL
+peuvent être limités par logger.
 """
 
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from config.squirrel_settings import LOG_JSON, LOG_RATE_LIMITS
 
+# Thread d'écriture en cours, arrêté par stop_logging() ou à la sortie du programme
+_listener: QueueListener | None = None
 
-def setup_logging(log_dir: str = "logs") -> str:
+# Parties variables d'un message déjà formaté (f-string) : urls, chaînes entre crochets ou guillemets et nombres
+_VARIABLE_PARTS = re.compile(r"https?://\S+|\[[^\]]*\]|'[^']*'|\"[^\"]*\"|\d+(?:[.,]\d+)*")
+
+
+def message_template(record: logging.LogRecord) -> str:
+    """Renvoie le modèle d'un message : record.msg avec des arguments, sinon le message sans ses parties variables"""
+    if record.args:
+        return str(record.msg)
+    return _VARIABLE_PARTS.sub("#", str(record.msg))
+
+
+class TextFormatter(logging.Formatter):
+    """Formate chaque record en texte, suivi du nombre de messages similaires supprimés avant lui"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{message} ({suppressed} similar messages suppressed)" if suppressed else message
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formate chaque record en un objet JSON par ligne"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LogRateLimiter(logging.Filter):
+    """Limite les messages répétés d'un logger : chaque modèle de message (record.msg avant le formatage des
+    arguments, ou le message sans ses urls ni ses nombres) dispose d'un seau de jetons, les records au-delà sont
+    supprimés ou échantillonnés. Le nombre de messages supprimés avant un record écrit est dans record.suppressed"""
+
+    def __init__(self, name: str = "", rate: float = 5.0, burst: int = 50, sample: int = 0, max_level: int = logging.WARNING):
+        """Initialise le filtre.
+
+        Args:
+            name (str): Logger (et ses enfants) dont les messages sont limités
+            rate (float): Messages par seconde autorisés pour un même modèle, une fois le seau vide
+            burst (int): Taille du seau, nombre de messages d'un modèle écrits sans limite
+            sample (int): Au-delà de la limite, garde un message sur sample (0 : aucun)
+            max_level (int): Niveau au-dessus duquel les messages ne sont jamais limités
+        """
+        super().__init__(name)
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self.max_level = max_level
+        self._lock = threading.Lock()
+        # (logger, modèle) -> [jetons, dernière mise à jour, messages supprimés depuis le dernier écrit]
+        self._buckets: dict[tuple[str, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or not super().filter(record):
+            return True
+        key = (record.name, message_template(record))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(key, [float(self.burst), now, 0])
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+            elif self.sample and (bucket[2] + 1) % self.sample == 0:
+                pass
+            else:
+                bucket[2] += 1
+                return False
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class RecordQueueHandler(QueueHandler):
+    """QueueHandler gardant la trace d'une exception à part du message, pour le format JSON lines"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+
+
+def stop_logging() -> None:
+    """Écrit les records restant dans la file et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def setup_logging(log_dir: str = "logs", json_lines: bool = LOG_JSON, rate_limits: dict[str, dict] | None = None) -> str:
     """
-    Configure le logging pour écrire à la fois dans un fichier et la console
+    Configure le logging pour écrire à la fois dans un fichier et la console, depuis un thread d'écriture
 
     Args:
         log_dir (str): Chaîne de caractère représentant le répertoire où stocker les logs
+        json_lines (bool): Écrit le fichier de log en JSON lines (un objet par record) au lieu de texte
+        rate_limits (dict[str, dict] | None): Options de LogRateLimiter par nom de logger, LOG_RATE_LIMITS par défaut
 
     Returns:
-        TextIO: Un objet fichier JSON ouvert en mode lecture.
+        str: Chemin du fichier de log
     """
+    global _listener
     # Créer le répertoire de logs s'il n'existe pas
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
     # Créer le nom du fichier de log avec horodatage
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-    log_file = os.path.join(log_dir, f"scraping_{timestamp}.log")
+    log_file = os.path.join(log_dir, f"scraping_{timestamp}.{'jsonl' if json_lines else 'log'}")
 
     # Configuration du format de log
     log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    formatter = logging.Formatter(log_format)
+    formatter = TextFormatter(log_format)
 
     # Obtenir le logger root
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
 
-    # Supprimer les handlers existants
+    # Supprimer les handlers existants et arrêter le thread d'écriture précédent
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    stop_logging()
 
     # Handler pour la console
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
 
     # Handler pour le fichier
     file_handler = logging.FileHandler(log_file, encoding="utf-8", mode="w")
-    file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
+    file_handler.setFormatter(JsonLinesFormatter() if json_lines else formatter)
+
+    # Les loggers ne font que déposer leurs records dans la file, filtrés avant d'y entrer
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = RecordQueueHandler(log_queue)
+    for name, options in (LOG_RATE_LIMITS if rate_limits is None else rate_limits).items():
+        queue_handler.addFilter(LogRateLimiter(name, **options))
+    root_logger.addHandler(queue_handler)
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
 
     logger = logging.getLogger(__name__)
-    logger.info(f"Logging initialized. Log file: {log_file}")
+    logger.info("Logging initialized. Log file: %s", log_file)
 
     return log_file
+
+
+def _restart_in_child() -> None:
+    """Relance un thread d'écriture dans un processus forké (workers du crawl partagé et de la ré-extraction),
+    le thread du parent n'existant pas dans l'enfant"""
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+
+
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Run metrics module
+This module records structured timings for each stage of a run (discovery, fetch attempts per session tier,
+extraction, data_hook) with the bytes received and the outcome, and exports them as histograms and percentiles
+in JSON or Prometheus text format.
+"""
+
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+
+# Upper bounds in seconds of the histogram buckets
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values: list[float], rank: float) -> float | None:
+    """Returns the percentile of a list of values with linear interpolation, None for an empty list"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * rank / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class RunMetrics:
+    """Collects the durations and received bytes of a run"""
+
+    def __init__(self):
+        """Initializes empty metrics."""
+        # (scraper, stage, tier, outcome) -> durations in seconds
+        self.durations: dict[tuple[str, str, str, str], list[float]] = defaultdict(list)
+        # (scraper, tier) -> bytes received
+        self.received_bytes: dict[tuple[str, str], int] = defaultdict(int)
+        # (scraper, tier, class) -> responses of each class given by the response classifier
+        self.response_classes: dict[tuple[str, str, str], int] = defaultdict(int)
+
+    def observe(self, scraper: str, stage: str, seconds: float, tier: str = "", outcome: str = "ok", received_bytes: int = 0) -> None:
+        """Records one timing
+
+        Args:
+            scraper (str): Name of the scraper
+            stage (str): Stage of the pipeline like "discovery", "fetch", "extraction" or "data_hook"
+            seconds (float): Duration of the stage
+            tier (str): Session tier used for fetches like "http", "dynamic" or "stealthy"
+            outcome (str): Outcome of the stage like "ok" or "error"
+            received_bytes (int): Size of the received response
+        """
+        self.durations[(scraper, stage, tier, outcome)].append(seconds)
+        if received_bytes:
+            self.received_bytes[(scraper, tier)] += received_bytes
+
+    def count_response(self, scraper: str, tier: str, kind: str) -> None:
+        """Counts one response of a class ("ok", "challenge", "soft_404"...) fetched on a tier"""
+        self.response_classes[(scraper, tier, kind)] += 1
+
+    def response_counts(self, scraper: str) -> dict[str, int]:
+        """Returns the number of responses of each class fetched by a scraper, all tiers together"""
+        counts: dict[str, int] = defaultdict(int)
+        for (name, _, kind), count in self.response_classes.items():
+            if name == scraper:
+                counts[kind] += count
+        return dict(sorted(counts.items()))
+
+    def merge(self, other: "RunMetrics") -> None:
+        """Adds the timings, bytes and responses recorded by other metrics, e.g. by a worker process"""
+        for key, values in other.durations.items():
+            self.durations[key].extend(values)
+        for key, total in other.received_bytes.items():
+            self.received_bytes[key] += total
+        for key, count in other.response_classes.items():
+            self.response_classes[key] += count
+
+    @contextmanager
+    def measure(self, scraper: str, stage: str, tier: str = "") -> Iterator[None]:
+        """Context manager recording the duration of its block, with an "error" outcome if it raises"""
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.observe(scraper, stage, time.perf_counter() - start, tier, outcome)
+
+    def summary(self) -> list[dict]:
+        """Returns count, sum, max, percentiles and cumulative buckets for each (scraper, stage, tier, outcome)
+
+        Returns:
+            list[dict]: One dictionary per recorded series
+        """
+        series = []
+        for (scraper, stage, tier, outcome), values in sorted(self.durations.items()):
+            serie = {
+                "scraper": scraper,
+                "stage": stage,
+                "tier": tier,
+                "outcome": outcome,
+                "count": len(values),
+                "sum": sum(values),
+                "max": max(values),
+            }
+            for rank in PERCENTILES:
+                serie[f"p{rank}"] = percentile(values, rank)
+            serie["buckets"] = {
+                ("+Inf" if math.isinf(bound) else str(bound)): sum(1 for value in values if value <= bound)
+                for bound in BUCKETS
+            }
+            series.append(serie)
+        return series
+
+    def to_json(self) -> str:
+        """Exports the metrics as a JSON document"""
+        return json.dumps(
+            {
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "stages": self.summary(),
+                "received_bytes": [
+                    {"scraper": scraper, "tier": tier, "bytes": total}
+                    for (scraper, tier), total in sorted(self.received_bytes.items())
+                ],
+                "response_classes": [
+                    {"scraper": scraper, "tier": tier, "class": kind, "count": count}
+                    for (scraper, tier, kind), count in sorted(self.response_classes.items())
+                ],
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    def to_prometheus(self) -> str:
+        """Exports the metrics in Prometheus text exposition format"""
+        lines = [
+            "# HELP squirrel_stage_duration_seconds Duration of the scraping stages.",
+            "# TYPE squirrel_stage_duration_seconds histogram",
+        ]
+        for serie in self.summary():
+            labels = f'scraper="{serie["scraper"]}",stage="{serie["stage"]}",tier="{serie["tier"]}",outcome="{serie["outcome"]}"'
+            for bound, count in serie["buckets"].items():
+                lines.append(f'squirrel_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"squirrel_stage_duration_seconds_sum{{{labels}}} {serie['sum']}")
+            lines.append(f"squirrel_stage_duration_seconds_count{{{labels}}} {serie['count']}")
+        lines += [
+            "# HELP squirrel_received_bytes_total Bytes received by session tier.",
+            "# TYPE squirrel_received_bytes_total counter",
+        ]
+        for (scraper, tier), total in sorted(self.received_bytes.items()):
+            lines.append(f'squirrel_received_bytes_total{{scraper="{scraper}",tier="{tier}"}} {total}')
+        lines += [
+            "# HELP squirrel_responses_total Fetched responses by class of the response classifier.",
+            "# TYPE squirrel_responses_total counter",
+        ]
+        for (scraper, tier, kind), count in sorted(self.response_classes.items()):
+            lines.append(f'squirrel_responses_total{{scraper="{scraper}",tier="{tier}",class="{kind}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, formats: tuple[str, ...] = ("json", "prometheus")) -> list[str]:
+        """Writes the metrics of the run in a folder
+
+        Args:
+            path (str): Folder where to write the metrics files
+            formats (tuple[str, ...]): "json" and/or "prometheus"
+
+        Returns:
+            list[str]: Paths of the written files
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        now = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        files = []
+        for export_format in formats:
+            if export_format == "json":
+                file_path, content = os.path.join(path, f"metrics_{now}.json"), self.to_json()
+            elif export_format == "prometheus":
+                file_path, content = os.path.join(path, f"metrics_{now}.prom"), self.to_prometheus()
+            else:
+                raise ValueError(f"Unknown metrics format : {export_format}")
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            files.append(file_path)
+        return files
+
+
+# Metrics shared by every scraper of the run
+RUN_METRICS = RunMetrics()
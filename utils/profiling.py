@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Profiling utilities
+This module provides an opt-in sampling profiler writing flamegraph-ready folded stacks, and an event-loop lag
+monitor logging the callbacks which block the asyncio loop with the scraper and url being processed.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# (scraper, url) processed by the event loop, updated by the scrapers before each step
+_current_activity: tuple[str | None, str | None] = (None, None)
+
+
+def set_current_activity(scraper: str | None, url: str | None) -> None:
+    """Records the scraper and url being processed, read by the lag monitor when the loop is blocked"""
+    global _current_activity
+    _current_activity = (scraper, url)
+
+
+def get_current_activity() -> tuple[str | None, str | None]:
+    """Returns the scraper and url being processed"""
+    return _current_activity
+
+
+def _folded_stack(frame) -> str:
+    """Returns a stack as 'outer;...;inner' frames"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Samples the stack of a thread at a fixed interval from a background thread"""
+
+    def __init__(self, interval: float = 0.005, thread_id: int | None = None):
+        """Initializes the profiler.
+
+        Args:
+            interval (float): Seconds between two samples
+            thread_id (int | None): Thread to sample, the calling thread by default
+        """
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_folded_stack(frame)] += 1
+
+    def start(self) -> None:
+        """Starts sampling"""
+        self.samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def write_folded(self, path: str) -> str:
+        """Writes the samples in folded format ('frame;frame;frame count'), readable by flamegraph.pl or speedscope
+
+        Returns:
+            str: Path of the written file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class EventLoopLagMonitor:
+    """Detects the callbacks blocking the event loop longer than a threshold.
+
+    A coroutine ticks on the loop at a fixed interval, and a watchdog thread logs the stack of the loop thread
+    with the current scraper and url when the ticks stop for longer than the threshold.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = 0.02):
+        """Initializes the monitor.
+
+        Args:
+            threshold (float): Seconds of blocking after which a callback is reported
+            interval (float): Seconds between two ticks of the loop
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.max_lag = 0.0
+        self.blocked_callbacks = 0
+        self._last_tick = time.perf_counter()
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    async def _tick(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.max_lag = max(self.max_lag, now - expected)
+            self._last_tick = now
+
+    def _watch(self) -> None:
+        reported = False
+        while not self._stop.wait(self.threshold / 4):
+            blocked_for = time.perf_counter() - self._last_tick
+            if blocked_for > self.threshold + self.interval:
+                if not reported:
+                    reported = True
+                    self.blocked_callbacks += 1
+                    scraper, url = get_current_activity()
+                    frame = sys._current_frames().get(self._loop_thread_id)
+                    stack = "".join(traceback.format_stack(frame, limit=8)) if frame is not None else ""
+                    logger.warning(
+                        "Event loop blocked for more than %.0f ms by [%s] %s\n%s",
+                        blocked_for * 1000, scraper, url, stack,
+                    )
+            else:
+                reported = False
+
+    def start(self) -> None:
+        """Starts monitoring the running event loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-lag-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        """Stops monitoring"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        logger.info(
+            "Event loop max lag : %.0f ms ; %d blocking callbacks over %.0f ms",
+            self.max_lag * 1000, self.blocked_callbacks, self.threshold * 1000,
+        )
+
+
+def profile_path(path: str, scraper_name: str) -> str:
+    """Returns the path of the folded stacks file of a scraper for this run"""
+    now = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    return os.path.join(path, f"{scraper_name}_{now}.folded")